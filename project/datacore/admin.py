@@ -100,6 +100,16 @@ class PhraseAnalysis(admin.ModelAdmin):
     raw_id_fields = ("phrase", "words", "entities", "template")
 
 
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "task", "status", "progress", "total", "created"]
+    list_filter = ["status", "task"]
+
+
+class StatisticAdmin(admin.ModelAdmin):
+    list_display = ["name", "language", "data_source", "count", "updated"]
+    list_filter = ["name"]
+
+
 admin.site.register(models.Analyzer, AnalyzerAdmin)
 admin.site.register(models.DataSource, DataSourceAdmin)
 admin.site.register(models.Reference, ReferenceAdmin)
@@ -120,3 +130,5 @@ admin.site.register(models.Document, DocumentAdmin)
 admin.site.register(models.Phrase, PhraseAdmin)
 admin.site.register(models.PhraseAnalysis, PhraseAnalysis)
 admin.site.register(models.Template, TemplateAdmin)
+admin.site.register(models.Job, JobAdmin)
+admin.site.register(models.Statistic, StatisticAdmin)
@@ -1,10 +1,62 @@
 from rest_framework import filters, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from . import models, serializers
 
 
+def get_int_param(request, name, default=None):
+    """
+    Integer query parameter, invalid values are responded with 400 status
+    """
+    value = request.query_params.get(name)
+    if value in [None, ""]:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError(f"`{name}` should be an integer.")
+
+
+def get_direction_param(request):
+    """
+    Direction of relations, `outgoing`, `incoming` or `both` which is the default
+    """
+    from datacore.functions.graph import GRAPH_DIRECTIONS
+
+    direction = request.query_params.get("direction", "both")
+    if direction not in GRAPH_DIRECTIONS:
+        raise ValidationError(
+            f"Unknown direction, choices are: {', '.join(GRAPH_DIRECTIONS)}"
+        )
+    return direction
+
+
+def get_search_response(viewset, request, search):
+    """
+    Page of full-text search results with their rank and highlighted headline
+    search: function of `datacore.functions.search` which is called with query and language
+    """
+    from datacore.functions.search import highlight, paginate_without_count
+
+    items, page = paginate_without_count(
+        search(
+            request.query_params.get("query"),
+            language=request.query_params.get("language"),
+        ),
+        page=request.query_params.get("page", 1),
+        page_size=viewset.paginator.get_page_size(request),
+    )
+    results = []
+    for item, data in zip(items, viewset.get_serializer(items, many=True).data):
+        data["rank"] = item.rank
+        data["headline"] = highlight(item.headline)
+        results.append(data)
+    # results aren't counted, so only existence of next and previous pages is known
+    return Response(dict(page, results=results))
+
+
 class DataSourceViewSet(viewsets.ModelViewSet):
     queryset = models.DataSource.objects.all()
     serializer_class = serializers.DataSourceSerializer
@@ -34,6 +86,17 @@ class WordRelationViewSet(viewsets.ModelViewSet):
     queryset = models.WordRelation.objects.all()
     serializer_class = serializers.WordRelationSerializer
 
+    def get_queryset(self):
+        # api/word_relation/?word=12&direction=incoming&word_relation=3
+        word = get_int_param(self.request, "word")
+        if word is None:
+            return super().get_queryset()
+        return models.WordRelation.filter_relations(
+            word,
+            direction=get_direction_param(self.request),
+            word_relation=get_int_param(self.request, "word_relation"),
+        ).order_by("id")
+
 
 class NamedEntityViewSet(viewsets.ModelViewSet):
     queryset = models.NamedEntity.objects.all()
@@ -56,6 +119,7 @@ class WordViewSet(viewsets.ModelViewSet):
         "frequency_distribution",
         "lemma_frequency_distribution",
         "language",
+        "length",
     ]
     search_fields = ["text"]
 
@@ -69,10 +133,10 @@ class WordViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
-    # TODO: min/max lengh, letters(contains letters/must have/ can't have)
     @action(detail=False)
     def filter(self, request):
         # api/words/filter/?ends_with=ed&starts_with=non&contains=tut
+        # api/words/filter/?min_length=3&max_length=5&letters=ae&exclude_letters=z
         # api/words/filter/?list-type=longest
         queryset = models.Word.objects
         list_type = self.request.query_params.get("list-type")
@@ -83,7 +147,13 @@ class WordViewSet(viewsets.ModelViewSet):
             ends_with = self.request.query_params.get("ends_with")
             contains = self.request.query_params.get("contains")
             queryset = models.Word.filter_words(
-                start=starts_with, contain=contains, end=ends_with
+                start=starts_with,
+                contain=contains,
+                end=ends_with,
+                min_length=get_int_param(self.request, "min_length"),
+                max_length=get_int_param(self.request, "max_length"),
+                letters=self.request.query_params.get("letters"),
+                exclude_letters=self.request.query_params.get("exclude_letters"),
             )
 
         page = self.paginate_queryset(queryset)
@@ -98,6 +168,90 @@ class ConceptViewSet(viewsets.ModelViewSet):
     queryset = models.Concept.objects.all()
     serializer_class = serializers.ConceptSerializer
 
+    @action(detail=True)
+    def relations(self, request, pk=None):
+        # api/concepts/12/relations/?relation_types=HYPONYM,SIMILAR&max_nodes=100
+        return self.get_graph_response(request, "direct", pk)
+
+    @action(detail=True)
+    def hierarchy(self, request, pk=None):
+        # api/concepts/12/hierarchy/?depth=3
+        return self.get_graph_response(request, "hierarchy", pk)
+
+    @action(detail=True)
+    def neighborhood(self, request, pk=None):
+        # api/concepts/12/neighborhood/?depth=2&direction=outgoing
+        return self.get_graph_response(request, "neighborhood", pk)
+
+    def get_graph_response(self, request, kind, pk):
+        """
+        Nodes and edges of a concept graph, responses are cached and not modified until relations change
+        """
+        import datacore.settings as datacore_settings
+        from datacore.components import RELATION
+        from datacore.functions.graph import (
+            GRAPH_KINDS,
+            get_graph_data,
+            get_graph_key,
+            get_graph_options,
+            get_graph_version,
+        )
+        from rest_framework import status
+        from rest_framework.exceptions import NotFound
+
+        params = request.query_params
+        # parameters of options which are fixed by kind of graph
+        fixed = [
+            param
+            for param, option in [("direction", "direction"), ("depth", "max_depth")]
+            if param in params and option in GRAPH_KINDS[kind]
+        ]
+        if fixed:
+            raise ValidationError(
+                f"Parameters can't be changed in {kind} graph: {', '.join(fixed)}"
+            )
+        try:
+            concept = int(pk)
+        except ValueError:
+            raise ValidationError("Concept should be an integer.")
+        max_depth = get_int_param(
+            request,
+            "depth",
+            1 if kind == "neighborhood" else datacore_settings.GRAPH_MAX_DEPTH,
+        )
+        max_nodes = get_int_param(
+            request, "max_nodes", datacore_settings.GRAPH_MAX_NODES
+        )
+        # larger graphs are limited by settings
+        max_depth = max(min(max_depth, datacore_settings.GRAPH_MAX_DEPTH), 1)
+        max_nodes = max(min(max_nodes, datacore_settings.GRAPH_MAX_NODES), 1)
+        relation_types = [
+            code for code in params.get("relation_types", "").split(",") if code
+        ]
+        unknown = set(relation_types) - {code for code, title in RELATION}
+        if unknown:
+            raise ValidationError(
+                f"Unknown relation types: {', '.join(sorted(unknown))}"
+            )
+        # ETag is the cache key of normalized options, E.g. relation types in any order share it
+        options = get_graph_options(
+            kind,
+            direction=get_direction_param(request),
+            relation_types=relation_types,
+            max_depth=max_depth,
+            max_nodes=max_nodes,
+        )
+
+        version = get_graph_version()
+        etag = f'"{get_graph_key(kind, concept, version, **options)[-32:]}"'
+        headers = {"ETag": etag}
+        if etag in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        data = get_graph_data(kind, concept, version=version, **options)
+        if data is None:
+            raise NotFound()
+        return Response(data, headers=headers)
+
 
 class DomainOntologyViewSet(viewsets.ModelViewSet):
     queryset = models.DomainOntology.objects.all()
@@ -108,6 +262,13 @@ class DefinitionViewSet(viewsets.ModelViewSet):
     queryset = models.Definition.objects.all()
     serializer_class = serializers.DefinitionSerializer
 
+    @action(detail=False)
+    def search(self, request):
+        # api/definitions/search/?query=domestic animal&language=en&page=2
+        from datacore.functions.search import search_definitions
+
+        return get_search_response(self, request, search_definitions)
+
 
 class ExampleViewSet(viewsets.ModelViewSet):
     queryset = models.Example.objects.all()
@@ -118,6 +279,17 @@ class RelationViewSet(viewsets.ModelViewSet):
     queryset = models.Relation.objects.all()
     serializer_class = serializers.RelationSerializer
 
+    def get_queryset(self):
+        # api/relations/?concept=12&direction=outgoing&relation_type=HYPONYM
+        concept = get_int_param(self.request, "concept")
+        if concept is None:
+            return super().get_queryset()
+        return models.Relation.filter_relations(
+            concept,
+            direction=get_direction_param(self.request),
+            relation_type=self.request.query_params.get("relation_type"),
+        ).order_by("id")
+
 
 class AttributeViewSet(viewsets.ModelViewSet):
     queryset = models.Attribute.objects.all()
@@ -168,6 +340,45 @@ class PhraseViewSet(viewsets.ModelViewSet):
     queryset = models.Phrase.objects.all()
     serializer_class = serializers.PhraseSerializer
 
+    @action(detail=False)
+    def search(self, request):
+        # api/phrases/search/?query=running dogs&language=en&page=2
+        from datacore.functions.search import search_phrases
+
+        return get_search_response(self, request, search_phrases)
+
+    @action(detail=False)
+    def containing(self, request):
+        # api/phrases/containing/?words=cat,dog&lemmas=run&entities=london&match=any&language=en
+        # ids are given separately, E.g. ?word_ids=12,15&lemma_ids=3&entity_ids=7
+        def get_list(name, ids_name):
+            value = self.request.query_params.get(name)
+            items = [item.strip() for item in value.split(",")] if value else []
+            value = self.request.query_params.get(ids_name)
+            try:
+                ids = [int(item) for item in value.split(",")] if value else []
+            except ValueError:
+                raise ValidationError(f"{ids_name} should be integers.")
+            return items + ids
+
+        match = self.request.query_params.get("match", "all")
+        if match not in ["all", "any"]:
+            raise ValidationError("Unknown match, choices are: all, any")
+        queryset = models.Phrase.filter_phrases(
+            words=get_list("words", "word_ids"),
+            lemmas=get_list("lemmas", "lemma_ids"),
+            entities=get_list("entities", "entity_ids"),
+            match=match,
+            language=self.request.query_params.get("language") or None,
+        ).order_by("id")
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
 
 class TemplateViewSet(viewsets.ModelViewSet):
     queryset = models.Template.objects.all()
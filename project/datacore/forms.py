@@ -145,6 +145,20 @@ class WordsFilter(forms.Form):
     end = forms.CharField(
         max_length=256, required=False, help_text="Words must end with this characters"
     )
+    min_length = forms.IntegerField(
+        min_value=1, required=False, help_text="Minimum number of characters"
+    )
+    max_length = forms.IntegerField(
+        min_value=1, required=False, help_text="Maximum number of characters"
+    )
+    letters = forms.CharField(
+        max_length=256, required=False, help_text="Words must have all of these letters"
+    )
+    exclude_letters = forms.CharField(
+        max_length=256,
+        required=False,
+        help_text="Words can't have any of these letters",
+    )
     sort_by = forms.ChoiceField(
         widget=forms.RadioSelect(),
         choices=SORT_BY,
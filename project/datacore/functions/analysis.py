@@ -0,0 +1,627 @@
+def get_lemma_relation_type():
+    from datacore.models import WordRelationType
+
+    lemma_relation, created = WordRelationType.objects.get_or_create(
+        title="Lemma",
+        direction_type="d",
+        descriptor="is the lemma of",
+        reverse_descriptor="is a form of",
+    )
+    return lemma_relation
+
+
+def bulk_get_or_create_words(texts, language):
+    """
+    Get or create words with a fixed number of queries
+    texts: list of word texts, words are case-insensitive so texts are matched by their lower case
+    language: `Language` object of words
+    returns a dictionary of lower cased texts to word ids
+    """
+    from datacore.models import Word
+
+    # keep the first occurrence of each text, same as consecutive `get_or_create` calls
+    unique_texts = {}
+    for text in texts:
+        unique_texts.setdefault(text.lower(), text)
+    texts = list(unique_texts.values())
+    words = {}
+    if not texts:
+        return words
+    for word_id, text in Word.objects.filter(
+        language=language, text__in=texts
+    ).values_list("id", "text"):
+        words[text.lower()] = word_id
+    # rows are inserted in the same order by all processes, so concurrent inserts don't deadlock
+    missing = sorted(
+        (text for text in texts if text.lower() not in words), key=str.lower
+    )
+    if missing:
+        Word.objects.bulk_create(
+            [Word(text=text, language=language, length=len(text)) for text in missing],
+            ignore_conflicts=True,
+        )
+        for word_id, text in Word.objects.filter(
+            language=language, text__in=missing
+        ).values_list("id", "text"):
+            words[text.lower()] = word_id
+        # database and python might lower case some unicode characters differently
+        for text in missing:
+            if text.lower() not in words:
+                word, created = Word.objects.get_or_create(text=text, language=language)
+                words[text.lower()] = word.id
+    return words
+
+
+def lock_model(model):
+    """
+    Lock a model until end of transaction, only for processes which lock it too
+    """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s))", [model._meta.db_table]
+        )
+
+
+def bulk_create_tree_roots(model, objects):
+    """
+    `bulk_create` for MPTT models, objects are inserted as root nodes of new trees.
+    It should be called in a transaction which has locked the model by `lock_model`,
+    otherwise concurrent calls get the same tree ids.
+    """
+    tree_id = model._tree_manager._get_next_tree_id()
+    opts = model._mptt_meta
+    for i, obj in enumerate(objects):
+        setattr(obj, opts.tree_id_attr, tree_id + i)
+        setattr(obj, opts.level_attr, 0)
+        setattr(obj, opts.left_attr, 1)
+        setattr(obj, opts.right_attr, 2)
+    return model.objects.bulk_create(objects)
+
+
+def bulk_get_or_create_entities(entities):
+    """
+    Get or create named entities with a fixed number of queries
+    entities: list of `(text, ne_type)` tuples
+    returns a dictionary of `(lower cased text, ne_type)` to named entity ids
+    """
+    from datacore.models import NamedEntity
+    from django.db import transaction
+
+    unique_entities = {}
+    for text, ne_type in entities:
+        unique_entities.setdefault((text.lower(), ne_type), text)
+    result = {}
+    if not unique_entities:
+        return result
+    select_entities(unique_entities, result)
+    if any(key not in result for key in unique_entities):
+        # entities and their tree ids are created by one process at a time, entities which
+        # are created by other processes while the lock is waited for are selected again
+        with transaction.atomic():
+            lock_model(NamedEntity)
+            select_entities(unique_entities, result)
+            missing = [
+                NamedEntity(text=text, ne_type=key[1])
+                for key, text in unique_entities.items()
+                if key not in result
+            ]
+            if missing:
+                for entity in bulk_create_tree_roots(NamedEntity, missing):
+                    result[(entity.text.lower(), entity.ne_type)] = entity.id
+    return result
+
+
+def select_entities(entities, result):
+    """
+    Add ids of existing named entities to result
+    entities: dictionary of `(lower cased text, ne_type)` to text
+    """
+    from datacore.models import NamedEntity
+
+    missing = {key: text for key, text in entities.items() if key not in result}
+    for entity_id, text, ne_type in (
+        NamedEntity.objects.filter(
+            text__in=list(missing.values()),
+            ne_type__in={key[1] for key in missing},
+        )
+        .order_by("id")
+        .values_list("id", "text", "ne_type")
+    ):
+        result.setdefault((text.lower(), ne_type), entity_id)
+
+
+def get_template_signature(
+    pos,
+    xpos=None,
+    feats=None,
+    dep=None,
+    constituency=None,
+    parent_id=None,
+    language_id=None,
+):
+    """
+    Hash of template structure, template text values are too long for btree indexes
+    """
+    import hashlib
+    import json
+
+    values = [value or "" for value in [pos, xpos, feats, dep, constituency]]
+    key = json.dumps(values + [parent_id, language_id])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def get_or_create_template(signature, defaults):
+    """
+    Get or create template by it's signature, using the process-local template registry
+    defaults: template fields, their signature should be the same as `signature`
+    returns `(template_id, created)`
+    """
+    from datacore.functions.cache import get_template_registry
+    from datacore.models import Template
+    from django.db import transaction
+
+    registry = get_template_registry()
+    template_id = registry.get(signature)
+    if template_id is not None:
+        return template_id, False
+    template, created = Template.objects.get_or_create(
+        signature=signature, defaults=defaults
+    )
+    if created:
+        # ids of rolled back templates shouldn't be reused
+        transaction.on_commit(lambda: registry.set(signature, template.id))
+    else:
+        registry.set(signature, template.id)
+    return template.id, created
+
+
+def get_phrase_template(data, templates):
+    """
+    Get or create base template and it's sub-template of an analyzed phrase
+    data: analysis data of phrase
+    templates: dictionary of template strings, `constituency` is only used if analyzer supports it
+    returns id of sub-template
+    """
+    from datacore.models import Template
+
+    template_data = {}
+    template_data["structure"] = {}
+    for word_id, word in data["words"].items():
+        template_data["structure"][word_id] = {}
+        template_data["structure"][word_id]["id"] = word["id"]
+        template_data["structure"][word_id]["upos"] = word["upos"]
+    template_id, created = get_or_create_template(
+        get_template_signature(templates["pos_template"]),
+        {"pos": templates["pos_template"], "parent": None, "data": template_data},
+    )
+
+    sub_template = {
+        "pos": templates["pos_template"],
+        "xpos": templates["xpos_template"],
+        "feats": templates["feat_template"],
+        "dep": templates["dep_template"],
+        "constituency": templates.get("constituency"),
+    }
+    new_template_id, created = get_or_create_template(
+        get_template_signature(**sub_template, parent_id=template_id),
+        dict(sub_template, parent_id=template_id),
+    )
+    if created:
+        for word_id, word in data["words"].items():
+            template_data["structure"][word_id]["xpos"] = word["xpos"]
+            template_data["structure"][word_id]["dep_rel"] = word["dep_rel"]
+            template_data["structure"][word_id]["dep_parent"] = word["dep_parent"]
+        phrase_type = (
+            Template.objects.filter(id=template_id)
+            .values_list("phrase_type", flat=True)
+            .first()
+        )
+        Template.objects.filter(id=new_template_id).update(
+            data=template_data, phrase_type=phrase_type if phrase_type else None
+        )
+    return new_template_id
+
+
+def get_phrase_entities(data):
+    """
+    Named entities of analysis data in their order, each one is a dictionary of `text`, `start_char`, `end_char` and `type`
+    """
+    return [data["ner"][key] for key in sorted(data["ner"], key=int)]
+
+
+def cached_phrase_data(analyzer, version, phrase_items, analyze):
+    """
+    Get analysis data of phrases from analysis cache and analyze the rest, phrases with the same text are analyzed once
+    version: version of analyzer's pipeline or model, cached data of other versions is not used
+    analyze: function which analyzes a list of phrases and returns list of `(data, templates)`
+    returns list of `(data, templates)` in the same order as `phrase_items`
+    """
+    from datacore.functions.cache import (
+        get_cached_analyses,
+        get_text_hash,
+        store_cached_analyses,
+    )
+
+    hashes = [get_text_hash(phrase_item.text) for phrase_item in phrase_items]
+    results = get_cached_analyses(
+        analyzer, version, [phrase_item.text for phrase_item in phrase_items]
+    )
+    missing = {}
+    for text_hash, phrase_item in zip(hashes, phrase_items):
+        if text_hash not in results:
+            missing.setdefault(text_hash, phrase_item)
+    if missing:
+        analyzed = analyze(list(missing.values()))
+        results.update(zip(missing.keys(), analyzed))
+        store_cached_analyses(
+            analyzer,
+            version,
+            [
+                (phrase_item.text, *results[text_hash])
+                for text_hash, phrase_item in missing.items()
+            ],
+        )
+    return [results[text_hash] for text_hash in hashes]
+
+
+def save_phrase_analyses(analyzer, language, items, version=""):
+    """
+    Save analysis of many phrases using a small fixed number of bulk queries.
+    Results are the same as saving each phrase's analysis one by one.
+    analyzer: `Analyzer` object used for analysis
+    language: `Language` object, words, lemmas are stored in this language
+    items: list of `(phrase_item, data, templates)`
+            phrase_item: analyzed `Phrase` object
+            data: analysis data, created by analyzers. E.g. `spacy_sentence_data`
+            templates: dictionary of template strings
+    version: version of analyzer's pipeline or model, it's stamped on analyses and analyzer
+    returns list of `PhraseAnalysis` objects in the same order as items
+    """
+    from collections import Counter
+
+    from datacore.functions.analysis_data import pack_analysis_data
+    from datacore.functions.cache import get_lemma_map, get_word_resolver
+    from datacore.functions.counters import CounterBuffer
+    from datacore.models import NamedEntity, Phrase, PhraseAnalysis, Word, WordRelation
+    from django.db import transaction
+
+    if not items:
+        return []
+
+    with transaction.atomic():
+        lemma_relation = get_lemma_relation_type()
+        if version and analyzer.version != version:
+            analyzer.version = version
+            analyzer.save(update_fields=["version"])
+
+        # Words and lemmas
+        texts = []
+        for phrase_item, data, templates in items:
+            for word in data["words"].values():
+                texts.append(word["text"])
+                if word["lemma"].lower() != word["text"].lower():
+                    texts.append(word["lemma"])
+        word_ids = get_word_resolver().resolve(texts, language)
+
+        # Named entities
+        entity_ids = bulk_get_or_create_entities(
+            [
+                (item["text"], item["type"].upper())
+                for phrase_item, data, templates in items
+                for item in data["ner"].values()
+            ]
+        )
+
+        # Analysis objects
+        phrase_ids = [phrase_item.id for phrase_item, data, templates in items]
+        analyses = {
+            analysis.phrase_id: analysis
+            for analysis in PhraseAnalysis.objects.filter(
+                analyzer=analyzer, phrase_id__in=phrase_ids
+            )
+        }
+        missing = [
+            item_id for item_id in dict.fromkeys(phrase_ids) if item_id not in analyses
+        ]
+        if missing:
+            PhraseAnalysis.objects.bulk_create(
+                [
+                    PhraseAnalysis(phrase_id=item_id, analyzer=analyzer)
+                    for item_id in missing
+                ],
+                ignore_conflicts=True,
+            )
+            for analysis in PhraseAnalysis.objects.filter(
+                analyzer=analyzer, phrase_id__in=missing
+            ):
+                analyses[analysis.phrase_id] = analysis
+
+        word_frequency = Counter()
+        lemma_frequency = Counter()
+        entity_frequency = Counter()
+        lemma_relations = set()
+        analysis_words = []
+        analysis_entities = []
+        templates_cache = {}
+        result = []
+        for phrase_item, data, templates in items:
+            analysis = analyses[phrase_item.id]
+            phrase_words = set(phrase_item.word_ids)
+            phrase_lemmas = set(phrase_item.lemma_ids)
+            phrase_entities = set(phrase_item.entity_ids)
+            for word in data["words"].values():
+                word_text = word["text"]
+                word_id = word_ids[word_text.lower()]
+                # add word to phrase's word ids and if it's new add it to frequency distribution counter
+                if word_id not in phrase_words:
+                    phrase_words.add(word_id)
+                    phrase_item.word_ids.append(word_id)
+                    word_frequency[word_id] += 1
+                analysis_words.append(
+                    PhraseAnalysis.words.through(
+                        phraseanalysis_id=analysis.id, word_id=word_id
+                    )
+                )
+
+                # word lemma
+                lemma = word["lemma"]
+                if lemma.lower() == word_text.lower():
+                    lemma_frequency[word_id] += 1
+                else:
+                    lemma_id = word_ids[lemma.lower()]
+                    # add lemma to phrase's lemma ids and if it's new add it to frequency distribution counter
+                    if lemma_id not in phrase_lemmas:
+                        phrase_lemmas.add(lemma_id)
+                        phrase_item.lemma_ids.append(lemma_id)
+                        lemma_frequency[lemma_id] += 1
+                    # add lemma as word's lemma using WordRelation: word_obj, lemma_obj
+                    lemma_relations.add((lemma_id, word_id))
+
+            for item in data["ner"].values():
+                entity_id = entity_ids[(item["text"].lower(), item["type"].upper())]
+                if entity_id not in phrase_entities:
+                    phrase_entities.add(entity_id)
+                    phrase_item.entity_ids.append(entity_id)
+                    entity_frequency[entity_id] += 1
+                analysis_entities.append(
+                    PhraseAnalysis.entities.through(
+                        phraseanalysis_id=analysis.id, namedentity_id=entity_id
+                    )
+                )
+
+            # Phrases with the same structure share templates
+            template_key = tuple(sorted(templates.items()))
+            if template_key not in templates_cache:
+                templates_cache[template_key] = get_phrase_template(data, templates)
+            analysis.template_id = templates_cache[template_key]
+            analysis.data = pack_analysis_data(data)
+            analysis.analyzer_version = version
+            analysis.dirty = False
+            result.append(analysis)
+
+        PhraseAnalysis.words.through.objects.bulk_create(
+            analysis_words, ignore_conflicts=True
+        )
+        PhraseAnalysis.entities.through.objects.bulk_create(
+            analysis_entities, ignore_conflicts=True
+        )
+        PhraseAnalysis.objects.bulk_update(
+            list({analysis.id: analysis for analysis in result}.values()),
+            ["template", "data", "analyzer_version", "dirty"],
+        )
+        Phrase.objects.bulk_update(
+            list({item[0].id: item[0] for item in items}.values()),
+            ["word_ids", "lemma_ids", "entity_ids"],
+        )
+
+        # Lemma relations
+        if lemma_relations:
+            # relation words are `[lemma, word]`
+            existing = set(
+                WordRelation.filter_relations(
+                    [words[1] for words in lemma_relations],
+                    direction="incoming",
+                    word_relation=lemma_relation,
+                )
+                .filter(source__in=[words[0] for words in lemma_relations])
+                .values_list("source", "target")
+            )
+            created = [words for words in lemma_relations if words not in existing]
+            WordRelation.objects.bulk_create(
+                [
+                    WordRelation(words=list(words), word_relation=lemma_relation)
+                    for words in created
+                ]
+            )
+            # cached lemmas of this process are updated after commit
+            transaction.on_commit(lambda: get_lemma_map().add(created))
+
+        # Frequency distributions
+        counters = CounterBuffer()
+        counters.update(Word, "frequency_distribution", word_frequency)
+        counters.update(Word, "lemma_frequency_distribution", lemma_frequency)
+        counters.update(NamedEntity, "frequency_distribution", entity_frequency)
+        counters.flush()
+    return result
+
+
+def save_document_phrases(document, sentences, batch_size=None):
+    """
+    Store sentences of a document as it's phrases, sentences are written in bulk batches so memory usage stays flat.
+    Previous phrases of document are removed after all sentences are stored, so if it fails document keeps them
+    and it can be called again.
+    document: `Document` object, it's current phrases are replaced
+    sentences: iterable of sentence texts, can be a generator
+    batch_size: number of sentences which are saved together
+    returns number of stored sentences
+    """
+    from itertools import islice
+
+    import datacore.settings as datacore_settings
+    from datacore.models import Document, Phrase
+    from django.db import connection, transaction
+
+    batch_size = batch_size if batch_size else datacore_settings.PHRASE_BATCH_SIZE
+    sentences = iter(sentences)
+    count = 0
+    document_phrases = set()
+    while True:
+        # sentences are generated outside of transactions, generators may store progress
+        batch = list(dict.fromkeys(islice(sentences, batch_size)))
+        if not batch:
+            break
+        count = count + len(batch)
+        with transaction.atomic():
+            phrases = Phrase.objects.filter(text__in=batch)
+            if document.language:
+                phrases = phrases.filter(language=document.language)
+            phrase_ids = {}
+            for phrase_id, text in phrases.order_by("id").values_list("id", "text"):
+                phrase_ids.setdefault(text, phrase_id)
+            missing = [text for text in batch if text not in phrase_ids]
+            if missing:
+                Phrase.objects.bulk_create(
+                    [Phrase(text=text, language=document.language) for text in missing],
+                    ignore_conflicts=True,
+                )
+                for phrase_id, text in (
+                    Phrase.objects.filter(text__in=missing, language=document.language)
+                    .order_by("id")
+                    .values_list("id", "text")
+                ):
+                    phrase_ids.setdefault(text, phrase_id)
+            Document.phrases.through.objects.bulk_create(
+                [
+                    Document.phrases.through(
+                        document_id=document.id, phrase_id=phrase_ids[text]
+                    )
+                    for text in batch
+                ],
+                ignore_conflicts=True,
+            )
+        document_phrases.update(phrase_ids[text] for text in batch)
+    # remove phrases of previous tokenization
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {Document.phrases.through._meta.db_table} "
+            "WHERE document_id = %s AND NOT (phrase_id = ANY(%s::bigint[]))",
+            [document.id, list(document_phrases)],
+        )
+    return count
+
+
+def get_analyzer_version(analyzer="spacy", language="en", package="en_core_web_sm"):
+    """
+    Get analyzer object and current version of it's pipeline, same as the ones used by analysis functions
+    analyzer: `spacy` or `stanza`
+    returns `(analyzer, version)`
+    """
+    from datacore.models import Analyzer
+
+    if analyzer == "spacy":
+        from datacore.functions.spacy import get_spacy_version
+
+        analyzer, created = Analyzer.objects.get_or_create(title=f"Spacy: {package}")
+        return analyzer, get_spacy_version(package=package)
+    import datacore.settings as datacore_settings
+    from datacore.functions.stanza import get_stanza_version
+
+    analyzer, created = Analyzer.objects.get_or_create(title="Stanza")
+    return analyzer, get_stanza_version(
+        lang=language, processors=datacore_settings.STANZA_PROCESSORS
+    )
+
+
+def analysis_worker_init(analyzer="spacy", language="en", package="en_core_web_sm"):
+    """
+    Initialize a process which analyzes phrases, used as `multiprocessing.Pool` initializer.
+    Each process loads it's own NLP pipeline and database connection.
+    analyzer: `spacy` or `stanza`
+    package: spacy's pipeline package, only used by spacy
+    """
+    import django
+
+    django.setup()
+    from django.db import connections
+
+    # connections inherited from parent process can't be shared
+    connections.close_all()
+
+    global ANALYSIS_WORKER
+    ANALYSIS_WORKER = {"analyzer": analyzer, "language": language, "package": package}
+    if analyzer == "spacy":
+        from datacore.functions.spacy import get_spacy
+
+        get_spacy(package=package)
+    else:
+        import datacore.settings as datacore_settings
+        from datacore.functions.stanza import get_stanza
+
+        get_stanza(lang=language, processors=datacore_settings.STANZA_PROCESSORS)
+
+
+def analyze_phrase_ids(phrase_ids):
+    """
+    Analyze and save a chunk of phrases in a process initialized by `analysis_worker_init`
+    phrase_ids: list of phrase ids, analyzed as a single batch
+    returns `(analyzed, failed, stats)`, lists of phrase ids and word resolver stats of the process,
+    if the batch fails phrases are analyzed one by one to find failed phrases
+    """
+    import os
+
+    from datacore.functions.cache import get_word_resolver
+    from datacore.models import Phrase
+
+    options = ANALYSIS_WORKER
+    if options["analyzer"] == "spacy":
+        from datacore.functions.spacy import (
+            spacy_batch_phrase_analysis,
+            spacy_phrase_analysis,
+        )
+
+        def batch_analysis(phrases):
+            spacy_batch_phrase_analysis(
+                phrases,
+                language=options["language"],
+                package=options["package"],
+                batch_size=len(phrases),
+            )
+
+        def phrase_analysis(phrase):
+            spacy_phrase_analysis(
+                phrase_item=phrase,
+                language=options["language"],
+                package=options["package"],
+            )
+
+    else:
+        from datacore.functions.stanza import (
+            stanza_batch_phrase_analysis,
+            stanza_phrase_analysis,
+        )
+
+        def batch_analysis(phrases):
+            stanza_batch_phrase_analysis(
+                phrases, language=options["language"], batch_size=len(phrases)
+            )
+
+        def phrase_analysis(phrase):
+            stanza_phrase_analysis(phrase_item=phrase, language=options["language"])
+
+    phrases = list(Phrase.objects.filter(id__in=phrase_ids).order_by("id"))
+    analyzed = []
+    failed = []
+    try:
+        batch_analysis(phrases)
+        analyzed = [phrase.id for phrase in phrases]
+    except Exception:
+        for phrase in Phrase.objects.filter(id__in=phrase_ids).order_by("id"):
+            try:
+                phrase_analysis(phrase)
+                analyzed.append(phrase.id)
+            except Exception:
+                failed.append(phrase.id)
+    # stats are totals of the process, so the last stats of each process are aggregated
+    return analyzed, failed, dict(get_word_resolver().stats(), pid=os.getpid())
@@ -0,0 +1,103 @@
+# Storage formats of `PhraseAnalysis.data` and `AnalysisCache.data`
+#   1: dictionaries of words and named entities, keyed by their ids. each item is a dictionary of it's attributes
+#   2: columnar, each section stores a list per attribute and tags are stored as indexes of a vocabulary of the row
+ANALYSIS_DATA_FORMAT = 2
+
+# attributes which are stored as indexes of the row's vocabulary
+INTERNED_ATTRIBUTES = {
+    "words": ["upos", "xpos", "dep_rel", "feats"],
+    "ner": ["type"],
+}
+
+
+def get_section_keys(section, items):
+    # default keys of items, they aren't stored when items use them
+    if section == "words":
+        return [str(item.get("id")) for item in items]
+    return [str(i) for i in range(len(items))]
+
+
+def pack_analysis_data(data):
+    """
+    Convert analysis data to columnar format, packed data is returned unchanged
+    """
+    if not data or data.get("format") == ANALYSIS_DATA_FORMAT:
+        return data
+    result = {"format": ANALYSIS_DATA_FORMAT, "vocab": {}}
+    for section, value in data.items():
+        if section not in INTERNED_ATTRIBUTES:
+            result[section] = value
+            continue
+        keys = [str(key) for key in value.keys()]
+        items = list(value.values())
+        columns = {}
+        for item in items:
+            for attribute in item.keys():
+                columns.setdefault(attribute, [])
+        for attribute in columns:
+            column = [item.get(attribute) for item in items]
+            if attribute == "feats":
+                column = [
+                    "|".join(f"{key}={value}" for key, value in feats.items())
+                    if feats is not None
+                    else None
+                    for feats in column
+                ]
+            if attribute in INTERNED_ATTRIBUTES[section]:
+                vocab = result["vocab"].setdefault(f"{section}.{attribute}", [])
+                indexes = {tag: i for i, tag in enumerate(vocab)}
+                for i, tag in enumerate(column):
+                    if tag is None:
+                        continue
+                    if tag not in indexes:
+                        indexes[tag] = len(vocab)
+                        vocab.append(tag)
+                    column[i] = indexes[tag]
+            columns[attribute] = column
+        if keys != get_section_keys(section, items):
+            columns["_keys"] = keys
+        columns["_count"] = len(items)
+        result[section] = columns
+    return result
+
+
+def unpack_analysis_data(data):
+    """
+    Convert analysis data of any format to dictionaries of words and named entities
+    """
+    if not data or data.get("format") != ANALYSIS_DATA_FORMAT:
+        return data
+    result = {}
+    for section, value in data.items():
+        if section in ["format", "vocab"]:
+            continue
+        if section not in INTERNED_ATTRIBUTES:
+            result[section] = value
+            continue
+        columns = {}
+        for attribute, column in value.items():
+            if attribute.startswith("_"):
+                continue
+            vocab = data["vocab"].get(f"{section}.{attribute}")
+            if vocab is not None:
+                column = [vocab[i] if i is not None else None for i in column]
+            if attribute == "feats":
+                column = [
+                    dict(feat.split("=", 1) for feat in feats.split("|") if feat)
+                    if feats is not None
+                    else None
+                    for feats in column
+                ]
+            columns[attribute] = column
+        # words without features don't have the attribute
+        items = [
+            {
+                attribute: column[i]
+                for attribute, column in columns.items()
+                if not (attribute == "feats" and column[i] is None)
+            }
+            for i in range(value["_count"])
+        ]
+        keys = value.get("_keys") or get_section_keys(section, items)
+        result[section] = dict(zip(keys, items))
+    return result
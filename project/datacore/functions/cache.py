@@ -0,0 +1,345 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Process-local dictionary with a bounded size, least recently used items are evicted first.
+    maxsize: maximum number of stored items
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        try:
+            value = self.items[key]
+        except KeyError:
+            self.misses = self.misses + 1
+            return default
+        self.items.move_to_end(key)
+        self.hits = self.hits + 1
+        return value
+
+    def set(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+    def clear(self):
+        self.items.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self.items),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0,
+        }
+
+
+class WordResolver:
+    """
+    Resolve word texts to `Word` ids without a database round trip for frequent words.
+    Cache keys are `(lower cased text, language id)`, missing words are fetched or created in bulk.
+    maxsize: maximum number of cached words
+    warm_size: number of most frequent words of a language which are loaded on it's first use
+    """
+
+    def __init__(self, maxsize=100000, warm_size=10000):
+        self.cache = LRUCache(maxsize=maxsize)
+        self.warm_size = warm_size
+        self.warmed_languages = set()
+
+    def warm(self, language, count=None):
+        """
+        Load most frequent words of language by `frequency_distribution`
+        """
+        from datacore.models import Word
+
+        count = self.warm_size if count is None else count
+        self.warmed_languages.add(language.id)
+        words = (
+            Word.objects.filter(language=language)
+            .order_by("-frequency_distribution")
+            .values_list("id", "text")[:count]
+        )
+        # least frequent words are added first, so they are evicted first
+        for word_id, text in reversed(list(words)):
+            self.cache.set((text.lower(), language.id), word_id)
+
+    def resolve(self, texts, language):
+        """
+        Get or create words, same as `bulk_get_or_create_words`
+        returns a dictionary of lower cased texts to word ids
+        """
+        from datacore.functions.analysis import bulk_get_or_create_words
+        from django.db import transaction
+
+        if language.id not in self.warmed_languages and self.warm_size:
+            self.warm(language)
+        words = {}
+        missing = {}
+        for text in texts:
+            key = text.lower()
+            if key in words or key in missing:
+                continue
+            word_id = self.cache.get((key, language.id))
+            if word_id is None:
+                missing[key] = text
+            else:
+                words[key] = word_id
+        if missing:
+            created = bulk_get_or_create_words(list(missing.values()), language)
+            words.update(created)
+
+            # new words are cached after commit, ids of rolled back words shouldn't be reused
+            def store():
+                for key, word_id in created.items():
+                    self.cache.set((key, language.id), word_id)
+
+            transaction.on_commit(store)
+        return words
+
+    def clear(self):
+        self.cache.clear()
+        self.warmed_languages.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+# globally available word resolver of current process
+def get_word_resolver():
+    global WORD_RESOLVER
+    try:
+        WORD_RESOLVER
+    except NameError:
+        import datacore.settings as datacore_settings
+
+        WORD_RESOLVER = WordResolver(
+            maxsize=datacore_settings.WORD_CACHE_SIZE,
+            warm_size=datacore_settings.WORD_CACHE_WARM_SIZE,
+        )
+    return WORD_RESOLVER
+
+
+# globally available template registry of current process, maps template signatures to ids
+def get_template_registry():
+    global TEMPLATE_REGISTRY
+    try:
+        TEMPLATE_REGISTRY
+    except NameError:
+        import datacore.settings as datacore_settings
+
+        TEMPLATE_REGISTRY = LRUCache(maxsize=datacore_settings.TEMPLATE_CACHE_SIZE)
+    return TEMPLATE_REGISTRY
+
+
+class LemmaMap:
+    """
+    Map word ids to ids of their lemmas using "Lemma" word relations which are created by analyzers.
+    Lemmas of each word are cached for `ttl` seconds, so relations created by other processes are found afterwards.
+    maxsize: maximum number of cached words
+    ttl: seconds which lemmas of a word are cached
+    """
+
+    def __init__(self, maxsize=100000, ttl=300):
+        self.cache = LRUCache(maxsize=maxsize)
+        self.ttl = ttl
+
+    def lookup(self, word_ids):
+        """
+        returns a dictionary of word ids to lists of their lemma ids
+        """
+        import time
+
+        from datacore.models import WordRelation
+
+        now = time.time()
+        lemmas = {}
+        missing = []
+        for word_id in dict.fromkeys(word_ids):
+            item = self.cache.get(word_id)
+            if item is None or item[0] < now:
+                missing.append(word_id)
+            else:
+                lemmas[word_id] = item[1]
+        if missing:
+            found = {word_id: [] for word_id in missing}
+            # relation words are `[lemma, word]`
+            for lemma_id, word_id in (
+                WordRelation.filter_relations(missing, direction="incoming")
+                .filter(word_relation__title="Lemma")
+                .values_list("source", "target")
+            ):
+                found[word_id].append(lemma_id)
+            for word_id, lemma_ids in found.items():
+                self.cache.set(word_id, (now + self.ttl, lemma_ids))
+            lemmas.update(found)
+        return lemmas
+
+    def add(self, relations):
+        """
+        Add lemmas of cached words
+        relations: list of `(lemma id, word id)`
+        """
+        for lemma_id, word_id in relations:
+            item = self.cache.get(word_id)
+            if item is not None and lemma_id not in item[1]:
+                item[1].append(lemma_id)
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        return self.cache.stats()
+
+
+# globally available lemma map of current process
+def get_lemma_map():
+    global LEMMA_MAP
+    try:
+        LEMMA_MAP
+    except NameError:
+        import datacore.settings as datacore_settings
+
+        LEMMA_MAP = LemmaMap(
+            maxsize=datacore_settings.LEMMA_CACHE_SIZE,
+            ttl=datacore_settings.LEMMA_CACHE_TTL,
+        )
+    return LEMMA_MAP
+
+
+def get_text_hash(text):
+    """
+    Hash of normalized text, used as content address of analysis cache
+    """
+    import hashlib
+    import unicodedata
+
+    text = unicodedata.normalize("NFC", text).strip()
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# analysis cache lookups of current process
+ANALYSIS_CACHE_STATS = {"hits": 0, "misses": 0, "stored": 0}
+
+
+def get_cached_analyses(analyzer, version, texts):
+    """
+    Get stored analysis data of texts and mark them as recently used
+    returns a dictionary of text hashes to `(data, templates)`
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.analysis_data import unpack_analysis_data
+    from datacore.models import AnalysisCache
+    from django.db.models import F
+    from django.utils import timezone
+
+    hashes = {get_text_hash(text) for text in texts}
+    if not datacore_settings.ANALYSIS_CACHE_SIZE or not hashes:
+        return {}
+    result = {}
+    ids = []
+    for item_id, text_hash, data, templates in AnalysisCache.objects.filter(
+        analyzer=analyzer, version=version, text_hash__in=hashes
+    ).values_list("id", "text_hash", "data", "templates"):
+        ids.append(item_id)
+        result[text_hash] = (unpack_analysis_data(data), templates)
+    if ids:
+        AnalysisCache.objects.filter(id__in=ids).update(
+            hits=F("hits") + 1, last_used=timezone.now()
+        )
+    ANALYSIS_CACHE_STATS["hits"] = ANALYSIS_CACHE_STATS["hits"] + len(result)
+    ANALYSIS_CACHE_STATS["misses"] = (
+        ANALYSIS_CACHE_STATS["misses"] + len(hashes) - len(result)
+    )
+    return result
+
+
+def store_cached_analyses(analyzer, version, items):
+    """
+    Store analysis data of texts, least recently used items are evicted when the cache is full,
+    which is checked once in `ANALYSIS_CACHE_EVICT_INTERVAL` stored items of each process
+    items: list of `(text, data, templates)`
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.analysis_data import pack_analysis_data
+    from datacore.models import AnalysisCache
+
+    if not datacore_settings.ANALYSIS_CACHE_SIZE or not items:
+        return
+    AnalysisCache.objects.bulk_create(
+        [
+            AnalysisCache(
+                text_hash=get_text_hash(text),
+                analyzer=analyzer,
+                version=version,
+                data=pack_analysis_data(data),
+                templates=templates,
+            )
+            for text, data, templates in items
+        ],
+        ignore_conflicts=True,
+    )
+    # counting all items is slow, so the cache can exceed it's size until enough items are stored
+    ANALYSIS_CACHE_STATS["stored"] = ANALYSIS_CACHE_STATS["stored"] + len(items)
+    if (
+        ANALYSIS_CACHE_STATS["stored"]
+        >= datacore_settings.ANALYSIS_CACHE_EVICT_INTERVAL
+    ):
+        ANALYSIS_CACHE_STATS["stored"] = 0
+        evict_analysis_cache(datacore_settings.ANALYSIS_CACHE_SIZE)
+
+
+def evict_analysis_cache(size):
+    """
+    Delete least recently used items, so at most `size` items remain
+    returns number of deleted items
+    """
+    from datacore.models import AnalysisCache
+
+    excess = AnalysisCache.objects.count() - size
+    if excess <= 0:
+        return 0
+    deleted, rows = AnalysisCache.objects.filter(
+        id__in=AnalysisCache.objects.order_by("last_used", "id").values("id")[:excess]
+    ).delete()
+    return deleted
+
+
+def analysis_cache_stats():
+    """
+    Size of analysis cache and it's hit rate, for current process and for stored items
+    """
+    from datacore.models import AnalysisCache
+    from django.db.models import Count, Sum
+
+    stored = AnalysisCache.objects.aggregate(items=Count("id"), hits=Sum("hits"))
+    lookups = ANALYSIS_CACHE_STATS["hits"] + ANALYSIS_CACHE_STATS["misses"]
+    stored_hits = stored["hits"] or 0
+    return {
+        "items": stored["items"],
+        "stored_hits": stored_hits,
+        # every stored item is created by a miss
+        "stored_hit_rate": stored_hits / (stored_hits + stored["items"])
+        if stored["items"]
+        else 0,
+        "hits": ANALYSIS_CACHE_STATS["hits"],
+        "misses": ANALYSIS_CACHE_STATS["misses"],
+        "hit_rate": ANALYSIS_CACHE_STATS["hits"] / lookups if lookups else 0,
+    }
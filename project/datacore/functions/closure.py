@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+
+# relation types of concept hierarchies, True if relations point from a concept to it's parent
+# it should match `datacore_hierarchy_types` database function, see `ConceptClosure` migration
+HIERARCHIES = {
+    "kind": {"HYPONYM": True, "INSTANCE_OF": True, "HYPERNYM": False},
+    "part": {"MEMBER_HOLONYM": True, "PART_HOLONYM": True, "SUBSTANCE_HOLONYM": True},
+}
+
+
+def check_hierarchy(hierarchy):
+    if hierarchy not in HIERARCHIES:
+        raise ValueError(
+            f"Unknown hierarchy `{hierarchy}`, choices are: {', '.join(HIERARCHIES)}"
+        )
+
+
+def is_a(concept, ancestor, hierarchy="kind"):
+    """
+    Check if a concept is below another one in a hierarchy, E.g. "dog" is a kind of "animal", using one index lookup
+    """
+    from datacore.models import ConceptClosure
+
+    check_hierarchy(hierarchy)
+    return ConceptClosure.objects.filter(
+        hierarchy=hierarchy, descendant=concept, ancestor=ancestor
+    ).exists()
+
+
+def get_ancestors(concept, hierarchy="kind", max_depth=None):
+    """
+    Concepts above a concept, loaded with one query
+    returns `Concept` queryset with `depth` of each concept, nearest ones first
+    """
+    return get_closure_concepts("descendant", "ancestor", concept, hierarchy, max_depth)
+
+
+def get_descendants(concept, hierarchy="kind", max_depth=None):
+    """
+    Concepts below a concept, loaded with one query
+    returns `Concept` queryset with `depth` of each concept, nearest ones first
+    """
+    return get_closure_concepts("ancestor", "descendant", concept, hierarchy, max_depth)
+
+
+def get_closure_concepts(field, related_field, concept, hierarchy, max_depth):
+    from datacore.models import Concept, ConceptClosure
+    from django.db.models import OuterRef, Subquery
+
+    check_hierarchy(hierarchy)
+    closure = ConceptClosure.objects.filter(hierarchy=hierarchy, **{field: concept})
+    if max_depth is not None:
+        closure = closure.filter(depth__lte=max_depth)
+    return (
+        Concept.objects.filter(id__in=closure.values(related_field))
+        .annotate(
+            depth=Subquery(
+                closure.filter(**{related_field: OuterRef("id")}).values("depth")[:1]
+            )
+        )
+        .order_by("depth", "id")
+    )
+
+
+def rebuild_closure(hierarchies=None):
+    """
+    Recompute closure of all concepts, E.g. after relations are imported with `deferred_closure`
+    returns dictionary of hierarchies to number of rows
+    """
+    from django.db import connection, transaction
+
+    hierarchies = hierarchies if hierarchies else list(HIERARCHIES)
+    result = {}
+    for hierarchy in hierarchies:
+        check_hierarchy(hierarchy)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT datacore_rebuild_closure(%s)", [hierarchy])
+            result[hierarchy] = cursor.fetchone()[0]
+    return result
+
+
+@contextmanager
+def deferred_closure():
+    """
+    Skip closure maintenance of each changed relation in a transaction and rebuild all of it at the end,
+    which is faster for bulk imports of relations
+    """
+    from django.db import connection, transaction
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL datacore.closure = 'off'")
+        yield
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL datacore.closure = 'on'")
+        rebuild_closure()
@@ -0,0 +1,197 @@
+from collections import Counter
+
+
+class CounterBuffer:
+    """
+    Collect counter increments in memory and add them to database rows with one `UPDATE ... SET x = x + n` statement per model.
+    Rows are locked in order of their ids before update, so concurrent workers never lose increments or deadlock.
+    chunk_size: maximum number of rows updated by each statement
+    """
+
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.counters = {}
+
+    def add(self, model, field, item_id, value=1):
+        self.counters.setdefault(model, {}).setdefault(field, Counter())[
+            item_id
+        ] += value
+
+    def update(self, model, field, counter):
+        """
+        counter: dictionary of object ids to the value which should be added to their field
+        """
+        self.counters.setdefault(model, {}).setdefault(field, Counter()).update(counter)
+
+    def clear(self):
+        self.counters = {}
+
+    def flush(self):
+        """
+        Write buffered increments to database and clear the buffer
+        """
+        from django.db import connection, transaction
+
+        quote = connection.ops.quote_name
+        with transaction.atomic():
+            for model, fields in self.counters.items():
+                fields = {
+                    field: counter for field, counter in fields.items() if counter
+                }
+                if not fields:
+                    continue
+                table = quote(model._meta.db_table)
+                pk = quote(model._meta.pk.column)
+                columns = [
+                    quote(model._meta.get_field(field).column) for field in fields
+                ]
+                ids = sorted(
+                    set().union(*[counter.keys() for counter in fields.values()])
+                )
+                value_names = ", ".join(f"n{i}" for i in range(len(columns)))
+                assignments = ", ".join(
+                    f"{column} = t.{column} + v.n{i}"
+                    for i, column in enumerate(columns)
+                )
+                row_template = "({})".format(", ".join(["%s"] * (len(columns) + 1)))
+                with connection.cursor() as cursor:
+                    for start in range(0, len(ids), self.chunk_size):
+                        chunk = ids[start : start + self.chunk_size]
+                        cursor.execute(
+                            f"SELECT {pk} FROM {table} WHERE {pk} = ANY(%s) ORDER BY {pk} FOR UPDATE",
+                            [chunk],
+                        )
+                        params = []
+                        for item_id in chunk:
+                            params.append(item_id)
+                            params.extend(
+                                counter[item_id] for counter in fields.values()
+                            )
+                        cursor.execute(
+                            f"UPDATE {table} AS t SET {assignments} "
+                            f"FROM (VALUES {', '.join([row_template] * len(chunk))}) "
+                            f"AS v(id, {value_names}) WHERE t.{pk} = v.id",
+                            params,
+                        )
+        self.clear()
+
+
+def recompute_counters(chunk_size=1000):
+    """
+    Recompute frequency distributions of words, lemmas and named entities from stored phrase analyses.
+    Analyses of each phrase are replayed in the same way `save_phrase_analyses` counts them.
+    Should be called while no analysis is running.
+    returns a dictionary of number of phrases and updated counters
+    """
+    from datacore.functions.analysis_data import unpack_analysis_data
+    from datacore.models import NamedEntity, PhraseAnalysis, Word
+    from django.db import transaction
+
+    word_frequency = Counter()
+    lemma_frequency = Counter()
+    entity_frequency = Counter()
+
+    phrase_ids = list(
+        PhraseAnalysis.objects.order_by("phrase_id")
+        .values_list("phrase_id", flat=True)
+        .distinct()
+    )
+    for start in range(0, len(phrase_ids), chunk_size):
+        chunk = phrase_ids[start : start + chunk_size]
+        analyses = [
+            (analysis_id, phrase_id, unpack_analysis_data(data))
+            for analysis_id, phrase_id, data in PhraseAnalysis.objects.filter(
+                phrase_id__in=chunk
+            )
+            .order_by("phrase_id", "id")
+            .values_list("id", "phrase_id", "data")
+        ]
+        analysis_ids = [analysis[0] for analysis in analyses]
+        word_rows = PhraseAnalysis.words.through.objects.filter(
+            phraseanalysis_id__in=analysis_ids
+        ).values_list("phraseanalysis_id", "word_id", "word__text", "word__language_id")
+        words = {}
+        for analysis_id, word_id, text, language_id in word_rows:
+            words.setdefault(analysis_id, {})[text.lower()] = (word_id, language_id)
+        entity_rows = PhraseAnalysis.entities.through.objects.filter(
+            phraseanalysis_id__in=analysis_ids
+        ).values_list(
+            "phraseanalysis_id",
+            "namedentity_id",
+            "namedentity__text",
+            "namedentity__ne_type",
+        )
+        entities = {}
+        for analysis_id, entity_id, text, ne_type in entity_rows:
+            entities.setdefault(analysis_id, {})[(text.lower(), ne_type)] = entity_id
+
+        # lemmas which are different from their words are only linked by text
+        lemma_keys = set()
+        for analysis_id, phrase_id, data in analyses:
+            for word in (data or {}).get("words", {}).values():
+                if word["lemma"].lower() != word["text"].lower():
+                    item = words.get(analysis_id, {}).get(word["text"].lower())
+                    if item:
+                        lemma_keys.add((word["lemma"].lower(), item[1]))
+        lemma_ids = {}
+        if lemma_keys:
+            for word_id, text, language_id in Word.objects.filter(
+                text__in=[key[0] for key in lemma_keys],
+                language_id__in=[key[1] for key in lemma_keys],
+            ).values_list("id", "text", "language_id"):
+                lemma_ids[(text.lower(), language_id)] = word_id
+
+        # replay analyses of each phrase
+        seen_phrase = None
+        for analysis_id, phrase_id, data in analyses:
+            if phrase_id != seen_phrase:
+                seen_phrase = phrase_id
+                phrase_words = set()
+                phrase_lemmas = set()
+                phrase_entities = set()
+            data = data or {}
+            analysis_words = words.get(analysis_id, {})
+            for word in data.get("words", {}).values():
+                item = analysis_words.get(word["text"].lower())
+                if item is None:
+                    continue
+                word_id, language_id = item
+                if word_id not in phrase_words:
+                    phrase_words.add(word_id)
+                    word_frequency[word_id] += 1
+                lemma = word["lemma"].lower()
+                if lemma == word["text"].lower():
+                    lemma_frequency[word_id] += 1
+                elif (lemma, language_id) in lemma_ids:
+                    lemma_id = lemma_ids[(lemma, language_id)]
+                    if lemma_id not in phrase_lemmas:
+                        phrase_lemmas.add(lemma_id)
+                        lemma_frequency[lemma_id] += 1
+            analysis_entities = entities.get(analysis_id, {})
+            for item in data.get("ner", {}).values():
+                entity_id = analysis_entities.get(
+                    (item["text"].lower(), item["type"].upper())
+                )
+                if entity_id and entity_id not in phrase_entities:
+                    phrase_entities.add(entity_id)
+                    entity_frequency[entity_id] += 1
+
+    buffer = CounterBuffer()
+    buffer.update(Word, "frequency_distribution", word_frequency)
+    buffer.update(Word, "lemma_frequency_distribution", lemma_frequency)
+    buffer.update(NamedEntity, "frequency_distribution", entity_frequency)
+    with transaction.atomic():
+        Word.objects.exclude(frequency_distribution=0).update(frequency_distribution=0)
+        Word.objects.exclude(lemma_frequency_distribution=0).update(
+            lemma_frequency_distribution=0
+        )
+        NamedEntity.objects.exclude(frequency_distribution=0).update(
+            frequency_distribution=0
+        )
+        buffer.flush()
+    return {
+        "phrases": len(phrase_ids),
+        "words": len(word_frequency),
+        "lemmas": len(lemma_frequency),
+        "entities": len(entity_frequency),
+    }
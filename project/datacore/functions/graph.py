@@ -0,0 +1,239 @@
+GRAPH_DIRECTIONS = ["outgoing", "incoming", "both"]
+
+# fixed options of each kind of graph, which match `generate_relation_graph`, `generate_hierarchy_graph`
+# and `generate_neighborhood_graph`
+GRAPH_KINDS = {
+    "direct": {"direction": "both", "max_depth": 1},
+    "hierarchy": {"direction": "outgoing", "relation_types": ["HYPONYM"]},
+    "neighborhood": {},
+}
+
+
+def get_walk_query(direction, relation_types=None):
+    """
+    Recursive query of concepts reachable from a root concept by relations, each concept with it's shortest depth
+    Parameters are `root`, `max_depth`, `max_nodes` and `relation_types` if relation types are filtered
+    Concepts are walked level by level, each level is one row of it's concepts and concepts visited so far,
+    so visited concepts aren't expanded again and the walk stops when `max_nodes` concepts are found.
+    """
+    from datacore.models import Relation
+
+    table = Relation._meta.db_table
+    condition = (
+        "AND r.relation_type = ANY(%(relation_types)s)" if relation_types else ""
+    )
+    steps = {
+        "outgoing": [("target", "source")],
+        "incoming": [("source", "target")],
+        "both": [("target", "source"), ("source", "target")],
+    }[direction]
+    # each direction is a separate indexed lookup of (source, type) or (target, type)
+    neighbors = " UNION ALL ".join(
+        f"SELECT r.{node} AS node FROM {table} r WHERE r.{edge} = ANY(w.frontier) {condition}"
+        for node, edge in steps
+    )
+    # nearest concepts are kept, only as many new concepts as remain below max nodes are added
+    return f"""
+        WITH RECURSIVE walk(frontier, visited, depth) AS (
+            SELECT ARRAY[%(root)s::bigint], ARRAY[%(root)s::bigint], 0
+            UNION ALL
+            SELECT n.nodes, w.visited || n.nodes, w.depth + 1
+            FROM walk w CROSS JOIN LATERAL (
+                SELECT array_agg(node ORDER BY node) AS nodes FROM (
+                    SELECT DISTINCT c.node FROM ({neighbors}) c
+                    WHERE c.node IS NOT NULL AND NOT c.node = ANY(w.visited)
+                    ORDER BY c.node LIMIT %(max_nodes)s - cardinality(w.visited)
+                ) l
+            ) n
+            WHERE w.depth < %(max_depth)s AND cardinality(w.visited) < %(max_nodes)s
+                AND n.nodes IS NOT NULL
+        )
+        SELECT unnest(frontier) AS node, depth FROM walk
+        ORDER BY depth, node LIMIT %(max_nodes)s
+    """
+
+
+def get_node_query(nodes):
+    """
+    Query of concept payloads, titles match `Concept.get_title`
+    nodes: query of `node` and `depth` columns
+    """
+    from datacore.models import Concept, Word
+
+    synonyms = Concept.synonyms.through._meta.db_table
+    return f"""
+        WITH nodes AS ({nodes})
+        SELECT nodes.node, nodes.depth, c.pos, string_agg(w.text, ' ,')
+        FROM nodes
+        JOIN {Concept._meta.db_table} c ON c.id = nodes.node
+        LEFT JOIN {synonyms} s ON s.concept_id = c.id
+        LEFT JOIN {Word._meta.db_table} w ON w.id = s.word_id
+        GROUP BY nodes.node, nodes.depth, c.pos
+    """
+
+
+def get_subgraph(
+    concept, direction="both", relation_types=None, max_depth=None, max_nodes=None
+):
+    """
+    Concepts which are reachable from a concept and relations between them.
+    Relations are traversed in graph snapshot if `GRAPH_SNAPSHOT` setting is enabled, otherwise by a recursive query,
+    in both cases concepts are loaded with one query.
+    concept: root concept id
+    direction: follow `outgoing` relations from source to target, `incoming` relations or `both`
+    relation_types: list of followed relation type codes, E.g. ["HYPONYM"], defaults to all of them
+    max_depth: maximum number of relations from root, defaults to `GRAPH_MAX_DEPTH` setting
+    max_nodes: maximum number of concepts, nearest ones are kept, defaults to `GRAPH_MAX_NODES` setting
+    returns dictionary of concept ids to `{"depth", "pos", "title"}` and list of `(id, source, target, relation type)`
+    """
+    import datacore.settings as datacore_settings
+    from datacore.models import Relation
+    from django.db import connection
+
+    if direction not in GRAPH_DIRECTIONS:
+        raise ValueError(f"Unknown direction `{direction}`")
+    max_depth = (
+        max_depth if max_depth is not None else datacore_settings.GRAPH_MAX_DEPTH
+    )
+    max_nodes = (
+        max_nodes if max_nodes is not None else datacore_settings.GRAPH_MAX_NODES
+    )
+    relation_types = list(relation_types) if relation_types else None
+
+    if datacore_settings.GRAPH_SNAPSHOT:
+        from datacore.functions.graph_snapshot import get_graph_snapshot
+
+        depths, edges = get_graph_snapshot().subgraph(
+            concept, direction, relation_types, max_depth, max_nodes
+        )
+        # concepts without relations aren't in snapshot
+        depths = depths if depths else {int(concept): 0}
+        sql = get_node_query(
+            "SELECT * FROM unnest(%(nodes)s::bigint[], %(depths)s::integer[]) AS nodes(node, depth)"
+        )
+        params = {"nodes": list(depths), "depths": list(depths.values())}
+    else:
+        edges = None
+        sql = get_node_query(get_walk_query(direction, relation_types))
+        params = {
+            "root": int(concept),
+            "max_depth": max_depth,
+            "max_nodes": max_nodes,
+            "relation_types": relation_types,
+        }
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        nodes = {
+            node: {"depth": depth, "pos": pos, "title": title or ""}
+            for node, depth, pos, title in cursor.fetchall()
+        }
+
+    if edges is None:
+        edges = Relation.objects.filter(source__in=nodes, target__in=nodes)
+        if relation_types:
+            edges = edges.filter(relation_type__in=relation_types)
+        edges = list(
+            edges.order_by("id").values_list("id", "source", "target", "relation_type")
+        )
+    else:
+        # relations of concepts which are deleted after the snapshot is refreshed
+        edges = [edge for edge in edges if edge[1] in nodes and edge[2] in nodes]
+    return nodes, edges
+
+
+def get_graph_version():
+    """
+    Version of relations, it's increased in commit order by each change of relations, see `RelationVersion`
+    """
+    from datacore.functions.graph_snapshot import get_relation_version
+
+    return get_relation_version()
+
+
+def get_graph_options(
+    kind, direction="both", relation_types=None, max_depth=None, max_nodes=None
+):
+    """
+    Options of a graph with fixed options of it's kind and defaults, graphs with the same options are the same
+    returns dictionary of parameters of `get_subgraph`
+    """
+    import datacore.settings as datacore_settings
+
+    if kind not in GRAPH_KINDS:
+        raise ValueError(f"Unknown graph `{kind}`")
+    options = GRAPH_KINDS[kind]
+    return {
+        "direction": options.get("direction", direction),
+        "relation_types": sorted(relation_types or options.get("relation_types", []))
+        or None,
+        "max_depth": options.get("max_depth", max_depth),
+        "max_nodes": max_nodes
+        if max_nodes is not None
+        else datacore_settings.GRAPH_MAX_NODES,
+    }
+
+
+def get_graph_key(kind, concept, version, **options):
+    """
+    Cache key and ETag of a graph, options are parameters of `get_graph_data`
+    """
+    import hashlib
+    import json
+
+    options = json.dumps(get_graph_options(kind, **options), sort_keys=True)
+    digest = hashlib.md5(f"{kind}:{concept}:{version}:{options}".encode()).hexdigest()
+    return f"datacore:graph:{digest}"
+
+
+def get_graph_data(
+    kind,
+    concept,
+    direction="both",
+    relation_types=None,
+    max_depth=None,
+    max_nodes=None,
+    version=None,
+):
+    """
+    JSON serializable graph of a concept, cached until relations are changed or `GRAPH_CACHE_TIMEOUT` seconds
+    kind: `direct` relations of concept, it's `hierarchy` or a `neighborhood` of `max_depth` relations
+    version: version of relations, defaults to `get_graph_version`
+    returns dictionary of `version`, `nodes` and `edges`, None if concept doesn't exist
+    """
+    import datacore.settings as datacore_settings
+    from datacore.components import RELATION
+    from django.core.cache import cache
+
+    options = get_graph_options(kind, direction, relation_types, max_depth, max_nodes)
+    version = version if version is not None else get_graph_version()
+    key = get_graph_key(kind, concept, version, **options)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    nodes, edges = get_subgraph(concept, **options)
+    if int(concept) not in nodes:
+        return None
+    if kind == "direct":
+        # relations between neighbors aren't direct relations of concept
+        edges = [edge for edge in edges if int(concept) in edge[1:3]]
+    titles = dict(RELATION)
+    data = {
+        "concept": int(concept),
+        "version": version,
+        # nearest concepts are kept when there are more of them
+        "truncated": len(nodes) >= options["max_nodes"],
+        "nodes": [dict(id=node, **values) for node, values in nodes.items()],
+        "edges": [
+            {
+                "id": key,
+                "source": source,
+                "target": target,
+                "relation_type": relation_type,
+                "title": titles.get(relation_type),
+            }
+            for key, source, target, relation_type in edges
+        ],
+    }
+    cache.set(key, data, datacore_settings.GRAPH_CACHE_TIMEOUT)
+    return data
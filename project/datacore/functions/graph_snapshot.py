@@ -0,0 +1,615 @@
+import threading
+
+# stored arrays of a snapshot, relation endpoints are concept ids and node positions in `nodes`
+SNAPSHOT_ARRAYS = [
+    "nodes",
+    "edge_ids",
+    "edge_sources",
+    "edge_targets",
+    "edge_types",
+    "edge_source_nodes",
+    "edge_target_nodes",
+    "out_indptr",
+    "out_indices",
+    "in_indptr",
+    "in_indices",
+    "out_all_indptr",
+    "out_all_indices",
+    "in_all_indptr",
+    "in_all_indices",
+]
+
+
+def build_csr(keys, others, types, type_count, node_count):
+    """
+    Compressed sparse row arrays of relations, grouped by relation type and then by node
+    keys: node positions which relations are grouped by, `others` are their neighbors
+    Relations of type `t` and node `n` are `indptr[t * node_count + n]:indptr[t * node_count + n + 1]`
+    returns indptr and neighbor node positions
+    """
+    import numpy as np
+
+    order = np.lexsort((others, keys, types))
+    counts = np.bincount(
+        types.astype(np.int64) * node_count + keys, minlength=type_count * node_count
+    )
+    indptr = np.zeros(
+        type_count * node_count + 1,
+        dtype=np.int32 if len(keys) < 2**31 else np.int64,
+    )
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, others[order].astype(np.int32)
+
+
+def build_snapshot(watermark, types, edge_ids, edge_sources, edge_targets, edge_types):
+    """
+    Build a snapshot from relation arrays
+    types: relation type codes, `edge_types` are their positions
+    returns dictionary of arrays and metadata
+    """
+    import numpy as np
+
+    nodes = np.union1d(edge_sources, edge_targets).astype(np.int64)
+    source_nodes = np.searchsorted(nodes, edge_sources).astype(np.int32)
+    target_nodes = np.searchsorted(nodes, edge_targets).astype(np.int32)
+    state = {
+        "watermark": watermark,
+        "types": list(types),
+        "nodes": nodes,
+        "edge_ids": edge_ids.astype(np.int64),
+        "edge_sources": edge_sources.astype(np.int64),
+        "edge_targets": edge_targets.astype(np.int64),
+        "edge_types": edge_types.astype(np.int16),
+        "edge_source_nodes": source_nodes,
+        "edge_target_nodes": target_nodes,
+    }
+    for name, keys, others in [
+        ("out", source_nodes, target_nodes),
+        ("in", target_nodes, source_nodes),
+    ]:
+        state[f"{name}_indptr"], state[f"{name}_indices"] = build_csr(
+            keys, others, state["edge_types"], len(types), len(nodes)
+        )
+        # relations of all types are traversed without a row for each type
+        state[f"{name}_all_indptr"], state[f"{name}_all_indices"] = build_csr(
+            keys, others, np.zeros_like(state["edge_types"]), 1, len(nodes)
+        )
+    return state
+
+
+def build_snapshot_from_rows(watermark, rows):
+    """
+    rows: list of `(relation id, source concept id, target concept id, relation type)`
+    """
+    import numpy as np
+
+    # relations without type have an empty type code
+    types = sorted({relation_type or "" for key, source, target, relation_type in rows})
+    type_indices = {relation_type: index for index, relation_type in enumerate(types)}
+    return build_snapshot(
+        watermark,
+        types,
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1] for row in rows], dtype=np.int64),
+        np.array([row[2] for row in rows], dtype=np.int64),
+        np.array([type_indices[row[3] or ""] for row in rows], dtype=np.int16),
+    )
+
+
+def get_relation_version():
+    """
+    Committed version of relations, see `RelationVersion`
+    """
+    from datacore.models import RelationVersion
+
+    return (
+        RelationVersion.objects.filter(id=1).values_list("version", flat=True).first()
+        or 0
+    )
+
+
+def get_relation_rows(ids=None):
+    """
+    Relations with both concepts, all of them or only `ids`
+    """
+    from datacore.models import Relation
+
+    queryset = Relation.objects.filter(source__isnull=False, target__isnull=False)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    return list(queryset.values_list("id", "source", "target", "relation_type"))
+
+
+def get_shared_watermark(name):
+    """
+    Watermark of a shared snapshot directory, `snapshot-<watermark>-<suffix>`
+    """
+    try:
+        return int(name.split("-")[1])
+    except (IndexError, ValueError):
+        return -1
+
+
+class GraphSnapshot:
+    """
+    Read-optimized copy of all relations in NumPy compressed sparse row arrays, so traversals don't query the database.
+    It's loaded on first use and refreshed from relations which are changed after it's watermark,
+    the watermark is a committed version of relations, see `RelationVersion` and `RelationLog`.
+    Refreshed snapshots are written to `path`, other processes memory-map them instead of loading relations again.
+    path: directory of shared snapshot files, None keeps snapshots in memory of each process
+    ttl: seconds between checks for changed relations
+    """
+
+    def __init__(self, path=None, ttl=5):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.state = None
+        self.checked = 0
+        self.metrics = {"full_loads": 0, "refreshes": 0, "shared_loads": 0}
+
+    def get_state(self):
+        """
+        Current arrays, they're refreshed at most once in `ttl` seconds
+        """
+        import time
+
+        if self.state is None or time.monotonic() - self.checked >= self.ttl:
+            self.refresh()
+        return self.state
+
+    def refresh(self, force=False):
+        """
+        Apply changed relations, a full load is only needed when snapshot doesn't exist or changes are pruned
+        force: reload all relations
+        returns True if snapshot is changed
+        """
+        import time
+
+        from datacore.models import RelationLog
+        from django.db.models import Min
+
+        with self.lock:
+            # logs of all versions up to the committed version are visible, it's read before them
+            watermark = get_relation_version()
+            first = RelationLog.objects.aggregate(first=Min("version"))["first"]
+            state = self.state
+            if not force and (state is None or state["watermark"] < watermark):
+                shared = self.load_shared()
+                if shared is not None and (
+                    state is None or shared["watermark"] > state["watermark"]
+                ):
+                    state = shared
+                    self.metrics["shared_loads"] = self.metrics["shared_loads"] + 1
+            # changes before the first remaining log are pruned
+            pruned = (
+                state is not None
+                and state["watermark"] < watermark
+                and (first is None or state["watermark"] < first - 1)
+            )
+            if force or state is None or pruned:
+                state = build_snapshot_from_rows(watermark, get_relation_rows())
+                self.metrics["full_loads"] = self.metrics["full_loads"] + 1
+                rebuilt = True
+            else:
+                state, rebuilt = self.apply_changes(state, watermark)
+            if rebuilt:
+                self.metrics["refreshes"] = self.metrics["refreshes"] + 1
+                self.write_shared(state)
+            changed = state is not self.state
+            self.state = state
+            self.checked = time.monotonic()
+            return changed
+
+    def apply_changes(self, state, watermark):
+        """
+        Replace relations which are logged after snapshot's watermark up to `watermark`
+        returns state and True if it's rebuilt
+        """
+        import numpy as np
+        from datacore.models import RelationLog
+
+        if watermark <= state["watermark"]:
+            return state, False
+        ids = set(
+            RelationLog.objects.filter(
+                version__gt=state["watermark"], version__lte=watermark
+            ).values_list("relation", flat=True)
+        )
+        if not ids:
+            return dict(state, watermark=watermark), False
+        rows = [
+            (key, source, target, relation_type or None)
+            for key, source, target, relation_type in get_relation_rows(ids)
+        ]
+        changed = np.isin(state["edge_ids"], np.fromiter(ids, dtype=np.int64))
+        current = {
+            (key, source, target, state["types"][relation_type] or None)
+            for key, source, target, relation_type in zip(
+                state["edge_ids"][changed].tolist(),
+                state["edge_sources"][changed].tolist(),
+                state["edge_targets"][changed].tolist(),
+                state["edge_types"][changed].tolist(),
+            )
+        }
+        if current == set(rows):
+            return dict(state, watermark=watermark), False
+        kept = ~changed
+        types = list(state["types"])
+        for key, source, target, relation_type in rows:
+            if (relation_type or "") not in types:
+                types.append(relation_type or "")
+        type_indices = {
+            relation_type: index for index, relation_type in enumerate(types)
+        }
+        result = build_snapshot(
+            watermark,
+            types,
+            np.concatenate(
+                [state["edge_ids"][kept], np.array([row[0] for row in rows], np.int64)]
+            ),
+            np.concatenate(
+                [
+                    state["edge_sources"][kept],
+                    np.array([row[1] for row in rows], np.int64),
+                ]
+            ),
+            np.concatenate(
+                [
+                    state["edge_targets"][kept],
+                    np.array([row[2] for row in rows], np.int64),
+                ]
+            ),
+            np.concatenate(
+                [
+                    state["edge_types"][kept],
+                    np.array([type_indices[row[3] or ""] for row in rows], np.int16),
+                ]
+            ),
+        )
+        return result, True
+
+    def load_shared(self):
+        """
+        Memory-map the latest snapshot written to `path` by any process
+        returns state or None
+        """
+        import os
+
+        import numpy as np
+
+        if not self.path:
+            return None
+        meta = self.read_shared_meta()
+        if meta is None:
+            return None
+        try:
+            directory = os.path.join(self.path, meta["directory"])
+            state = {"watermark": meta["watermark"], "types": meta["types"]}
+            for name in SNAPSHOT_ARRAYS:
+                state[name] = np.load(
+                    os.path.join(directory, f"{name}.npy"), mmap_mode="r"
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+        state["shared"] = True
+        return state
+
+    def write_shared(self, state):
+        """
+        Write snapshot files to a new directory of `path` and point `current.json` to it, unless it points to a newer one.
+        Pointer is replaced under a file lock, only directories older than the current one are removed afterwards,
+        processes which have mapped them can still read them.
+        """
+        import fcntl
+        import json
+        import os
+        import shutil
+        import uuid
+
+        import numpy as np
+
+        if not self.path:
+            return
+        name = f"snapshot-{state['watermark']}-{uuid.uuid4().hex[:8]}"
+        directory = os.path.join(self.path, name)
+        try:
+            os.makedirs(directory)
+            for array in SNAPSHOT_ARRAYS:
+                np.save(os.path.join(directory, f"{array}.npy"), state[array])
+        except OSError:
+            # another process may remove it, it's only shared by the next refresh
+            shutil.rmtree(directory, ignore_errors=True)
+            return
+        meta = {
+            "directory": name,
+            "watermark": state["watermark"],
+            "types": state["types"],
+        }
+        with open(os.path.join(self.path, "current.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = self.read_shared_meta()
+            if current is not None and current["watermark"] >= state["watermark"]:
+                shutil.rmtree(directory, ignore_errors=True)
+                return
+            pointer = os.path.join(self.path, f"current-{name}.json")
+            with open(pointer, "w") as file:
+                json.dump(meta, file)
+            os.replace(pointer, os.path.join(self.path, "current.json"))
+            for item in os.listdir(self.path):
+                if (
+                    item.startswith("snapshot-")
+                    and get_shared_watermark(item) < state["watermark"]
+                ):
+                    shutil.rmtree(os.path.join(self.path, item), ignore_errors=True)
+
+    def read_shared_meta(self):
+        """
+        returns metadata of `current.json` or None
+        """
+        import json
+        import os
+
+        try:
+            with open(os.path.join(self.path, "current.json")) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return meta if isinstance(meta, dict) and "watermark" in meta else None
+
+    def get_nodes(self, state, concepts):
+        """
+        Positions of concept ids in snapshot nodes, concepts without relations are -1
+        """
+        import numpy as np
+
+        nodes = state["nodes"]
+        concepts = np.atleast_1d(np.asarray(concepts, dtype=np.int64))
+        if not len(nodes):
+            return np.full(concepts.shape, -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(nodes, concepts), len(nodes) - 1)
+        return np.where(nodes[positions] == concepts, positions, -1)
+
+    def get_types(self, state, relation_types):
+        """
+        Positions of relation types, None is all of them
+        """
+        import numpy as np
+
+        if relation_types is None:
+            return None
+        return np.array(
+            [
+                index
+                for index, relation_type in enumerate(state["types"])
+                if relation_type in relation_types
+            ],
+            dtype=np.int64,
+        )
+
+    def gather(self, state, frontier, direction, types, parents=False):
+        """
+        Neighbors of nodes, one vectorized slice of each CSR row
+        types: positions of relation types or None for all types
+        parents: also return node of `frontier` which each neighbor is found from
+        returns neighbor nodes, and their parent nodes if requested
+        """
+        import numpy as np
+
+        if types is None:
+            keys = sources = frontier
+            suffix = "_all"
+        else:
+            keys = (types[:, None] * len(state["nodes"]) + frontier[None, :]).ravel()
+            sources = np.tile(frontier, len(types)) if parents else None
+            suffix = ""
+        neighbors = []
+        neighbor_parents = []
+        directions = {"outgoing": ["out"], "incoming": ["in"], "both": ["out", "in"]}
+        for name in directions[direction]:
+            indptr = state[f"{name}{suffix}_indptr"]
+            starts = indptr[keys]
+            lengths = indptr[keys + 1] - starts
+            # positions of all rows concatenated, E.g. starts [4, 9] and lengths [2, 1] are [4, 5, 9]
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + (
+                np.arange(int(lengths.sum()))
+            )
+            neighbors.append(state[f"{name}{suffix}_indices"][positions])
+            if parents:
+                neighbor_parents.append(np.repeat(sources, lengths))
+        neighbors = neighbors[0] if len(neighbors) == 1 else np.concatenate(neighbors)
+        if not parents:
+            return neighbors
+        return neighbors, np.concatenate(neighbor_parents)
+
+    def traverse(
+        self,
+        concept,
+        direction="both",
+        relation_types=None,
+        max_depth=None,
+        max_nodes=None,
+        stop=None,
+    ):
+        """
+        Breadth-first traversal from a concept, concepts of each depth are ordered by id
+        stop: concept id which ends traversal when it's reached, parents of nodes are only found with it
+        returns state, node positions, their depths and parent positions (-1 for root) or None
+        """
+        import numpy as np
+
+        state = self.get_state()
+        root = self.get_nodes(state, concept)[0]
+        if root < 0:
+            return state, np.zeros(0, np.int64), np.zeros(0, np.int64), None
+        types = self.get_types(state, relation_types)
+        stop = self.get_nodes(state, stop)[0] if stop is not None else -1
+        visited = np.zeros(len(state["nodes"]), dtype=bool)
+        parents = (
+            np.full(len(state["nodes"]), -1, dtype=np.int64) if stop >= 0 else None
+        )
+        visited[root] = True
+        frontier = np.array([root], dtype=np.int64)
+        levels = [frontier]
+        count = 1
+        while frontier.size and not (stop >= 0 and visited[stop]):
+            if max_depth is not None and len(levels) > max_depth:
+                break
+            if max_nodes is not None and count >= max_nodes:
+                break
+            if parents is None:
+                neighbors = self.gather(state, frontier, direction, types)
+                frontier = np.unique(neighbors[~visited[neighbors]])
+            else:
+                neighbors, sources = self.gather(
+                    state, frontier, direction, types, parents=True
+                )
+                new = ~visited[neighbors]
+                frontier, first = np.unique(neighbors[new], return_index=True)
+                parents[frontier] = sources[new][first]
+            if max_nodes is not None:
+                frontier = frontier[: max_nodes - count]
+            visited[frontier] = True
+            if frontier.size:
+                levels.append(frontier.astype(np.int64))
+                count = count + frontier.size
+        nodes = np.concatenate(levels)
+        depths = np.repeat(np.arange(len(levels)), [level.size for level in levels])
+        return state, nodes, depths, parents
+
+    def neighbors(self, concept, direction="both", relation_types=None):
+        """
+        returns ids of directly related concepts
+        """
+        import numpy as np
+
+        state = self.get_state()
+        node = self.get_nodes(state, concept)[0]
+        if node < 0:
+            return []
+        neighbors = self.gather(
+            state,
+            np.array([node], dtype=np.int64),
+            direction,
+            self.get_types(state, relation_types),
+        )
+        return state["nodes"][np.unique(neighbors)].tolist()
+
+    def neighborhood(self, concept, depth=1, direction="both", relation_types=None):
+        """
+        returns dictionary of concept ids within `depth` relations to their depth
+        """
+        state, nodes, depths, parents = self.traverse(
+            concept, direction, relation_types, max_depth=depth
+        )
+        return dict(zip(state["nodes"][nodes].tolist(), depths.tolist()))
+
+    def ancestors(self, concept, relation_types=("HYPONYM",), max_depth=None):
+        """
+        Concepts above a concept in the hierarchy, `HYPONYM` relations point from a concept to it's hypernym
+        returns dictionary of concept ids to their depth
+        """
+        state, nodes, depths, parents = self.traverse(
+            concept, "outgoing", relation_types, max_depth=max_depth
+        )
+        return dict(zip(state["nodes"][nodes[1:]].tolist(), depths[1:].tolist()))
+
+    def descendants(self, concept, relation_types=("HYPONYM",), max_depth=None):
+        """
+        Concepts below a concept in the hierarchy, see `ancestors`
+        returns dictionary of concept ids to their depth
+        """
+        state, nodes, depths, parents = self.traverse(
+            concept, "incoming", relation_types, max_depth=max_depth
+        )
+        return dict(zip(state["nodes"][nodes[1:]].tolist(), depths[1:].tolist()))
+
+    def shortest_path(
+        self, source, target, direction="both", relation_types=None, max_depth=None
+    ):
+        """
+        returns list of concept ids from source to target, or None if they aren't connected
+        """
+        state, nodes, depths, parents = self.traverse(
+            source, direction, relation_types, max_depth=max_depth, stop=target
+        )
+        stop = self.get_nodes(state, target)[0]
+        if parents is None or stop < 0 or (stop != nodes[0] and parents[stop] < 0):
+            return None
+        path = [stop]
+        while parents[path[-1]] >= 0:
+            path.append(parents[path[-1]])
+        return state["nodes"][path[::-1]].tolist()
+
+    def subgraph(
+        self,
+        concept,
+        direction="both",
+        relation_types=None,
+        max_depth=None,
+        max_nodes=None,
+    ):
+        """
+        Same as `datacore.functions.graph.get_subgraph` without node payloads
+        returns dictionary of concept ids to depth and list of `(id, source, target, relation type)`
+        """
+        import numpy as np
+
+        state, nodes, depths, parents = self.traverse(
+            concept, direction, relation_types, max_depth, max_nodes
+        )
+        selected = np.zeros(len(state["nodes"]), dtype=bool)
+        selected[nodes] = True
+        mask = (
+            selected[state["edge_source_nodes"]] & selected[state["edge_target_nodes"]]
+        )
+        types = self.get_types(state, relation_types)
+        if types is not None:
+            mask &= np.isin(state["edge_types"], types)
+        positions = np.flatnonzero(mask)
+        positions = positions[np.argsort(state["edge_ids"][positions])]
+        edges = [
+            (key, source, target, state["types"][relation_type] or None)
+            for key, source, target, relation_type in zip(
+                state["edge_ids"][positions].tolist(),
+                state["edge_sources"][positions].tolist(),
+                state["edge_targets"][positions].tolist(),
+                state["edge_types"][positions].tolist(),
+            )
+        ]
+        return dict(zip(state["nodes"][nodes].tolist(), depths.tolist())), edges
+
+    def clear(self):
+        with self.lock:
+            self.state = None
+            self.checked = 0
+
+    def stats(self):
+        state = self.state
+        if state is None:
+            return dict(self.metrics, loaded=False)
+        return dict(
+            self.metrics,
+            loaded=True,
+            shared=bool(state.get("shared")),
+            watermark=state["watermark"],
+            nodes=len(state["nodes"]),
+            edges=len(state["edge_ids"]),
+            types=len(state["types"]),
+            bytes=sum(state[name].nbytes for name in SNAPSHOT_ARRAYS),
+        )
+
+
+# globally available graph snapshot of current process
+def get_graph_snapshot():
+    global GRAPH_SNAPSHOT
+    try:
+        GRAPH_SNAPSHOT
+    except NameError:
+        import datacore.settings as datacore_settings
+
+        GRAPH_SNAPSHOT = GraphSnapshot(
+            path=datacore_settings.GRAPH_SNAPSHOT_PATH,
+            ttl=datacore_settings.GRAPH_SNAPSHOT_TTL,
+        )
+    return GRAPH_SNAPSHOT
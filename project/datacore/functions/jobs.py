@@ -0,0 +1,250 @@
+# registered background tasks, by their name
+TASKS = {}
+
+
+def register_task(name):
+    """
+    Register a function as a background task, it's called with the job and job parameters as keyword arguments.
+    Returned dictionary is stored as job's result, `url` of result is used to load results when the job is finished.
+    """
+
+    def decorator(function):
+        TASKS[name] = function
+        return function
+
+    return decorator
+
+
+def enqueue_job(task, **params):
+    from datacore.models import Job
+
+    if task not in TASKS:
+        raise Exception(f"Task `{task}` is not registered.")
+    return Job.objects.create(task=task, params=params)
+
+
+def requeue_stale_jobs():
+    """
+    Queue running jobs again when their worker has stopped, E.g. after a crash,
+    jobs which are started `JOB_MAX_ATTEMPTS` times are failed
+    returns number of queued and failed jobs
+    """
+    from datetime import timedelta
+
+    import datacore.settings as datacore_settings
+    from datacore.models import Job
+    from django.db.models import Q
+    from django.utils import timezone
+
+    stale = Job.objects.filter(
+        Q(
+            heartbeat__lt=timezone.now()
+            - timedelta(seconds=datacore_settings.JOB_STALE_AFTER)
+        )
+        | Q(heartbeat=None),
+        status="running",
+    )
+    failed = stale.filter(attempts__gte=datacore_settings.JOB_MAX_ATTEMPTS).update(
+        status="failed",
+        error="Worker of job stopped while running it.",
+        finished=timezone.now(),
+    )
+    queued = stale.update(status="queued", progress=0, message="")
+    return queued, failed
+
+
+def claim_job():
+    """
+    Get the oldest queued job and mark it as running, jobs locked by other workers are skipped
+    returns `Job` object or None
+    """
+    from datacore.models import Job
+    from django.db import transaction
+    from django.db.models import F
+    from django.utils import timezone
+
+    requeue_stale_jobs()
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status="queued")
+            .order_by("created", "id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.started = timezone.now()
+        job.heartbeat = job.started
+        job.attempts = F("attempts") + 1
+        job.save(update_fields=["status", "started", "heartbeat", "attempts"])
+    job.refresh_from_db(fields=["attempts"])
+    return job
+
+
+def run_job(job):
+    """
+    Run task of a claimed job and store it's result or error
+    """
+    import threading
+    import traceback
+
+    from django.utils import timezone
+
+    stopped = threading.Event()
+    heartbeat = threading.Thread(
+        target=send_heartbeats, args=(job.id, stopped), daemon=True
+    )
+    heartbeat.start()
+    try:
+        job.result = TASKS[job.task](job, **job.params) or {}
+        job.status = "finished"
+    except Exception:
+        job.error = traceback.format_exc()
+        job.status = "failed"
+    finally:
+        stopped.set()
+        heartbeat.join()
+    job.finished = timezone.now()
+    job.save(update_fields=["result", "error", "status", "finished"])
+    return job
+
+
+def send_heartbeats(job_id, stopped):
+    """
+    Update heartbeat of a running job until `stopped` event is set, it runs in a thread beside the job's task
+    """
+    import datacore.settings as datacore_settings
+    from datacore.models import Job
+    from django.db import connection
+    from django.utils import timezone
+
+    try:
+        while not stopped.wait(datacore_settings.JOB_HEARTBEAT_INTERVAL):
+            Job.objects.filter(id=job_id, status="running").update(
+                heartbeat=timezone.now()
+            )
+    finally:
+        # each thread has it's own database connection
+        connection.close()
+
+
+@register_task("analyze")
+def analyze_task(job, text, language="en"):
+    """
+    Analyze text submitted by users, single phrases and multi-phrase texts are stored as submissions
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.stanza import (
+        get_stanza,
+        stanza_batch_phrase_analysis,
+        stanza_phrase_analysis,
+    )
+    from datacore.models import Corpora, Document, Language, Phrase, PhraseCollection
+    from django.urls import reverse
+
+    language_item = Language.objects.get(alpha2=language)
+    job.set_progress(0, 2, "Parsing text")
+    nlp = get_stanza(lang=language, processors=datacore_settings.STANZA_PROCESSORS)
+    doc = nlp(text)
+    job.set_progress(1, 2, "Saving analysis")
+
+    # Get or create corpora and phrase collection entries for user submissions
+    corpora, created = Corpora.objects.get_or_create(title="Frontend Submissions")
+    result = {"url": reverse("datacore:analyze") + f"?job={job.id}"}
+    if len(doc.sentences) == 1:
+        collection, created = PhraseCollection.objects.get_or_create(
+            title="Submission Analysis Collections"
+        )
+        corpora.phrase_collections.add(collection)
+        phrase, created = Phrase.objects.get_or_create(
+            text=text, language=language_item
+        )
+        collection.phrases.add(phrase)
+        output, analysis = stanza_phrase_analysis(
+            phrase_item=phrase, language=language, sentence=doc.sentences[0]
+        )
+        result["phrase"] = phrase.id
+        result["analysis"] = analysis.id
+    else:
+        document, created = Document.objects.get_or_create(
+            content=text, language=language_item
+        )
+        phrases = []
+        for sentence in doc.sentences:
+            phrase, created = Phrase.objects.get_or_create(
+                text=sentence.text, language=language_item
+            )
+            phrases.append(phrase)
+        document.phrases.add(*phrases)
+        # sentences are already parsed, analyses are saved in bulk
+        stanza_batch_phrase_analysis(
+            phrases, language=language, sentences=doc.sentences
+        )
+        result["document"] = document.id
+        result["phrases"] = [phrase.id for phrase in phrases]
+    job.set_progress(2, 2, "Finished")
+    return result
+
+
+@register_task("tokenize_document")
+def tokenize_document_task(job, document, analyzer=None):
+    """
+    Tokenize document into phrases
+    document: id of document
+    analyzer: segmentation backend, `stanza`, `spacy`, `sentencizer` or `rules`, defaults to `SEGMENTATION_BACKEND` setting
+    """
+    from datacore.functions.segmentation import segment_document
+    from datacore.models import Document
+    from django.urls import reverse
+
+    document = Document.objects.get(id=document)
+
+    def progress(done, total):
+        job.set_progress(done, total, "Tokenizing document")
+
+    count = segment_document(document, backend=analyzer, progress=progress)
+    return {
+        "url": reverse("datacore:document", args=[document.id]),
+        "sentences": count,
+    }
+
+
+@register_task("phrase_analysis")
+def phrase_analysis_task(job, phrase, analyzer="stanza"):
+    """
+    Analyze a single phrase
+    phrase: id of phrase
+    analyzer: `stanza` or `spacy`
+    """
+    from datacore.models import Phrase
+    from django.urls import reverse
+
+    phrase = Phrase.objects.get(id=phrase)
+    job.set_progress(0, 1, "Analyzing phrase")
+    if analyzer == "spacy":
+        from datacore.functions.spacy import spacy_phrase_analysis
+
+        output, analysis = spacy_phrase_analysis(phrase_item=phrase)
+    else:
+        from datacore.functions.stanza import stanza_phrase_analysis
+
+        output, analysis = stanza_phrase_analysis(phrase_item=phrase)
+    job.set_progress(1, 1, "Finished")
+    return {
+        "url": reverse("datacore:phrase", args=[phrase.id]),
+        "analysis": analysis.id,
+    }
+
+
+@register_task("refresh_statistics")
+def refresh_statistics_task(job, max_age=None):
+    """
+    Recount dashboard statistics which are older than `max_age` seconds
+    """
+    from datacore.functions.statistics import refresh_statistics
+
+    def progress(done, total):
+        job.set_progress(done, total, "Counting statistics")
+
+    return {"refreshed": refresh_statistics(max_age=max_age, progress=progress)}
@@ -0,0 +1,184 @@
+import threading
+from collections import OrderedDict
+
+
+def get_rss():
+    """
+    Resident memory of current process in megabytes
+    """
+    import psutil
+
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+class PipelineRegistry:
+    """
+    Thread-safe registry of loaded NLP pipelines.
+    Pipelines are loaded lazily and only once, least recently used pipelines are evicted when a cap is reached.
+    max_count: maximum number of loaded pipelines, 0 is unlimited
+    max_rss: maximum memory of loaded pipelines in megabytes, measured by process RSS growth while loading them, 0 is unlimited
+    and memory isn't measured
+    """
+
+    def __init__(self, max_count=0, max_rss=0):
+        self.max_count = max_count
+        self.max_rss = max_rss
+        self.lock = threading.Lock()
+        self.loading_locks = {}
+        self.pipelines = OrderedDict()
+        self.metrics = {}
+
+    def __contains__(self, key):
+        return key in self.pipelines
+
+    def keys(self):
+        with self.lock:
+            return list(self.pipelines.keys())
+
+    def peek(self, key):
+        """
+        Get a loaded pipeline without loading it or changing it's recent usage
+        """
+        with self.lock:
+            return self.pipelines.get(key)
+
+    def _use(self, key):
+        self.pipelines.move_to_end(key)
+        self.metrics[key]["uses"] = self.metrics[key]["uses"] + 1
+        return self.pipelines[key]
+
+    def _accepted(self, key, accept):
+        return key in self.pipelines and (accept is None or accept(self.pipelines[key]))
+
+    def get(self, key, loader, accept=None):
+        """
+        Get a pipeline, it's loaded by calling `loader` if it isn't loaded yet.
+        Threads requesting the same pipeline wait for a single load, other pipelines can be loaded meanwhile.
+        accept: optional function which is called with the loaded pipeline,
+                when it returns False the pipeline is replaced by calling `loader` E.g. to add missing processors
+        """
+        import time
+
+        with self.lock:
+            if self._accepted(key, accept):
+                return self._use(key)
+            loading_lock = self.loading_locks.setdefault(key, threading.Lock())
+
+        with loading_lock:
+            with self.lock:
+                if self._accepted(key, accept):
+                    return self._use(key)
+            rss = get_rss() if self.max_rss else 0
+            start = time.time()
+            pipeline = loader()
+            self.add(
+                key,
+                pipeline,
+                {
+                    "load_time": time.time() - start,
+                    "rss": max(get_rss() - rss, 0) if self.max_rss else 0,
+                },
+            )
+        return pipeline
+
+    def add(self, key, pipeline, metrics=None):
+        """
+        Store a loaded pipeline, replacing the pipeline of the same key
+        metrics: `load_time` in seconds and `rss` in megabytes
+        """
+        import time
+
+        metrics = dict({"load_time": 0, "rss": 0}, **(metrics or {}))
+        metrics["loaded"] = time.time()
+        metrics["uses"] = 1
+        with self.lock:
+            self.pipelines[key] = pipeline
+            self.pipelines.move_to_end(key)
+            self.metrics[key] = metrics
+            self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used pipelines until caps are satisfied, `keep` is never removed.
+        Should be called while holding the lock.
+        """
+        removed = []
+        while len(self.pipelines) > 1:
+            over_count = self.max_count and len(self.pipelines) > self.max_count
+            over_rss = (
+                self.max_rss
+                and sum(item["rss"] for item in self.metrics.values()) > self.max_rss
+            )
+            if not (over_count or over_rss):
+                break
+            key = next(key for key in self.pipelines if key != keep)
+            self.pipelines.pop(key)
+            self.metrics.pop(key)
+            removed.append(key)
+        if removed:
+            import gc
+
+            gc.collect()
+        return removed
+
+    def remove(self, key):
+        with self.lock:
+            self.pipelines.pop(key, None)
+            self.metrics.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.pipelines.clear()
+            self.metrics.clear()
+
+    def stats(self):
+        """
+        Load time, memory usage and number of uses of each loaded pipeline, memory is only measured if `max_rss` is set
+        """
+        with self.lock:
+            return {
+                "pipelines": {
+                    "-".join(str(part) for part in key): dict(metrics)
+                    for key, metrics in self.metrics.items()
+                },
+                "count": len(self.pipelines),
+                "rss": sum(item["rss"] for item in self.metrics.values()),
+                "process_rss": get_rss() if self.max_rss else None,
+            }
+
+
+# globally available registry of NLP pipelines of current process
+def get_pipeline_registry():
+    global PIPELINE_REGISTRY
+    try:
+        PIPELINE_REGISTRY
+    except NameError:
+        import datacore.settings as datacore_settings
+
+        PIPELINE_REGISTRY = PipelineRegistry(
+            max_count=datacore_settings.PIPELINE_MAX_COUNT,
+            max_rss=datacore_settings.PIPELINE_MAX_RSS,
+        )
+    return PIPELINE_REGISTRY
+
+
+def preload_pipelines(pipelines=None):
+    """
+    Load pipelines before they're requested, E.g. when a web worker starts.
+    pipelines: list of `(analyzer, options)`, defaults to `PIPELINE_PRELOAD` setting
+            analyzer: `spacy` or `stanza`
+            options: keyword arguments of `get_spacy` or `get_stanza`
+    """
+    import datacore.settings as datacore_settings
+
+    pipelines = datacore_settings.PIPELINE_PRELOAD if pipelines is None else pipelines
+    for analyzer, options in pipelines:
+        if analyzer == "spacy":
+            from datacore.functions.spacy import get_spacy
+
+            get_spacy(**options)
+        else:
+            from datacore.functions.stanza import get_stanza
+
+            get_stanza(**options)
+    return get_pipeline_registry().stats()
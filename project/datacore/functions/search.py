@@ -0,0 +1,150 @@
+# markers of matched terms in search headlines, they're replaced by html tags after the headline is escaped
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+
+def get_search_config(language=None):
+    """
+    Postgres text search configuration of a language, the same configuration is used by search vectors of it's texts
+    language: alpha-2 code, defaults to `SEARCH_LANGUAGE` setting
+    """
+    import datacore.settings as datacore_settings
+    from django.db import connection
+
+    language = language if language else datacore_settings.SEARCH_LANGUAGE
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT datacore_search_config(id)::text FROM datacore_language WHERE alpha2 = %s",
+            [language],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else "simple"
+
+
+def get_search_query(text, config):
+    """
+    Search query which matches texts containing all terms of `text`, each term also matches as a prefix
+    returns `SearchQuery` or None if text doesn't have any terms
+    """
+    import re
+
+    from django.contrib.postgres.search import SearchQuery
+
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
+        return None
+    return SearchQuery(
+        " & ".join(f"{term}:*" for term in terms), search_type="raw", config=config
+    )
+
+
+def search_texts(queryset, text, language=None):
+    """
+    Full-text search of a queryset with `text`, `language` and `search_vector` fields, using it's GIN index
+    Results are ordered by rank and have a `headline` with highlighted matches, see `highlight`
+    language: alpha-2 code, only texts of the language are found
+    """
+    from django.contrib.postgres.search import SearchHeadline, SearchRank
+    from django.db.models import F
+
+    config = get_search_config(language)
+    query = get_search_query(text, config)
+    if query is None:
+        return queryset.none()
+    if language:
+        queryset = queryset.filter(language__alpha2=language)
+    return (
+        queryset.filter(search_vector=query)
+        .defer("search_vector")
+        .annotate(
+            rank=SearchRank(F("search_vector"), query),
+            headline=SearchHeadline(
+                "text",
+                query,
+                config=config,
+                start_sel=HIGHLIGHT_START,
+                stop_sel=HIGHLIGHT_STOP,
+                max_fragments=2,
+            ),
+        )
+        .order_by("-rank", "id")
+    )
+
+
+def search_phrases(text, language=None):
+    from datacore.models import Phrase
+
+    return search_texts(Phrase.objects.all(), text, language=language)
+
+
+def search_definitions(text, language=None):
+    from datacore.models import Definition
+
+    return search_texts(Definition.objects.all(), text, language=language)
+
+
+def search_concepts(text):
+    """
+    Find concepts of a word, inflected forms are also resolved to their lemmas E.g. "ran" finds concepts of "run".
+    Concepts are loaded with their synonyms and definitions using a fixed number of queries.
+    returns words matching `text`, their lemmas and concepts of both
+    """
+    from datacore.functions.cache import get_lemma_map
+    from datacore.models import Concept, Word
+
+    words = list(Word.objects.filter(text=text)) if text else []
+    lemma_ids = {
+        lemma_id
+        for lemmas in get_lemma_map().lookup([word.id for word in words]).values()
+        for lemma_id in lemmas
+    } - {word.id for word in words}
+    lemmas = list(Word.objects.filter(id__in=lemma_ids)) if lemma_ids else []
+    word_ids = [word.id for word in words + lemmas]
+    concepts = (
+        Concept.objects.filter(
+            id__in=Concept.synonyms.through.objects.filter(word_id__in=word_ids).values(
+                "concept_id"
+            )
+        ).prefetch_related("synonyms", "definitions")
+        if word_ids
+        else Concept.objects.none()
+    )
+    return words, lemmas, concepts
+
+
+def highlight(headline):
+    """
+    Escape a search headline and mark it's matched terms with `<mark>` tags
+    """
+    from django.utils.html import escape
+    from django.utils.safestring import mark_safe
+
+    return mark_safe(
+        escape(headline or "")
+        .replace(HIGHLIGHT_START, "<mark>")
+        .replace(HIGHLIGHT_STOP, "</mark>")
+    )
+
+
+def paginate_without_count(queryset, page=1, page_size=None):
+    """
+    Get a page of results without counting all of them, one extra item is loaded to know if there's a next page
+    returns list of items and dictionary of page information
+    """
+    import datacore.settings as datacore_settings
+
+    page_size = page_size if page_size else datacore_settings.SEARCH_PAGE_SIZE
+    try:
+        page = max(int(page), 1)
+    except (TypeError, ValueError):
+        page = 1
+    start = (page - 1) * page_size
+    items = list(queryset[start : start + page_size + 1])
+    has_next = len(items) > page_size
+    return items[:page_size], {
+        "number": page,
+        "has_previous": page > 1,
+        "has_next": has_next,
+        "previous_page_number": page - 1 if page > 1 else None,
+        "next_page_number": page + 1 if has_next else None,
+    }
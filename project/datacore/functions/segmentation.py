@@ -0,0 +1,137 @@
+# sentence segmentation backends of document tokenization
+#   stanza: neural tokenizer of stanza
+#   spacy: full spacy pipeline, sentences come from it's dependency parser
+#   sentencizer: blank spacy pipeline with only a rule-based sentencizer
+#   rules: punctuation rules without any NLP pipeline
+SEGMENTATION_BACKENDS = ["stanza", "spacy", "sentencizer", "rules"]
+
+
+def iter_chunks(text):
+    """
+    Paragraph-aligned chunks of text with their character offset
+    returns generator of `(offset, chunk)`
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.utils import iter_paragraph_chunks
+
+    offset = 0
+    for chunk in iter_paragraph_chunks(
+        text, max_length=datacore_settings.DOCUMENT_CHUNK_SIZE
+    ):
+        yield offset, chunk
+        offset = offset + len(chunk)
+
+
+def stanza_sentence_spans(chunks, lang="en"):
+    from itertools import islice
+
+    import stanza
+    from datacore.functions.stanza import get_stanza
+
+    nlp = get_stanza(lang=lang, processors="tokenize")
+    while True:
+        batch = list(islice(chunks, 8))
+        if not batch:
+            break
+        docs = nlp.bulk_process([stanza.Document([], text=chunk) for _, chunk in batch])
+        for (offset, chunk), doc in zip(batch, docs):
+            for sentence in doc.sentences:
+                start = sentence.tokens[0].start_char
+                end = sentence.tokens[-1].end_char
+                yield offset + start, offset + end
+            yield offset + len(chunk), None
+
+
+def spacy_sentence_spans(chunks, nlp):
+    chunks = iter(chunks)
+    offsets = []
+
+    def texts():
+        for offset, chunk in chunks:
+            offsets.append(offset)
+            yield chunk
+
+    for doc in nlp.pipe(texts(), batch_size=8):
+        offset = offsets.pop(0)
+        for sentence in doc.sents:
+            yield offset + sentence.start_char, offset + sentence.end_char
+        yield offset + len(doc.text), None
+
+
+def rule_sentence_spans(chunks):
+    from datacore.functions.utils import iter_rule_sentences
+
+    for offset, chunk in chunks:
+        for start, end in iter_rule_sentences(chunk):
+            yield offset + start, offset + end
+        yield offset + len(chunk), None
+
+
+def iter_sentence_spans(text, backend=None, lang="en", package=None, progress=None):
+    """
+    Split text into sentences using a segmentation backend, text is processed lazily in paragraph-aligned chunks.
+    backend: one of `SEGMENTATION_BACKENDS`, defaults to `SEGMENTATION_BACKEND` setting
+    package: spacy package of `spacy` backend
+    progress: optional function which is called with number of processed and total characters
+    returns generator of `(start, end)` character offsets of sentences
+    """
+    import datacore.settings as datacore_settings
+
+    backend = backend if backend else datacore_settings.SEGMENTATION_BACKEND
+    chunks = iter_chunks(text)
+    if backend == "stanza":
+        spans = stanza_sentence_spans(chunks, lang=lang)
+    elif backend == "spacy":
+        from datacore.functions.spacy import get_spacy
+
+        spans = spacy_sentence_spans(
+            chunks, get_spacy(package=package if package else "en_core_web_sm")
+        )
+    elif backend == "sentencizer":
+        from datacore.functions.spacy import get_spacy_sentencizer
+
+        spans = spacy_sentence_spans(chunks, get_spacy_sentencizer(lang=lang))
+    elif backend == "rules":
+        spans = rule_sentence_spans(chunks)
+    else:
+        raise Exception(f"Segmentation backend `{backend}` is not supported.")
+
+    # backends mark the end of each chunk with an empty span
+    for start, end in spans:
+        if end is None:
+            if progress:
+                progress(start, len(text))
+            continue
+        yield start, end
+
+
+def iter_sentences(text, backend=None, lang="en", package=None, progress=None):
+    """
+    Stripped text of sentences, see `iter_sentence_spans`
+    """
+    for start, end in iter_sentence_spans(
+        text, backend=backend, lang=lang, package=package, progress=progress
+    ):
+        sentence = text[start:end].strip()
+        if sentence:
+            yield sentence
+
+
+def segment_document(document, backend=None, package=None, progress=None):
+    """
+    Tokenize document into sentences of it's language and store them as it's phrases
+    returns number of stored sentences
+    """
+    from datacore.functions.analysis import save_document_phrases
+
+    lang = document.language.alpha2 if document.language else None
+    return save_document_phrases(
+        document,
+        iter_sentences(
+            document.content,
+            backend=backend,
+            lang=lang if lang else "en",
+            package=package,
+            progress=progress,
+        ),
+    )
@@ -1,83 +1,69 @@
 # globally available Spacy NLP pipeline
 def get_spacy(package="en_core_web_sm"):
-    # use "package" as the dictionary key, so all following recalls evokes cached version of pipline in global variable
-    global NLP
-    try:
-        NLP
-    except NameError:
-        NLP = {}
-    try:
-        NLP[package]
-    except KeyError:
+    # pipelines are shared by threads of the process and loaded once, see `PipelineRegistry`
+    from datacore.functions.pipelines import get_pipeline_registry
+
+    def load():
         import spacy
 
-        NLP[package] = spacy.load(package)
-    return NLP[package]
+        return spacy.load(package)
 
+    return get_pipeline_registry().get(("spacy", package), load)
 
-def spacy_document_tokenize(document, package="en_core_web_sm"):
-    from datacore.functions.spacy import get_spacy
-    from datacore.models import Phrase
 
-    nlp = get_spacy(package=package)
-    doc = nlp(document.content)
-    # Clear document sentences
-    Phrase.objects.filter(document=document).delete()
-    document.phrases.clear()
-    # Add each new sentence
-    for sentence in doc.sents:
-        phrase, created = Phrase.objects.get_or_create(
-            text=sentence.text, document=document
-        )
-        if created and document.language:
-            phrase.language = document.language
-            phrase.save()
-        document.phrases.add(phrase)
+def get_spacy_sentencizer(lang="en"):
+    """
+    Blank Spacy pipeline of a language with only a rule-based sentencizer, for fast document segmentation
+    """
+    from datacore.functions.pipelines import get_pipeline_registry
 
+    def load():
+        import spacy
 
-def spacy_phrase_analysis(
-    phrase_item=None, sentence=None, language="en", package="en_core_web_sm"
-):
+        nlp = spacy.blank(lang)
+        nlp.add_pipe("sentencizer")
+        return nlp
+
+    return get_pipeline_registry().get(("spacy-sentencizer", lang), load)
+
+
+def get_spacy_version(package="en_core_web_sm"):
     """
-    Analyze a single phrase and save it
-    sentence: cached sentence in case it's already generated
-    phrase_item: reference to loaded phrase object, instead of loading it
+    Version of spacy and it's pipeline package, analysis of other versions are not reused
     """
-    from datacore.functions.spacy import get_spacy
-    from datacore.functions.utils import strip_word
-    from datacore.models import (
-        Analyzer,
-        Language,
-        NamedEntity,
-        PhraseAnalysis,
-        Template,
-        Word,
-        WordRelation,
-        WordRelationType,
-    )
+    from importlib.metadata import PackageNotFoundError, version
+
+    import spacy
 
-    lemma_relation, created = WordRelationType.objects.get_or_create(
-        title="Lemma",
-        direction_type="d",
-        descriptor="is the lemma of",
-        reverse_descriptor="is a form of",
+    try:
+        package_version = version(package)
+    except PackageNotFoundError:
+        from datacore.functions.spacy import get_spacy
+
+        package_version = get_spacy(package=package).meta.get("version")
+    return "spacy-{}:{}-{}".format(spacy.__version__, package, package_version)
+
+
+def spacy_document_tokenize(document, package="en_core_web_sm", progress=None):
+    """
+    Tokenize document into sentences and store them as it's phrases.
+    Content is streamed through the pipeline in paragraph-aligned chunks and sentences are saved in bulk batches.
+    progress: optional function which is called with number of processed and total characters
+    """
+    from datacore.functions.segmentation import segment_document
+
+    return segment_document(
+        document, backend="spacy", package=package, progress=progress
     )
-    analyzer, created = Analyzer.objects.get_or_create(title=f"Spacy: {package}")
-    language_item = Language.objects.get(alpha2=language)
 
-    text = phrase_item.text
-    # get or create spacy'z pipline object
-    if sentence is None:
-        nlp = get_spacy(package=package)
-        phrase = nlp(text)
-        if len(list(phrase.sents)) != 1:
-            raise Exception(
-                "Phrase analysis should only be called for a single phrase. use document analysis for multi-phrase texts."
-            )
-    else:
-        phrase = sentence
 
-    # analyze phrase
+def spacy_sentence_data(phrase):
+    """
+    Create analysis data and template strings of an analyzed phrase
+    phrase: spacy's `Doc` or `Span` object of a single sentence
+    """
+    from datacore.functions.utils import strip_word
+
     data = {}
     data["words"] = {}
     data["ner"] = {}
@@ -86,47 +72,9 @@ def spacy_phrase_analysis(
     feat_template = []
     dep_template = []
 
-    analysis, created = PhraseAnalysis.objects.get_or_create(
-        phrase=phrase_item, analyzer=analyzer
-    )
     for token in phrase:
         word_text = strip_word(token.text).lower()
         word_id = str(token.i)
-        # create word object
-        word_obj, created = Word.objects.get_or_create(
-            text=word_text, language=language_item
-        )
-        if created:
-            word_obj.text_length = len(token.text)
-        # add word to phrases words_list and if it's new add it to frequency distribution counter
-        if word_text not in phrase_item.words_list:
-            phrase_item.words_list.append(word_text)
-            word_obj.frequency_distribution = word_obj.frequency_distribution + 1
-        word_obj.save()
-        analysis.words.add(word_obj)
-
-        # word lemma
-        if token.lemma_.lower() == word_text.lower():
-            word_obj.lemma_frequency_distribution = (
-                word_obj.lemma_frequency_distribution + 1
-            )
-        else:
-            lemma_obj, created = Word.objects.get_or_create(
-                text=token.lemma_, language=language_item
-            )
-            # add lemma to phrases lemmas_list and if it's new add it to frequency distribution counter
-            if token.lemma_.lower() not in phrase_item.lemmas_list:
-                phrase_item.lemmas_list.append(token.lemma_.lower())
-                lemma_obj.lemma_frequency_distribution = (
-                    lemma_obj.lemma_frequency_distribution + 1
-                )
-            lemma_obj.save()
-            # add lemma as word's lemma using WordRelation: word_obj, lemma_obj
-            lemma_rel, created = WordRelation.objects.get_or_create(
-                words=[lemma_obj.id, word_obj.id], word_relation=lemma_relation
-            )
-        word_obj.save()
-        analysis.words.add(word_obj)
 
         # create analysis data
         data["words"][word_id] = {}
@@ -156,13 +104,7 @@ def spacy_phrase_analysis(
             "({},{},{},{})".format(token.i, token.pos_, token.dep_, token.head.i)
         )
 
-    # template list string
-    pos_template = "-".join(pos_template)
-    xpos_template = "-".join(xpos_template)
-    feat_template = "-".join(feat_template) if feat_template is not None else ""
-    dep_template = "-".join(dep_template)
-
-    # Create Named Entities
+    # Named Entities
     i = 0
     for item in phrase.ents:
         data["ner"][i] = {
@@ -173,67 +115,109 @@ def spacy_phrase_analysis(
         }
         i = i + 1
 
-    for item in phrase.ents:
-        entity, created = NamedEntity.objects.get_or_create(
-            text=item.text, ne_type=item.label_
-        )
+    # Create constituency template
+    # TODO: Add constituency parser using "benepar": https://spacy.io/universe/project/self-attentive-parser
 
-        if entity.text.lower() not in phrase_item.entities_list:
-            phrase_item.entities_list.append(entity.text.lower())
-            entity.frequency_distribution = entity.frequency_distribution + 1
+    # template list string
+    templates = {}
+    templates["pos_template"] = "-".join(pos_template)
+    templates["xpos_template"] = "-".join(xpos_template)
+    templates["feat_template"] = (
+        "-".join(feat_template) if feat_template is not None else ""
+    )
+    templates["dep_template"] = "-".join(dep_template)
+    return data, templates
 
-        entity.save()
-        analysis.entities.add(entity)
 
-    # save phrase in case words, lemmas, and entities are updated
-    phrase_item.save()
+def spacy_phrase_analysis(
+    phrase_item=None, sentence=None, language="en", package="en_core_web_sm"
+):
+    """
+    Analyze a single phrase and save it
+    sentence: cached sentence in case it's already generated
+    phrase_item: reference to loaded phrase object, instead of loading it
+    """
+    from datacore.functions.analysis import get_phrase_entities, save_phrase_analyses
+    from datacore.functions.spacy import get_spacy_version, spacy_batch_phrase_analysis
+    from datacore.models import Analyzer, Language
 
-    # Create constituency template
-    # TODO: Add constituency parser using "benepar": https://spacy.io/universe/project/self-attentive-parser
+    # phrases which aren't parsed yet may have cached analysis
+    if sentence is None:
+        return spacy_batch_phrase_analysis(
+            [phrase_item], language=language, package=package
+        )[0]
+    phrase = sentence
 
-    # Create templates
-    template_data = {}
-    template_data["structure"] = {}
-    for token in phrase:
-        word_id = str(token.i)
-        template_data["structure"][word_id] = {}
-        template_data["structure"][word_id]["id"] = data["words"][word_id]["id"]
-        template_data["structure"][word_id]["upos"] = data["words"][word_id]["upos"]
-    template, created = Template.objects.get_or_create(
-        pos=pos_template, parent=None, data=template_data
-    )
+    analyzer, created = Analyzer.objects.get_or_create(title=f"Spacy: {package}")
+    language_item = Language.objects.get(alpha2=language)
 
-    new_template, created = Template.objects.get_or_create(
-        pos=pos_template,
-        xpos=xpos_template,
-        feats=feat_template,
-        dep=dep_template,
-        parent=template,
+    # analyze phrase and save it
+    data, templates = spacy_sentence_data(phrase)
+    analysis = save_phrase_analyses(
+        analyzer,
+        language_item,
+        [(phrase_item, data, templates)],
+        version=get_spacy_version(package=package),
+    )[0]
+
+    result = {"data": data, "ent": get_phrase_entities(data), "templates": templates}
+    return result, analysis
+
+
+def spacy_batch_phrase_analysis(
+    phrase_items, language="en", package="en_core_web_sm", batch_size=None
+):
+    """
+    Analyze many phrases using `nlp.pipe` and save each batch with bulk queries.
+    Results are the same as calling `spacy_phrase_analysis` for each phrase.
+    phrase_items: list or queryset of `Phrase` objects, each phrase should be a single sentence
+    batch_size: number of phrases which are analyzed and saved together
+    returns list of `(result, analysis)` in the same order as `phrase_items`
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.analysis import (
+        cached_phrase_data,
+        get_phrase_entities,
+        save_phrase_analyses,
     )
-    if created:
-        for token in phrase:
-            word_id = str(token.i)
-            template_data["structure"][word_id]["xpos"] = data["words"][word_id]["xpos"]
-            template_data["structure"][word_id]["dep_rel"] = data["words"][word_id][
-                "dep_rel"
-            ]
-            template_data["structure"][word_id]["dep_parent"] = data["words"][word_id][
-                "dep_parent"
-            ]
-        new_template.data = template_data
-        new_template.phrase_type = (
-            template.phrase_type if template.phrase_type else None
+    from datacore.functions.spacy import get_spacy, get_spacy_version
+    from datacore.models import Analyzer, Language
+
+    batch_size = batch_size if batch_size else datacore_settings.ANALYSIS_BATCH_SIZE
+    analyzer, created = Analyzer.objects.get_or_create(title=f"Spacy: {package}")
+    language_item = Language.objects.get(alpha2=language)
+    nlp = get_spacy(package=package)
+    version = get_spacy_version(package=package)
+
+    def analyze(phrases):
+        docs = list(
+            nlp.pipe(
+                [phrase_item.text for phrase_item in phrases], batch_size=batch_size
+            )
         )
-        new_template.save()
-
-    # store analysis data
-    analysis.template = new_template
-    analysis.data = data
-    analysis.save()
-
-    result = {"data": data, "ent": phrase.ents, "templates": {}}
-    result["templates"]["pos_template"] = pos_template
-    result["templates"]["xpos_template"] = xpos_template
-    result["templates"]["feat_template"] = feat_template
-    result["templates"]["dep_template"] = dep_template
-    return result, analysis
+        for doc in docs:
+            if len(list(doc.sents)) != 1:
+                raise Exception(
+                    f"Phrase analysis should only be called for a single phrase. use document analysis for multi-phrase texts: `{doc.text}`"
+                )
+        return [spacy_sentence_data(doc) for doc in docs]
+
+    phrase_items = list(phrase_items)
+    results = []
+    for start in range(0, len(phrase_items), batch_size):
+        batch = phrase_items[start : start + batch_size]
+        # only phrases without cached analysis are processed by spacy
+        batch_data = cached_phrase_data(analyzer, version, batch, analyze)
+        items = [
+            (phrase_item, data, templates)
+            for phrase_item, (data, templates) in zip(batch, batch_data)
+        ]
+        analyses = save_phrase_analyses(analyzer, language_item, items, version=version)
+        for (data, templates), analysis in zip(batch_data, analyses):
+            result = {
+                "data": data,
+                "ent": get_phrase_entities(data),
+                "templates": templates,
+            }
+            results.append((result, analysis))
+    return results
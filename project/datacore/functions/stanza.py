@@ -1,97 +1,75 @@
+class StanzaProcessors:
+    """
+    Runs only the requested processors of a loaded Stanza pipeline, which may have more processors
+    """
+
+    def __init__(self, pipeline, processors):
+        self.pipeline = pipeline
+        self.processors = processors
+
+    def __call__(self, doc):
+        return self.pipeline(doc, processors=self.processors)
+
+    def bulk_process(self, docs):
+        return self.pipeline.bulk_process(docs, processors=self.processors)
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+
 # globally available Stanza NLP pipeline
 def get_stanza(lang="en", processors="tokenize,pos,lemma,depparse"):
-    # create a key for NLP dic, so all following recalls evokes cached version of pipline in global variable
-    # sorting processors prevents duplicate calls from equivalant list
+    """
+    Each language has a single pipeline which is shared by threads of the process, see `PipelineRegistry`.
+    Processor subsets are served by the loaded pipeline, which is reloaded with all processors when it misses some.
+    """
+    from datacore.functions.pipelines import get_pipeline_registry
+
+    # sorting processors prevents duplicate versions from equivalant list
     processors = ",".join(sorted([x for x in processors.split(",")]))
-    key = "{}-{}".format(lang, processors)
-    global NLP
-    try:
-        NLP
-    except NameError:
-        NLP = {}
-    try:
-        NLP[key]
-    except KeyError:
+    requested = set(processors.split(","))
+    registry = get_pipeline_registry()
+    key = ("stanza", lang)
+
+    def accept(pipeline):
+        return requested.issubset(pipeline.processors.keys())
+
+    def load():
         import stanza
 
-        # NLP = stanza.Pipeline(lang=lang, processors=processors, use_gpu=True, batch_size=100, tokenize_batch_size = 32, pos_batch_size = 32, depparse_batch_size = 32)
-        NLP[key] = stanza.Pipeline(lang=lang, processors=processors)
-    return NLP[key]
+        # keep processors of the current pipeline, so it's upgraded instead of replaced
+        loaded = registry.peek(key)
+        names = requested | set(loaded.processors.keys() if loaded else [])
+        # stanza.Pipeline(lang=lang, processors=processors, use_gpu=True, batch_size=100, tokenize_batch_size = 32, pos_batch_size = 32, depparse_batch_size = 32)
+        return stanza.Pipeline(lang=lang, processors=",".join(sorted(names)))
 
+    pipeline = registry.get(key, load, accept=accept)
+    # multi-word token expansion is added by stanza to tokenizers of some languages
+    if "tokenize" in requested and "mwt" in pipeline.processors:
+        requested.add("mwt")
+    return StanzaProcessors(pipeline, sorted(requested))
 
-def stanza_tokenize_document(document):
+
+def stanza_tokenize_document(document, progress=None):
     """
     Process document by tokenizing it and storing it's sentences. sentences can be analyzed after tokenizing.
+    Content is streamed through the pipeline in paragraph-aligned chunks and sentences are saved in bulk batches.
     params:
             document: document which will be tokenized
-            analyze: if true, then pos, lemma depparse and named entity recognition will be performed on each sentence of it
+            progress: optional function which is called with number of processed and total characters
     """
-    from datacore.functions.stanza import get_stanza
-    from datacore.models import Phrase
-
-    nlp = get_stanza(lang="en", processors="tokenize")
-    doc = nlp(document.content)
-    # Clear document sentences
-    Phrase.objects.filter(document=document).delete()
-    document.phrases.clear()
-    # Add each new sentence
-    for sentence in doc.sentences:
-        phrase, created = Phrase.objects.get_or_create(
-            text=sentence.text, document=document
-        )
-        if created and document.language:
-            phrase.language = document.language
-            phrase.save()
-        document.phrases.add(phrase)
+    from datacore.functions.segmentation import segment_document
 
+    return segment_document(document, backend="stanza", progress=progress)
 
-def stanza_phrase_analysis(phrase_item=None, language="en", sentence=None):
+
+def stanza_sentence_data(phrase):
     """
-    Analyze a single phrase and save it
-    sentence: cached sentence in case it's already generated
-    phrase_item: reference to loaded phrase object, instead of loading it
+    Create analysis data and template strings of an analyzed phrase
+    phrase: stanza's `Sentence` object, processed with `tokenize,pos,lemma,depparse,ner,constituency`
     """
-
-    from datacore.functions.stanza import get_stanza
     from datacore.functions.utils import strip_word
-    from datacore.models import (
-        Analyzer,
-        Language,
-        NamedEntity,
-        PhraseAnalysis,
-        Template,
-        Word,
-        WordRelation,
-        WordRelationType,
-    )
-
-    # TODO: cache this three lines
-    lemma_relation, created = WordRelationType.objects.get_or_create(
-        title="Lemma",
-        direction_type="d",
-        descriptor="is the lemma of",
-        reverse_descriptor="is a form of",
-    )
-    analyzer, created = Analyzer.objects.get_or_create(title="Stanza")
-    language_item = Language.objects.get(alpha2=language)
 
-    text = phrase_item.text
-    # get or create stanza's sentence object
-    if sentence is None:
-        # TODO: seperate "processor" into list, search for available pipelines to only perform tasks which are available.
-        nlp = get_stanza(
-            lang="en", processors="tokenize,pos,lemma,depparse,ner,constituency"
-        )
-        doc = nlp(text)
-        if len(doc.sentences) != 1:
-            raise Exception(
-                "Phrase analysis should only be called for a single phrase. use document analysis for multi-phrase texts."
-            )
-        phrase = doc.sentences[0]
-    else:
-        phrase = sentence
-
-    # analyze phrase
     data = {}
     data["words"] = {}
     data["ner"] = {}
@@ -99,45 +77,9 @@ def stanza_phrase_analysis(phrase_item=None, language="en", sentence=None):
     xpos_template = []
     feat_template = []
 
-    analysis, created = PhraseAnalysis.objects.get_or_create(
-        phrase=phrase_item, analyzer=analyzer
-    )
     for word in phrase.words:
         word_text = strip_word(word.text).lower()
         word_id = str(word.id - 1)
-        # create word object
-        word_obj, created = Word.objects.get_or_create(
-            text=word_text, language=language_item
-        )
-        if created:
-            word_obj.text_length = len(word.text)
-        # add word to phrases words_list and if it's new add it to frequency distribution counter
-        if word_text not in phrase_item.words_list:
-            phrase_item.words_list.append(word_text)
-            word_obj.frequency_distribution = word_obj.frequency_distribution + 1
-
-        # word lemma
-        if word.lemma.lower() == word_text.lower():
-            word_obj.lemma_frequency_distribution = (
-                word_obj.lemma_frequency_distribution + 1
-            )
-        else:
-            lemma_obj, created = Word.objects.get_or_create(
-                text=word.lemma, language=language_item
-            )
-            # add lemma to phrases lemmas_list and if it's new add it to frequency distribution counter
-            if word.lemma.lower() not in phrase_item.lemmas_list:
-                phrase_item.lemmas_list.append(word.lemma.lower())
-                lemma_obj.lemma_frequency_distribution = (
-                    word_obj.lemma_frequency_distribution + 1
-                )
-            lemma_obj.save()
-            # add lemma as word's lemma using WordRelation: word_obj, lemma_obj
-            lemma_rel, created = WordRelation.objects.get_or_create(
-                words=[lemma_obj.id, word_obj.id], word_relation=lemma_relation
-            )
-        word_obj.save()
-        analysis.words.add(word_obj)
 
         # create analysis data
         data["words"][word_id] = {}
@@ -162,10 +104,6 @@ def stanza_phrase_analysis(phrase_item=None, language="en", sentence=None):
             "{}({})".format(word.pos, word.xpos) if word.xpos else word.pos
         )
         feat_template.append("{}({}~{})".format(word.pos, word.xpos, word.feats))
-    # template list string
-    pos_template = "-".join(pos_template)
-    xpos_template = "-".join(xpos_template)
-    feat_template = "-".join(feat_template) if feat_template is not None else ""
 
     # Create dependency template
     dep_list = []
@@ -179,10 +117,8 @@ def stanza_phrase_analysis(phrase_item=None, language="en", sentence=None):
         data["words"][str(dep[2].id - 1)]["dep_parent"] = (
             dep[0].id - 1 if dep[0].id > 0 else 0
         )
-    dep_template = "-".join(dep_list)
 
-    # Create Named Entities
-    data["ner"] = {}
+    # Named Entities
     i = 0
     for item in phrase.ents:
         data["ner"][i] = {
@@ -193,20 +129,6 @@ def stanza_phrase_analysis(phrase_item=None, language="en", sentence=None):
         }
         i = i + 1
 
-        entity, created = NamedEntity.objects.get_or_create(
-            text=item.text, ne_type=item.type.upper()
-        )
-
-        if entity.text.lower() not in phrase_item.entities_list:
-            phrase_item.entities_list.append(entity.text.lower())
-            entity.frequency_distribution = entity.frequency_distribution + 1
-
-        entity.save()
-        analysis.entities.add(entity)
-
-    # save phrase in case words, lemmas, and entities are updated
-    phrase_item.save()
-
     # Create constituency template
     def get_constituency_template(children):
         result = ""
@@ -223,52 +145,190 @@ def stanza_phrase_analysis(phrase_item=None, language="en", sentence=None):
                     result = result + ","
         return result
 
-    constiruancy_template = get_constituency_template(phrase.constituency.children)
-    # Create templates
-    template_data = {}
-    template_data["structure"] = {}
-    for word in phrase.words:
-        word_id = str(word.id - 1)
-        template_data["structure"][word_id] = {}
-        template_data["structure"][word_id]["id"] = data["words"][word_id]["id"]
-        template_data["structure"][word_id]["upos"] = data["words"][word_id]["upos"]
-    template, created = Template.objects.get_or_create(
-        pos=pos_template, parent=None, data=template_data
+    # template list string
+    templates = {}
+    templates["pos_template"] = "-".join(pos_template)
+    templates["xpos_template"] = "-".join(xpos_template)
+    templates["feat_template"] = (
+        "-".join(feat_template) if feat_template is not None else ""
     )
+    templates["dep_template"] = "-".join(dep_list)
+    templates["constituency"] = get_constituency_template(phrase.constituency.children)
+    return data, templates
+
+
+def get_stanza_version(lang="en", processors="tokenize,pos,lemma,depparse"):
+    """
+    Version of stanza, it's processors and downloaded models, analysis of other versions are not reused
+    """
+    import stanza
 
-    new_template, created = Template.objects.get_or_create(
-        pos=pos_template,
-        xpos=xpos_template,
-        feats=feat_template,
-        dep=dep_template,
-        constituency=constiruancy_template,
-        parent=template,
+    processors = ",".join(sorted([x for x in processors.split(",")]))
+    return "stanza-{}:{}-{}:{}".format(
+        stanza.__version__, lang, processors, get_stanza_resources_version(lang)
     )
-    if created:
-        for word in phrase.words:
-            word_id = str(word.id - 1)
-            template_data["structure"][word_id]["xpos"] = data["words"][word_id]["xpos"]
-            template_data["structure"][word_id]["dep_rel"] = data["words"][word_id][
-                "dep_rel"
-            ]
-            template_data["structure"][word_id]["dep_parent"] = data["words"][word_id][
-                "dep_parent"
-            ]
-        new_template.data = template_data
-        new_template.phrase_type = (
-            template.phrase_type if template.phrase_type else None
+
+
+def get_stanza_resources_version(lang):
+    """
+    Resources version of stanza and checksum of a language's models in downloaded `resources.json`,
+    which changes when models are downloaded again
+    """
+    import hashlib
+    import json
+    import os
+
+    from stanza.resources.common import DEFAULT_MODEL_DIR, DEFAULT_RESOURCES_VERSION
+
+    path = os.path.join(DEFAULT_MODEL_DIR, "resources.json")
+    if not os.path.exists(path):
+        return DEFAULT_RESOURCES_VERSION
+    # file is only read again when it's changed
+    key = (path, os.path.getmtime(path), lang)
+    if key not in STANZA_RESOURCES_VERSIONS:
+        with open(path, "r", encoding="utf-8") as file:
+            resources = json.load(file).get(lang, {})
+        checksum = hashlib.md5(
+            json.dumps(resources, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        STANZA_RESOURCES_VERSIONS[key] = f"{DEFAULT_RESOURCES_VERSION}-{checksum[:8]}"
+    return STANZA_RESOURCES_VERSIONS[key]
+
+
+# resources versions of languages in current process, by resources file, it's modification time and language
+STANZA_RESOURCES_VERSIONS = {}
+
+
+def stanza_phrase_result(data, templates):
+    from datacore.functions.analysis import get_phrase_entities
+
+    result = {"data": data, "ent": get_phrase_entities(data), "templates": {}}
+    result["templates"]["pos_template"] = templates["pos_template"]
+    result["templates"]["xpos_template"] = templates["xpos_template"]
+    result["templates"]["feat_template"] = templates["feat_template"]
+    result["templates"]["dep_template"] = templates["dep_template"]
+    result["templates"]["constiruancy"] = templates["constituency"]
+    return result
+
+
+def get_phrase_language(phrase_item):
+    """
+    Alpha2 code of phrase's language, phrases without a language are english
+    """
+    if phrase_item.language_id is None:
+        return "en"
+    from datacore.models import Language
+
+    return Language.objects.get(id=phrase_item.language_id).alpha2 or "en"
+
+
+def stanza_phrase_analysis(phrase_item=None, language=None, sentence=None):
+    """
+    Analyze a single phrase and save it
+    sentence: cached sentence in case it's already generated
+    phrase_item: reference to loaded phrase object, instead of loading it
+    language: alpha2 code of language, defaults to phrase's language or english
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.analysis import save_phrase_analyses
+    from datacore.functions.stanza import (
+        get_stanza_version,
+        stanza_batch_phrase_analysis,
+    )
+    from datacore.models import Analyzer, Language
+
+    if language is None:
+        language = get_phrase_language(phrase_item)
+    # phrases which aren't parsed yet may have cached analysis
+    if sentence is None:
+        return stanza_batch_phrase_analysis([phrase_item], language=language)[0]
+    phrase = sentence
+
+    # TODO: cache this two lines
+    analyzer, created = Analyzer.objects.get_or_create(title="Stanza")
+    language_item = Language.objects.get(alpha2=language)
+
+    # analyze phrase and save it
+    data, templates = stanza_sentence_data(phrase)
+    analysis = save_phrase_analyses(
+        analyzer,
+        language_item,
+        [(phrase_item, data, templates)],
+        version=get_stanza_version(
+            lang=language, processors=datacore_settings.STANZA_PROCESSORS
+        ),
+    )[0]
+    return stanza_phrase_result(data, templates), analysis
+
+
+def stanza_batch_phrase_analysis(
+    phrase_items, language="en", sentences=None, batch_size=None
+):
+    """
+    Analyze many phrases, each batch of phrases is processed by a single call to stanza's pipeline and saved with bulk queries.
+    Results are the same as calling `stanza_phrase_analysis` for each phrase.
+    phrase_items: list or queryset of `Phrase` objects, each phrase should be a single sentence
+    sentences: cached sentences in case they're already generated, in the same order as `phrase_items`
+    batch_size: number of phrases which are analyzed and saved together
+    returns list of `(result, analysis)` in the same order as `phrase_items`
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.analysis import cached_phrase_data, save_phrase_analyses
+    from datacore.functions.cache import store_cached_analyses
+    from datacore.functions.stanza import get_stanza, get_stanza_version
+    from datacore.models import Analyzer, Language
+
+    batch_size = batch_size if batch_size else datacore_settings.ANALYSIS_BATCH_SIZE
+    analyzer, created = Analyzer.objects.get_or_create(title="Stanza")
+    language_item = Language.objects.get(alpha2=language)
+    version = get_stanza_version(
+        lang=language, processors=datacore_settings.STANZA_PROCESSORS
+    )
+
+    phrase_items = list(phrase_items)
+    if sentences is not None and len(sentences) != len(phrase_items):
+        raise Exception("Each phrase should have exactly one cached sentence.")
+
+    def analyze(phrases):
+        import stanza
+
+        nlp = get_stanza(lang=language, processors=datacore_settings.STANZA_PROCESSORS)
+        # process all documents of the batch in one pipeline call
+        docs = nlp.bulk_process(
+            [stanza.Document([], text=phrase_item.text) for phrase_item in phrases]
         )
-        new_template.save()
-
-    # store analysis data
-    analysis.template = new_template
-    analysis.data = data
-    analysis.save()
-
-    result = {"data": data, "ent": phrase.ents, "templates": {}}
-    result["templates"]["pos_template"] = pos_template
-    result["templates"]["xpos_template"] = xpos_template
-    result["templates"]["feat_template"] = feat_template
-    result["templates"]["dep_template"] = dep_template
-    result["templates"]["constiruancy"] = constiruancy_template
-    return result, analysis
+        for doc in docs:
+            if len(doc.sentences) != 1:
+                raise Exception(
+                    f"Phrase analysis should only be called for a single phrase. use document analysis for multi-phrase texts: `{doc.text}`"
+                )
+        return [stanza_sentence_data(doc.sentences[0]) for doc in docs]
+
+    results = []
+    for start in range(0, len(phrase_items), batch_size):
+        batch = phrase_items[start : start + batch_size]
+        if sentences is None:
+            # only phrases without cached analysis are processed by stanza
+            batch_data = cached_phrase_data(analyzer, version, batch, analyze)
+        else:
+            batch_data = [
+                stanza_sentence_data(sentence)
+                for sentence in sentences[start : start + batch_size]
+            ]
+            store_cached_analyses(
+                analyzer,
+                version,
+                [
+                    (phrase_item.text, data, templates)
+                    for phrase_item, (data, templates) in zip(batch, batch_data)
+                ],
+            )
+
+        items = [
+            (phrase_item, data, templates)
+            for phrase_item, (data, templates) in zip(batch, batch_data)
+        ]
+        analyses = save_phrase_analyses(analyzer, language_item, items, version=version)
+        for (data, templates), analysis in zip(batch_data, analyses):
+            results.append((stanza_phrase_result(data, templates), analysis))
+    return results
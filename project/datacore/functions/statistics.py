@@ -0,0 +1,206 @@
+# counted objects of dashboard statistics, by their name
+STATISTICS = {
+    "concepts": "Concept",
+    "words": "Word",
+    "relationships": "Relation",
+    "examples": "Example",
+    "phrases": "Phrase",
+    "documents": "Document",
+}
+
+
+def get_statistic_model(name):
+    from django.apps import apps
+
+    return apps.get_model("datacore", STATISTICS[name])
+
+
+def get_estimated_counts(names=None):
+    """
+    Estimated number of rows of counted tables from planner statistics, it's updated by VACUUM, ANALYZE and autovacuum
+    returns a dictionary of names to counts, count is None if the table isn't analyzed yet
+    """
+    from django.db import connection
+
+    names = names if names else list(STATISTICS)
+    tables = {get_statistic_model(name)._meta.db_table: name for name in names}
+    counts = {name: None for name in names}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, reltuples FROM pg_class WHERE relkind = 'r' AND relname = ANY(%s)",
+            [list(tables)],
+        )
+        for table, reltuples in cursor.fetchall():
+            # reltuples is -1 before the first analyze of a table
+            if reltuples >= 0:
+                counts[tables[table]] = int(reltuples)
+    return counts
+
+
+def count_statistic(name):
+    """
+    Exact number of objects, in total and by language and data source
+    returns list of unsaved `Statistic` objects
+    """
+    from datacore.models import Statistic
+    from django.db.models import Count
+
+    model = get_statistic_model(name)
+    fields = {field.name: field for field in model._meta.get_fields()}
+    statistics = [Statistic(name=name, count=model.objects.count())]
+    if "language" in fields:
+        for language_id, count in (
+            model.objects.filter(language__isnull=False)
+            .values("language")
+            .annotate(count=Count("id"))
+            .order_by()
+            .values_list("language", "count")
+        ):
+            statistics.append(
+                Statistic(name=name, language_id=language_id, count=count)
+            )
+    if "data_sources" in fields:
+        # rows of the relation table are counted, so counted table isn't joined
+        field = fields["data_sources"]
+        source = field.m2m_reverse_field_name()
+        for data_source_id, count in (
+            field.remote_field.through.objects.values(source)
+            .annotate(count=Count("id"))
+            .order_by()
+            .values_list(source, "count")
+        ):
+            statistics.append(
+                Statistic(name=name, data_source_id=data_source_id, count=count)
+            )
+    return statistics
+
+
+def refresh_statistics(names=None, max_age=None, progress=None):
+    """
+    Recount statistics, each statistic is replaced in it's own transaction
+    max_age: seconds, statistics which are refreshed more recently are kept
+    progress: function which is called with number of refreshed and total statistics
+    returns list of refreshed names
+    """
+    from datetime import timedelta
+
+    from datacore.models import Statistic
+    from django.db import transaction
+    from django.db.models import Max
+    from django.utils import timezone
+
+    names = names if names else list(STATISTICS)
+    if max_age:
+        updated = dict(
+            Statistic.objects.filter(name__in=names)
+            .values("name")
+            .annotate(updated=Max("updated"))
+            .order_by()
+            .values_list("name", "updated")
+        )
+        threshold = timezone.now() - timedelta(seconds=max_age)
+        names = [
+            name for name in names if name not in updated or updated[name] < threshold
+        ]
+    for index, name in enumerate(names):
+        statistics = count_statistic(name)
+        with transaction.atomic():
+            Statistic.objects.filter(name=name).delete()
+            Statistic.objects.bulk_create(statistics)
+        if progress:
+            progress(index + 1, len(names))
+    return names
+
+
+def get_statistics():
+    """
+    Number of objects without counting them, exact counts are used while they're refreshed within
+    `STATISTICS_MAX_AGE` seconds, otherwise they're estimated from planner statistics
+    returns a dictionary of names to `{"count", "exact", "updated"}`, and True if any statistic is stale
+    """
+    from datetime import timedelta
+
+    import datacore.settings as datacore_settings
+    from datacore.models import Statistic
+    from django.utils import timezone
+
+    threshold = timezone.now() - timedelta(seconds=datacore_settings.STATISTICS_MAX_AGE)
+    exact = {
+        name: (count, updated)
+        for name, count, updated in Statistic.objects.filter(
+            language__isnull=True, data_source__isnull=True
+        ).values_list("name", "count", "updated")
+    }
+    stale = [
+        name for name in STATISTICS if name not in exact or exact[name][1] < threshold
+    ]
+    estimates = get_estimated_counts(stale) if stale else {}
+    statistics = {}
+    for name in STATISTICS:
+        count, updated = exact.get(name, (None, None))
+        if name in stale and estimates[name] is not None:
+            statistics[name] = {
+                "count": estimates[name],
+                "exact": False,
+                "updated": updated,
+            }
+        else:
+            # a stale exact count is still better than none
+            statistics[name] = {
+                "count": count,
+                "exact": count is not None,
+                "updated": updated,
+            }
+    return statistics, bool(stale)
+
+
+def get_statistic_breakdowns():
+    """
+    Stored exact counts by language and by data source
+    returns a dictionary with `languages` and `data_sources`, each has counted `names`
+    and `rows` of `(object, counts of names)` ordered by total count
+    """
+    from datacore.models import DataSource, Language, Statistic
+
+    counts = {"languages": {}, "data_sources": {}}
+    for name, language_id, data_source_id, count in Statistic.objects.filter(
+        name__in=STATISTICS
+    ).values_list("name", "language", "data_source", "count"):
+        if language_id is not None:
+            counts["languages"].setdefault(language_id, {})[name] = count
+        elif data_source_id is not None:
+            counts["data_sources"].setdefault(data_source_id, {})[name] = count
+    objects = {
+        "languages": Language.objects.in_bulk(list(counts["languages"])),
+        "data_sources": DataSource.objects.in_bulk(list(counts["data_sources"])),
+    }
+    breakdowns = {}
+    for key, items in counts.items():
+        names = [
+            name for name in STATISTICS if any(name in item for item in items.values())
+        ]
+        rows = [
+            (objects[key][object_id], [item.get(name, 0) for name in names])
+            for object_id, item in items.items()
+            if object_id in objects[key]
+        ]
+        rows.sort(key=lambda row: -sum(row[1]))
+        breakdowns[key] = {"names": names, "rows": rows}
+    return breakdowns
+
+
+def enqueue_statistics_refresh():
+    """
+    Queue a background refresh of stale statistics, unless one is already queued or running
+    """
+    import datacore.settings as datacore_settings
+    from datacore.functions.jobs import enqueue_job
+    from datacore.models import Job
+
+    if Job.objects.filter(
+        task="refresh_statistics", status__in=["queued", "running"]
+    ).exists():
+        return None
+    return enqueue_job(
+        "refresh_statistics", max_age=datacore_settings.STATISTICS_MAX_AGE
+    )
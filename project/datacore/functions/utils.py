@@ -67,3 +67,103 @@ def download_clean(url, path):
 
     r = requests.get(url, allow_redirects=True)
     open(path, "wb").write(r.content)
+
+
+def iter_paragraph_chunks(text, max_length=100000):
+    """
+    Split text into chunks of at most `max_length` characters without splitting paragraphs.
+    Paragraphs longer than `max_length` are split at their last line break or whitespace before the limit.
+    Chunks are generated lazily, so they can be streamed into NLP pipelines.
+    """
+    import re
+
+    def paragraph_pieces(start, end):
+        # split a paragraph into pieces no longer than max_length
+        while end - start > max_length:
+            split = max(
+                text.rfind("\n", start, start + max_length),
+                text.rfind(" ", start, start + max_length),
+            )
+            split = split + 1 if split > start else start + max_length
+            yield start, split
+            start = split
+        yield start, end
+
+    def paragraphs():
+        start = 0
+        for separator in re.finditer(r"\n\s*\n", text):
+            yield start, separator.end()
+            start = separator.end()
+        yield start, len(text)
+
+    chunk_start = chunk_end = 0
+    for paragraph_start, paragraph_end in paragraphs():
+        for start, end in paragraph_pieces(paragraph_start, paragraph_end):
+            if end - chunk_start > max_length and chunk_end > chunk_start:
+                yield text[chunk_start:chunk_end]
+                chunk_start = start
+            chunk_end = end
+    if text[chunk_start:chunk_end].strip():
+        yield text[chunk_start:chunk_end]
+
+
+# abbreviations which are not ends of sentences in rule-based segmentation
+SENTENCE_ABBREVIATIONS = {
+    "mr",
+    "mrs",
+    "ms",
+    "dr",
+    "prof",
+    "sr",
+    "jr",
+    "st",
+    "vs",
+    "etc",
+    "e.g",
+    "i.e",
+    "no",
+    "fig",
+    "inc",
+    "ltd",
+    "co",
+    "corp",
+    "jan",
+    "feb",
+    "mar",
+    "apr",
+    "jun",
+    "jul",
+    "aug",
+    "sep",
+    "sept",
+    "oct",
+    "nov",
+    "dec",
+}
+
+
+def iter_rule_sentences(text):
+    """
+    Split text into sentences by punctuation rules, without any NLP pipeline.
+    Sentences end at `.`, `!` or `?` followed by whitespace and an uppercase letter, digit or quote,
+    except after abbreviations and initials, and at blank lines.
+    returns generator of `(start, end)` character offsets of sentences
+    """
+    import re
+
+    boundary = re.compile(
+        r"(?P<paragraph>\n\s*\n)" r"|(?<=[.!?])[\"'”’)\]]*(?=\s+[\"'“‘(\[]?[A-Z0-9])"
+    )
+    start = 0
+    for match in boundary.finditer(text):
+        if not match.group("paragraph") and text[match.start() - 1] == ".":
+            word = re.search(r"(\S+)\.$", text[start : match.start()])
+            word = word.group(1).lower().lstrip("(\"'“‘") if word else ""
+            # initials like "J. Smith" and known abbreviations
+            if len(word) == 1 or word in SENTENCE_ABBREVIATIONS:
+                continue
+        if text[start : match.end()].strip():
+            yield start, match.end()
+        start = match.end()
+    if text[start:].strip():
+        yield start, len(text)
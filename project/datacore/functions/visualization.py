@@ -105,17 +105,39 @@ def get_component_title(type):
 
 
 def get_direct_relations(id):
-    relations = Relation.objects.filter(concepts__contains=[id])
+    relations = Relation.filter_relations(id)
     return relations
 
 
 def get_direct_hierarchy_relations(id):
-    relations = Relation.objects.filter(
-        concepts__contains=[id], relation_type="HYPONYM"
+    relations = Relation.filter_relations(
+        id, direction="outgoing", relation_type="HYPONYM"
     )
     return relations
 
 
+def add_relation_edge(graph, rel):
+    # relation id is the edge key, so an edge is added once when it's found from both of it's concepts
+    graph.add_edge(
+        rel.source,
+        rel.target,
+        key=rel.id,
+        type=rel.relation_type,
+        title=get_component_title(rel.relation_type),
+    )
+
+
+def add_concept_nodes(graph):
+    concepts = list(
+        Concept.objects.filter(
+            id__in=[key for key, value in graph.nodes.data()]
+        ).prefetch_related("synonyms")
+    )  # query
+    for concept in concepts:
+        graph.nodes[concept.id]["title"] = concept.get_title()
+        graph.nodes[concept.id]["attribute"] = concept.pos
+
+
 def get_direct_relations_graph(id):
     graph = nx.MultiDiGraph()
     # add all nodes and edges(id only)
@@ -124,88 +146,43 @@ def get_direct_relations_graph(id):
     # 'relationship_choices' is removed as a variable and is added to Component
     # TODO: expand using http://www.unlweb.net/wiki/Universal_Relations
     for rel in relations:
-        graph.add_edge(
-            int(rel.concepts[0]),
-            int(rel.concepts[1]),
-            type=rel.relation_type,
-            title=get_component_title(rel.relation_type),
-        )
-    concepts = list(
-        Concept.objects.filter(id__in=[key for key, value in graph.nodes.data()])
-    )  # query
-    for concept in concepts:
-        graph.nodes[concept.id]["title"] = concept.get_title()
-        graph.nodes[concept.id]["attribute"] = concept.pos
+        add_relation_edge(graph, rel)
+    add_concept_nodes(graph)
     return graph
 
 
-def get_hierarchy_relations_graph(id):
-    graph = nx.MultiDiGraph()
-    pkids = [id]
-    newpkids = []
-    ongoing = True
-    while ongoing:
-        if pkids:
-            for pkid in pkids:
-                relations = get_direct_hierarchy_relations(pkid)
-                ongoing = False
-                for rel in relations:
-                    if pkid == rel.concepts[0]:  # or pkid == rel.concepts[1]:
-                        graph.add_edge(
-                            rel.concepts[0],
-                            rel.concepts[1],
-                            type=rel.relation_type,
-                            title=get_component_title(rel.relation_type),
-                        )
-                        newpkids.append(rel.concepts[1])
-                        ongoing = True
-            pkids = newpkids
-            newpkids = []
+def get_subgraph_graph(id, **options):
+    from datacore.functions.graph import get_subgraph
 
-    concepts = list(
-        Concept.objects.filter(id__in=[key for key, value in graph.nodes.data()])
-    )  # query
-    for concept in concepts:
-        graph.nodes[concept.id]["title"] = concept.get_title()
-        graph.nodes[concept.id]["attribute"] = concept.pos
+    graph = nx.MultiDiGraph()
+    nodes, edges = get_subgraph(id, **options)
+    for node, data in nodes.items():
+        graph.add_node(node, title=data["title"], attribute=data["pos"])
+    for key, source, target, relation_type in edges:
+        graph.add_edge(
+            source,
+            target,
+            key=key,
+            type=relation_type,
+            title=get_component_title(relation_type),
+        )
     return graph
 
 
-def get_neighborhood_relations_graph(id, n=1):
-    graph = nx.MultiDiGraph()
-    pkids = []
-    pkids.append(id)
-    newpkids = []
-    oldpkids = []
-    while n > 0:
-        if pkids:
-            for pkid in pkids:
-                if pkid not in oldpkids:
-                    oldpkids.append(pkid)
-                    newpkids = []
-                    concept = Concept.objects.get(id=pkid)
-                    relations = get_direct_relations(pkid)
-                    for rel in relations:
-                        graph.add_edge(
-                            int(rel.concepts[0]),
-                            int(rel.concepts[1]),
-                            type=rel.relation_type,
-                            title=get_component_title(rel.relation_type),
-                        )
-                        if int(rel.concepts[0]) not in oldpkids:
-                            newpkids.append(int(rel.concepts[0]))
-                        if int(rel.concepts[1]) not in oldpkids:
-                            newpkids.append(int(rel.concepts[1]))
-        pkids = newpkids
-        n = n - 1
+def get_hierarchy_relations_graph(id, max_depth=None, max_nodes=None):
+    # hyponyms are loaded recursively by one query
+    return get_subgraph_graph(
+        id,
+        direction="outgoing",
+        relation_types=["HYPONYM"],
+        max_depth=max_depth,
+        max_nodes=max_nodes,
+    )
 
-    concepts = list(
-        Concept.objects.filter(id__in=[key for key, value in graph.nodes.data()])
-    )  # query
-    for concept in concepts:
-        graph.nodes[concept.id]["title"] = concept.get_title()
-        graph.nodes[concept.id]["attribute"] = concept.pos
-    return graph
+
+def get_neighborhood_relations_graph(id, n=1, max_nodes=None):
+    # concepts within `n` relations are loaded recursively by one query
+    return get_subgraph_graph(id, direction="both", max_depth=n, max_nodes=max_nodes)
 
 
 def generate_relation_graph(id):
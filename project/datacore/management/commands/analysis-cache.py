@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Show analysis cache statistics, evict or clear it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--evict",
+            type=int,
+            default=None,
+            help="Evict least recently used items until this many items remain",
+        )
+        parser.add_argument("--clear", action="store_true", help="Delete all items")
+
+    def handle(self, *args, **options):
+        from datacore.functions.cache import analysis_cache_stats, evict_analysis_cache
+        from datacore.models import AnalysisCache
+
+        if options["clear"]:
+            deleted, rows = AnalysisCache.objects.all().delete()
+            self.stdout.write(f"{deleted} items deleted.")
+        elif options["evict"] is not None:
+            deleted = evict_analysis_cache(options["evict"])
+            self.stdout.write(f"{deleted} items evicted.")
+
+        stats = analysis_cache_stats()
+        self.stdout.write(
+            "{items} items, {stored_hits} hits, hit rate: {stored_hit_rate:.2%}".format(
+                **stats
+            )
+        )
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
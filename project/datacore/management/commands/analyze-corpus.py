@@ -0,0 +1,198 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Analyze phrases of corpora, phrase collections or documents in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--corpora", nargs="+", type=int, default=[], help="Corpora ids"
+        )
+        parser.add_argument(
+            "--collection",
+            nargs="+",
+            type=int,
+            default=[],
+            help="Phrase collection ids",
+        )
+        parser.add_argument(
+            "--document", nargs="+", type=int, default=[], help="Document ids"
+        )
+        parser.add_argument("--analyzer", choices=["spacy", "stanza"], default="spacy")
+        parser.add_argument("--language", default="en")
+        parser.add_argument(
+            "--package", default="en_core_web_sm", help="Spacy pipeline package"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=None, help="Defaults to number of CPUs"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of phrases analyzed together by each worker",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            default=None,
+            help="Progress file, an interrupted run resumes from it",
+        )
+        parser.add_argument(
+            "--restart", action="store_true", help="Ignore existing checkpoint"
+        )
+        parser.add_argument(
+            "--stale-only",
+            action="store_true",
+            help="Only re-analyze dirty analyses and analyses of other analyzer versions, all phrases are selected if no corpora, collection or document is set",
+        )
+
+    def handle(self, *args, **options):
+        import hashlib
+        import json
+        import multiprocessing
+        import os
+        import time
+
+        import datacore.settings as datacore_settings
+        from datacore.functions.analysis import (
+            analysis_worker_init,
+            analyze_phrase_ids,
+            get_analyzer_version,
+        )
+        from datacore.functions.cache import analysis_cache_stats
+        from datacore.models import Phrase, PhraseAnalysis
+        from django.db import connections
+        from django.db.models import Q
+        from tqdm.auto import tqdm
+
+        selected = options["corpora"] or options["collection"] or options["document"]
+        if not (selected or options["stale_only"]):
+            raise CommandError("Select at least one corpora, collection or document.")
+        workers = options["workers"] or os.cpu_count() or 1
+        batch_size = options["batch_size"] or datacore_settings.ANALYSIS_BATCH_SIZE
+
+        # Phrases of selected corpora, collections and documents
+        query = Q()
+        if options["corpora"]:
+            query |= Q(phrasecollection__corpora__in=options["corpora"])
+            query |= Q(document_phrase__corpora__in=options["corpora"])
+            query |= Q(phrasecollection__document__corpora__in=options["corpora"])
+        if options["collection"]:
+            query |= Q(phrasecollection__in=options["collection"])
+        if options["document"]:
+            query |= Q(document_phrase__in=options["document"])
+        phrases = Phrase.objects.filter(query)
+        if options["stale_only"]:
+            analyzer, version = get_analyzer_version(
+                options["analyzer"], options["language"], options["package"]
+            )
+            stale = PhraseAnalysis.objects.filter(analyzer=analyzer).filter(
+                Q(dirty=True) | ~Q(analyzer_version=version)
+            )
+            phrases = phrases.filter(id__in=stale.values("phrase_id"))
+            self.stdout.write(
+                f"Re-analyzing stale analyses, current version: {version}"
+            )
+        phrase_ids = list(
+            phrases.order_by("id").values_list("id", flat=True).distinct()
+        )
+
+        # Checkpoint: first line describes the run, each following line is a finished phrase id
+        selection = json.dumps(
+            {
+                key: options[key]
+                for key in [
+                    "corpora",
+                    "collection",
+                    "document",
+                    "analyzer",
+                    "language",
+                    "package",
+                    "stale_only",
+                ]
+            },
+            sort_keys=True,
+        )
+        checkpoint = options["checkpoint"] or "analyze-corpus-{}-{}.checkpoint".format(
+            options["analyzer"], hashlib.md5(selection.encode()).hexdigest()[:8]
+        )
+        done = set()
+        if os.path.exists(checkpoint) and not options["restart"]:
+            with open(checkpoint, "r") as file:
+                if file.readline().strip() != selection:
+                    raise CommandError(
+                        f"Checkpoint `{checkpoint}` belongs to another run, use --restart to overwrite it."
+                    )
+                done = {int(line) for line in file if line.strip()}
+        else:
+            with open(checkpoint, "w") as file:
+                file.write(selection + "\n")
+
+        remaining = [phrase_id for phrase_id in phrase_ids if phrase_id not in done]
+        self.stdout.write(
+            f"{len(phrase_ids)} phrases selected, {len(phrase_ids) - len(remaining)} already analyzed."
+        )
+        chunks = [
+            remaining[i : i + batch_size] for i in range(0, len(remaining), batch_size)
+        ]
+        worker_options = (options["analyzer"], options["language"], options["package"])
+
+        analyzed_count = 0
+        failed = []
+        # word resolver stats of each worker process
+        resolvers = {}
+        start = time.time()
+        with open(checkpoint, "a") as file, tqdm(
+            total=len(remaining), unit="phrase"
+        ) as progress:
+
+            def save_progress(result):
+                nonlocal analyzed_count
+                analyzed, failed_ids, stats = result
+                resolvers[stats["pid"]] = stats
+                file.write("".join(f"{phrase_id}\n" for phrase_id in analyzed))
+                file.flush()
+                analyzed_count += len(analyzed)
+                failed.extend(failed_ids)
+                progress.update(len(analyzed) + len(failed_ids))
+
+            if workers == 1:
+                analysis_worker_init(*worker_options)
+                for chunk in chunks:
+                    save_progress(analyze_phrase_ids(chunk))
+            else:
+                # forked processes should open their own database connections
+                connections.close_all()
+                with multiprocessing.Pool(
+                    workers, initializer=analysis_worker_init, initargs=worker_options
+                ) as pool:
+                    for result in pool.imap_unordered(analyze_phrase_ids, chunks):
+                        save_progress(result)
+
+        elapsed = time.time() - start
+        self.stdout.write(
+            "{} phrases analyzed in {:.1f}s ({:.2f} phrases/sec).".format(
+                analyzed_count, elapsed, analyzed_count / elapsed if elapsed else 0
+            )
+        )
+        hits = sum(stats["hits"] for stats in resolvers.values())
+        lookups = hits + sum(stats["misses"] for stats in resolvers.values())
+        self.stdout.write(
+            "Word resolver: {} processes, {} cached words, hit rate: {:.2%}".format(
+                len(resolvers),
+                sum(stats["size"] for stats in resolvers.values()),
+                hits / lookups if lookups else 0,
+            )
+        )
+        self.stdout.write(
+            "Analysis cache: {items} items, hit rate: {stored_hit_rate:.2%}".format(
+                **analysis_cache_stats()
+            )
+        )
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(failed)} phrases failed and will be retried on next run: {sorted(failed)}"
+                )
+            )
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
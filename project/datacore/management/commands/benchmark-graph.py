@@ -0,0 +1,178 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Measure traversal speed of graph snapshots, on stored relations or a generated WordNet-sized graph"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            choices=["generated", "database"],
+            default="generated",
+            help="Traverse a generated graph without database, or stored relations",
+        )
+        parser.add_argument(
+            "--nodes",
+            type=int,
+            default=117659,
+            help="Number of generated concepts, default is number of WordNet synsets",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--queries", type=int, default=1000, help="Number of queries of each kind"
+        )
+        parser.add_argument(
+            "--depth", type=int, default=2, help="Depth of neighborhood queries"
+        )
+        parser.add_argument(
+            "--path",
+            help="Also measure writing and memory-mapping shared snapshot files",
+        )
+        parser.add_argument(
+            "--compare-database",
+            action="store_true",
+            help="Also measure recursive database queries of neighborhoods",
+        )
+
+    def handle(self, *args, **options):
+        import random
+        import time
+
+        import numpy as np
+        from datacore.functions.graph_snapshot import (
+            GraphSnapshot,
+            build_snapshot_from_rows,
+            get_relation_rows,
+        )
+
+        random.seed(options["seed"])
+        start = time.perf_counter()
+        if options["source"] == "database":
+            rows = get_relation_rows()
+        else:
+            rows = self.generate_rows(options["nodes"])
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        state = build_snapshot_from_rows(0, rows)
+        built = time.perf_counter() - start
+        if not len(state["nodes"]):
+            raise CommandError("There are no relations to traverse.")
+
+        # snapshot isn't refreshed from database while it's measured
+        snapshot = GraphSnapshot(path=options["path"], ttl=float("inf"))
+        snapshot.state = state
+        snapshot.checked = time.monotonic()
+        stats = snapshot.stats()
+        self.stdout.write(
+            f"{stats['nodes']} concepts, {stats['edges']} relations, {stats['types']} relation types, "
+            f"{stats['bytes'] / (1024 * 1024):.1f} MB"
+        )
+        self.stdout.write(
+            f"load relations: {loaded * 1000:.1f} ms, build snapshot: {built * 1000:.1f} ms"
+        )
+
+        if options["path"]:
+            start = time.perf_counter()
+            snapshot.write_shared(state)
+            written = time.perf_counter() - start
+            start = time.perf_counter()
+            shared = snapshot.load_shared()
+            mapped = time.perf_counter() - start
+            self.stdout.write(
+                f"write shared files: {written * 1000:.1f} ms, memory-map them: {mapped * 1000:.1f} ms"
+            )
+            snapshot.state = shared
+
+        concepts = state["nodes"][
+            np.random.default_rng(options["seed"]).integers(
+                0, len(state["nodes"]), options["queries"] * 2
+            )
+        ].tolist()
+        pairs = list(zip(concepts[::2], concepts[1::2]))
+        depth = options["depth"]
+        queries = [
+            ("neighbors", lambda concept, other: snapshot.neighbors(concept)),
+            (
+                f"neighborhood depth {depth}",
+                lambda concept, other: snapshot.neighborhood(concept, depth=depth),
+            ),
+            ("ancestors", lambda concept, other: snapshot.ancestors(concept)),
+            (
+                "descendants",
+                lambda concept, other: snapshot.descendants(concept, max_depth=3),
+            ),
+            (
+                "shortest path",
+                lambda concept, other: snapshot.shortest_path(
+                    concept, other, max_depth=8
+                ),
+            ),
+        ]
+        for name, query in queries:
+            self.report(name, [self.measure(query, pair) for pair in pairs])
+
+        if options["compare_database"]:
+            if options["source"] != "database":
+                raise CommandError("Database is only compared with --source database")
+            from datacore.functions.graph import get_walk_query
+            from django.db import connection
+
+            sql = get_walk_query("both")
+            durations = []
+            with connection.cursor() as cursor:
+                for concept, other in pairs[: max(len(pairs) // 10, 1)]:
+                    start = time.perf_counter()
+                    cursor.execute(
+                        sql, {"root": concept, "max_depth": depth, "max_nodes": 1000000}
+                    )
+                    cursor.fetchall()
+                    durations.append(time.perf_counter() - start)
+            self.report(f"database neighborhood depth {depth}", durations)
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
+
+    def measure(self, query, pair):
+        import time
+
+        start = time.perf_counter()
+        query(*pair)
+        return time.perf_counter() - start
+
+    def report(self, name, durations):
+        import numpy as np
+
+        durations = np.array(durations) * 1000000
+        self.stdout.write(
+            f"{name}: median {np.median(durations):.0f} us, p95 {np.percentile(durations, 95):.0f} us, "
+            f"max {durations.max():.0f} us"
+        )
+
+    def generate_rows(self, count):
+        """
+        WordNet-like relations: a hypernym tree, some concepts with a second hypernym,
+        and other relations between random concepts
+        """
+        import random
+
+        from datacore.components import RELATION
+
+        others = sorted(
+            {code for code, title in RELATION if code not in ["HYPONYM", "HYPERNYM"]}
+        )
+        rows = []
+        for concept in range(1, count):
+            # a random recursive tree is about as deep as WordNet's noun hierarchy
+            rows.append((len(rows) + 1, concept, random.randrange(concept), "HYPONYM"))
+            if random.random() < 0.02:
+                rows.append(
+                    (len(rows) + 1, concept, random.randrange(concept), "HYPONYM")
+                )
+        for index in range(count // 3):
+            rows.append(
+                (
+                    len(rows) + 1,
+                    random.randrange(count),
+                    random.randrange(count),
+                    random.choice(others),
+                )
+            )
+        return rows
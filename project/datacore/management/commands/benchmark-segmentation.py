@@ -0,0 +1,129 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Compare speed and sentence boundary agreement of document segmentation backends, nothing is saved"
+
+    def add_arguments(self, parser):
+        from datacore.functions.segmentation import SEGMENTATION_BACKENDS
+
+        parser.add_argument(
+            "--corpora", nargs="+", type=int, default=[], help="Corpora ids"
+        )
+        parser.add_argument(
+            "--document", nargs="+", type=int, default=[], help="Document ids"
+        )
+        parser.add_argument(
+            "--file", nargs="+", default=[], help="Plain text files to segment"
+        )
+        parser.add_argument(
+            "--limit", type=int, default=100, help="Maximum number of documents"
+        )
+        parser.add_argument(
+            "--backends",
+            nargs="+",
+            choices=SEGMENTATION_BACKENDS,
+            default=SEGMENTATION_BACKENDS,
+        )
+        parser.add_argument(
+            "--reference",
+            choices=SEGMENTATION_BACKENDS,
+            default="stanza",
+            help="Backend which boundaries of other backends are compared to",
+        )
+        parser.add_argument("--language", default="en")
+        parser.add_argument(
+            "--package", default="en_core_web_sm", help="Spacy pipeline package"
+        )
+
+    def handle(self, *args, **options):
+        import time
+
+        from datacore.functions.segmentation import iter_sentence_spans
+        from datacore.models import Document
+
+        texts = []
+        for path in options["file"]:
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+        if options["corpora"] or options["document"]:
+            query = Document.objects.none()
+            if options["corpora"]:
+                query |= Document.objects.filter(corpora__in=options["corpora"])
+            if options["document"]:
+                query |= Document.objects.filter(id__in=options["document"])
+            texts += (
+                query.distinct()
+                .order_by("id")
+                .values_list("content", flat=True)[: options["limit"]]
+            )
+        if not texts:
+            raise CommandError("Select at least one corpora, document or file.")
+
+        characters = sum(len(text) for text in texts)
+        self.stdout.write(f"{len(texts)} texts, {characters} characters")
+
+        backends = [options["reference"]] + [
+            backend
+            for backend in options["backends"]
+            if backend != options["reference"]
+        ]
+        boundaries = {}
+        for backend in backends:
+            # pipeline loading time isn't measured
+            list(
+                iter_sentence_spans(
+                    "Warm up. Sentence.",
+                    backend=backend,
+                    lang=options["language"],
+                    package=options["package"],
+                )
+            )
+            start = time.perf_counter()
+            boundaries[backend] = []
+            for text in texts:
+                # ends of sentences without trailing whitespace
+                boundaries[backend].append(
+                    {
+                        begin + len(text[begin:end].rstrip())
+                        for begin, end in iter_sentence_spans(
+                            text,
+                            backend=backend,
+                            lang=options["language"],
+                            package=options["package"],
+                        )
+                        if text[begin:end].strip()
+                    }
+                )
+            duration = time.perf_counter() - start
+            sentences = sum(len(ends) for ends in boundaries[backend])
+
+            line = "{}: {} sentences, {:.2f}s, {:.1f} sentences/sec, {:.0f} characters/sec".format(
+                backend,
+                sentences,
+                duration,
+                sentences / duration if duration else 0,
+                characters / duration if duration else 0,
+            )
+            if backend != options["reference"]:
+                matched = sum(
+                    len(ends & reference)
+                    for ends, reference in zip(
+                        boundaries[backend], boundaries[options["reference"]]
+                    )
+                )
+                reference_count = sum(
+                    len(ends) for ends in boundaries[options["reference"]]
+                )
+                precision = matched / sentences if sentences else 0
+                recall = matched / reference_count if reference_count else 0
+                f1 = (
+                    2 * precision * recall / (precision + recall)
+                    if precision + recall
+                    else 0
+                )
+                line += ", agreement with {}: precision {:.2%}, recall {:.2%}, F1 {:.2%}".format(
+                    options["reference"], precision, recall, f1
+                )
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
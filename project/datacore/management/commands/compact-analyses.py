@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Convert stored analysis data to the compact columnar format and report storage sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows converted in each transaction",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=0, help="Maximum number of rows, 0 is all"
+        )
+        parser.add_argument(
+            "--cache", action="store_true", help="Also compact the analysis cache"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only measure sizes of current and compact data",
+        )
+
+    def handle(self, *args, **options):
+        from datacore.models import AnalysisCache, PhraseAnalysis
+
+        models = [PhraseAnalysis] + ([AnalysisCache] if options["cache"] else [])
+        for model in models:
+            self.compact(model, options)
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
+
+    def compact(self, model, options):
+        import json
+
+        from datacore.functions.analysis_data import pack_analysis_data
+        from django.db import connection, transaction
+        from django.db.models import F, Func, Sum
+        from tqdm.auto import tqdm
+
+        table = model._meta.db_table
+
+        def table_size():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+                return cursor.fetchone()[0]
+
+        def rows_size(ids):
+            return (
+                model.objects.filter(id__in=ids).aggregate(
+                    size=Sum(Func(F("data"), function="pg_column_size"))
+                )["size"]
+                or 0
+            )
+
+        # rows are converted in id order, so an interrupted run continues from remaining rows
+        # rows of the first format don't have a format key
+        queryset = model.objects.exclude(data__has_key="format").order_by("id")
+        total = queryset.count()
+        if options["limit"]:
+            total = min(total, options["limit"])
+        self.stdout.write(f"{table}: {total} rows to compact")
+
+        size_before = table_size()
+        data_before = data_after = 0
+        text_before = text_after = 0
+        last_id = 0
+        done = 0
+        with tqdm(total=total) as progress:
+            while done < total:
+                rows = list(
+                    queryset.filter(id__gt=last_id).values_list("id", "data")[
+                        : min(options["batch_size"], total - done)
+                    ]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                ids = [row_id for row_id, data in rows]
+                packed = [(row_id, pack_analysis_data(data)) for row_id, data in rows]
+                text_before += sum(len(json.dumps(data)) for row_id, data in rows)
+                text_after += sum(len(json.dumps(data)) for row_id, data in packed)
+                if not options["dry_run"]:
+                    with transaction.atomic():
+                        data_before += rows_size(ids)
+                        model.objects.bulk_update(
+                            [model(id=row_id, data=data) for row_id, data in packed],
+                            ["data"],
+                        )
+                        data_after += rows_size(ids)
+                done = done + len(rows)
+                progress.update(len(rows))
+
+        def ratio(before, after):
+            return f"{after / before:.1%}" if before else "-"
+
+        self.stdout.write(
+            f"{table}: {done} rows, JSON text {text_before} -> {text_after} characters ({ratio(text_before, text_after)})"
+        )
+        if not options["dry_run"]:
+            self.stdout.write(
+                f"{table}: stored data {data_before} -> {data_after} bytes ({ratio(data_before, data_after)}), "
+                f"table size {size_before} -> {table_size()} bytes, run VACUUM FULL to reclaim freed space"
+            )
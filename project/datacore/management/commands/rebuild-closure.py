@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recompute transitive closure of concept hierarchies, E.g. after a bulk import of relations"
+
+    def add_arguments(self, parser):
+        from datacore.functions.closure import HIERARCHIES
+
+        parser.add_argument(
+            "--hierarchies",
+            nargs="+",
+            choices=list(HIERARCHIES),
+            default=list(HIERARCHIES),
+        )
+
+    def handle(self, *args, **options):
+        import time
+
+        from datacore.functions.closure import rebuild_closure
+
+        for hierarchy in options["hierarchies"]:
+            start = time.perf_counter()
+            rows = rebuild_closure([hierarchy])[hierarchy]
+            self.stdout.write(
+                f"{hierarchy}: {rows} ancestor rows in {time.perf_counter() - start:.1f}s"
+            )
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
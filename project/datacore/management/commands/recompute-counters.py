@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Recompute frequency distributions of words, lemmas and named entities from phrase analyses"
+
+    def handle(self, *args, **options):
+        from datacore.functions.counters import recompute_counters
+
+        result = recompute_counters()
+        self.stdout.write(
+            "{phrases} phrases replayed, counters of {words} words, {lemmas} lemmas and {entities} named entities updated.".format(
+                **result
+            )
+        )
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
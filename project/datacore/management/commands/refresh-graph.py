@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Refresh the shared graph snapshot and prune old relation change logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full", action="store_true", help="Reload all relations from database"
+        )
+        parser.add_argument(
+            "--prune-hours",
+            type=float,
+            default=0,
+            help="Delete change logs older than this number of hours, 0 keeps them, "
+            "processes with older snapshots load all relations again",
+        )
+
+    def handle(self, *args, **options):
+        import time
+        from datetime import timedelta
+
+        from datacore.functions.graph_snapshot import get_graph_snapshot
+        from datacore.models import RelationLog
+        from django.utils import timezone
+
+        snapshot = get_graph_snapshot()
+        start = time.perf_counter()
+        snapshot.refresh(force=options["full"])
+        self.stdout.write(
+            f"Refreshed in {(time.perf_counter() - start) * 1000:.1f} ms: {snapshot.stats()}"
+        )
+        if options["prune_hours"]:
+            # logs after the refreshed watermark are kept, so this snapshot can still be refreshed
+            deleted, rows = RelationLog.objects.filter(
+                created__lt=timezone.now() - timedelta(hours=options["prune_hours"]),
+                version__lte=snapshot.state["watermark"],
+            ).delete()
+            self.stdout.write(f"Deleted {deleted} change logs")
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Recount dashboard statistics of the index view, run it periodically E.g. by cron"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--names",
+            nargs="+",
+            help="Names of refreshed statistics, defaults to all of them",
+        )
+        parser.add_argument(
+            "--max-age",
+            type=int,
+            default=0,
+            help="Only refresh statistics older than this number of seconds, 0 refreshes all",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Also ANALYZE counted tables, so estimated counts are updated",
+        )
+
+    def handle(self, *args, **options):
+        import time
+
+        from datacore.functions.statistics import (
+            STATISTICS,
+            get_statistic_model,
+            refresh_statistics,
+        )
+        from django.db import connection
+
+        names = options["names"] or list(STATISTICS)
+        unknown = [name for name in names if name not in STATISTICS]
+        if unknown:
+            raise CommandError(
+                f"Unknown statistics: {', '.join(unknown)}, choices are: {', '.join(STATISTICS)}"
+            )
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total} statistics counted")
+
+        start = time.perf_counter()
+        refreshed = refresh_statistics(
+            names=names, max_age=options["max_age"], progress=progress
+        )
+        self.stdout.write(
+            f"Refreshed {', '.join(refreshed) or 'nothing'} in {time.perf_counter() - start:.2f}s"
+        )
+        if options["analyze"]:
+            with connection.cursor() as cursor:
+                for name in names:
+                    table = connection.ops.quote_name(
+                        get_statistic_model(name)._meta.db_table
+                    )
+                    cursor.execute(f"ANALYZE {table}")
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs, several workers can run at the same time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when there is no queued job",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when there are no more queued jobs",
+        )
+
+    def handle(self, *args, **options):
+        import time
+
+        from datacore.functions.jobs import claim_job, run_job
+
+        self.stdout.write("Waiting for jobs...")
+        while True:
+            job = claim_job()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+                continue
+            self.stdout.write(f"Job {job.id}: {job.task} started.")
+            job = run_job(job)
+            if job.status == "failed":
+                self.stdout.write(
+                    self.style.ERROR(f"Job {job.id} failed:\n{job.error}")
+                )
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Job {job.id} finished."))
+        self.stdout.write(self.style.SUCCESS("Task Finished."))
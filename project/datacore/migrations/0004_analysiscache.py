@@ -0,0 +1,45 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0003_axiom_ontology_domain_restriction_ontology_domain_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("text_hash", models.CharField(max_length=64)),
+                ("version", models.CharField(max_length=256)),
+                ("data", models.JSONField(default=dict)),
+                ("templates", models.JSONField(default=dict)),
+                ("hits", models.BigIntegerField(default=0)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("last_used", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "analyzer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datacore.analyzer",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("text_hash", "analyzer", "version")},
+            },
+        ),
+    ]
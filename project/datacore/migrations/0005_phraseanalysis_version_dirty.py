@@ -0,0 +1,23 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0004_analysiscache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="phraseanalysis",
+            name="analyzer_version",
+            field=models.CharField(blank=True, default="", max_length=256),
+        ),
+        migrations.AddField(
+            model_name="phraseanalysis",
+            name="dirty",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+def get_template_signature(
+    pos,
+    xpos=None,
+    feats=None,
+    dep=None,
+    constituency=None,
+    parent_id=None,
+    language_id=None,
+):
+    # copy of `datacore.functions.analysis.get_template_signature` when this migration was created
+    import hashlib
+    import json
+
+    values = [value or "" for value in [pos, xpos, feats, dep, constituency]]
+    key = json.dumps(values + [parent_id, language_id])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def backfill_signatures(apps, schema_editor):
+    Template = apps.get_model("datacore", "Template")
+    seen = set()
+    batch = []
+    # the oldest template of duplicates keeps the signature, others don't have any, see `Template.save`
+    for template in (
+        Template.objects.order_by("id")
+        .only(
+            "id",
+            "pos",
+            "xpos",
+            "feats",
+            "dep",
+            "constituency",
+            "parent",
+            "language",
+        )
+        .iterator(chunk_size=2000)
+    ):
+        signature = get_template_signature(
+            template.pos,
+            template.xpos,
+            template.feats,
+            template.dep,
+            template.constituency,
+            template.parent_id,
+            template.language_id,
+        )
+        if signature in seen:
+            continue
+        seen.add(signature)
+        template.signature = signature
+        batch.append(template)
+        if len(batch) >= 2000:
+            Template.objects.bulk_update(batch, ["signature"])
+            batch = []
+    Template.objects.bulk_update(batch, ["signature"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0005_phraseanalysis_version_dirty"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="template",
+            name="signature",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_signatures, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="template",
+            name="signature",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+    ]
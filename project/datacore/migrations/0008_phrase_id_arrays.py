@@ -0,0 +1,145 @@
+# Generated by Django 4.1.4 on 2026-10-18 12:57
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def unique(ids):
+    return list(dict.fromkeys(item for item in ids if item is not None))
+
+
+def backfill_ids(apps, schema_editor):
+    Phrase = apps.get_model("datacore", "Phrase")
+    Word = apps.get_model("datacore", "Word")
+    NamedEntity = apps.get_model("datacore", "NamedEntity")
+
+    phrases = Phrase.objects.order_by("id").only(
+        "id", "language", "words_list", "lemmas_list", "entities_list"
+    )
+    batch = []
+    missing = 0
+    for phrase in phrases.iterator(chunk_size=2000):
+        batch.append(phrase)
+        if len(batch) < 2000:
+            continue
+        missing = missing + backfill_batch(Phrase, Word, NamedEntity, batch)
+        batch = []
+    missing = missing + backfill_batch(Phrase, Word, NamedEntity, batch)
+    if missing:
+        print(
+            f"\n  {missing} words and lemmas of phrases don't exist and aren't stored."
+        )
+
+
+def backfill_batch(Phrase, Word, NamedEntity, phrases):
+    texts = set()
+    entity_texts = set()
+    for phrase in phrases:
+        texts.update(text.lower() for text in phrase.words_list + phrase.lemmas_list)
+        entity_texts.update(text.lower() for text in phrase.entities_list)
+
+    # words of phrase's language, or the oldest word of the text when language isn't set
+    words = {}
+    for word_id, text, language_id in (
+        Word.objects.filter(text__in=texts)
+        .order_by("-id")
+        .values_list("id", "text", "language_id")
+    ):
+        words[(text.lower(), language_id)] = word_id
+        words[(text.lower(), None)] = word_id
+    # entities are stored by text, each text can have entities of different types
+    entities = {}
+    for entity_id, text in (
+        NamedEntity.objects.filter(text__in=entity_texts)
+        .order_by("id")
+        .values_list("id", "text")
+    ):
+        entities.setdefault(text.lower(), []).append(entity_id)
+
+    def get_word(text, language_id):
+        # words of another language are used, E.g. when phrase and analyzer languages differ
+        return words.get((text.lower(), language_id), words.get((text.lower(), None)))
+
+    missing = 0
+    for phrase in phrases:
+        phrase.word_ids = unique(
+            get_word(text, phrase.language_id) for text in phrase.words_list
+        )
+        phrase.lemma_ids = unique(
+            get_word(text, phrase.language_id) for text in phrase.lemmas_list
+        )
+        missing = missing + sum(
+            1
+            for text in phrase.words_list + phrase.lemmas_list
+            if get_word(text, phrase.language_id) is None
+        )
+        phrase.entity_ids = unique(
+            entity_id
+            for text in phrase.entities_list
+            for entity_id in entities.get(text.lower(), [])
+        )
+    Phrase.objects.bulk_update(phrases, ["word_ids", "lemma_ids", "entity_ids"])
+    return missing
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0007_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="phrase",
+            name="entity_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), blank=True, default=list, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name="phrase",
+            name="lemma_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), blank=True, default=list, size=None
+            ),
+        ),
+        migrations.AddField(
+            model_name="phrase",
+            name="word_ids",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.BigIntegerField(), blank=True, default=list, size=None
+            ),
+        ),
+        migrations.RunPython(backfill_ids, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="phrase",
+            name="entities_list",
+        ),
+        migrations.RemoveField(
+            model_name="phrase",
+            name="lemmas_list",
+        ),
+        migrations.RemoveField(
+            model_name="phrase",
+            name="words_list",
+        ),
+        migrations.AddIndex(
+            model_name="phrase",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["word_ids"], name="phrase_word_ids_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="phrase",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["lemma_ids"], name="phrase_lemma_ids_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="phrase",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["entity_ids"], name="phrase_entity_ids_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:00
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0008_phrase_id_arrays"),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddIndex(
+            model_name="word",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Lower(
+                        django.db.models.functions.comparison.Cast(
+                            "text", output_field=models.TextField()
+                        )
+                    ),
+                    name="text_pattern_ops",
+                ),
+                name="word_text_prefix",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="word",
+            index=models.Index(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Reverse(
+                        django.db.models.functions.text.Lower(
+                            django.db.models.functions.comparison.Cast(
+                                "text", output_field=models.TextField()
+                            )
+                        )
+                    ),
+                    name="text_pattern_ops",
+                ),
+                name="word_text_suffix",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="word",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Lower(
+                        django.db.models.functions.comparison.Cast(
+                            "text", output_field=models.TextField()
+                        )
+                    ),
+                    name="gin_trgm_ops",
+                ),
+                name="word_text_trigram",
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+# length of words which are inserted without `Word.save`, E.g. by `bulk_create`
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION datacore_word_set_length() RETURNS trigger AS $$
+BEGIN
+    NEW.length := char_length(NEW.text);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER datacore_word_length
+BEFORE INSERT OR UPDATE OF text ON datacore_word
+FOR EACH ROW EXECUTE FUNCTION datacore_word_set_length();
+
+UPDATE datacore_word SET length = char_length(text);
+"""
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS datacore_word_length ON datacore_word;
+DROP FUNCTION IF EXISTS datacore_word_set_length();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0009_word_text_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="word",
+            name="length",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+        migrations.AddIndex(
+            model_name="word",
+            index=models.Index(fields=["length", "text"], name="word_length_text"),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:02
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# search configuration of a language is named after it's english name, E.g. `english`, other languages use `simple`
+# search vectors of phrases and definitions are updated whenever their text or language changes
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION datacore_search_config(language_id bigint) RETURNS regconfig AS $$
+    SELECT COALESCE(
+        (
+            SELECT config.oid::regconfig
+            FROM datacore_language
+            JOIN pg_ts_config AS config ON config.cfgname = lower(datacore_language.en_name)
+            WHERE datacore_language.id = language_id
+            LIMIT 1
+        ),
+        'simple'::regconfig
+    )
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION datacore_set_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector(
+        datacore_search_config(NEW.language_id), COALESCE(NEW.text, '')
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER datacore_phrase_search_vector
+BEFORE INSERT OR UPDATE OF text, language_id ON datacore_phrase
+FOR EACH ROW EXECUTE FUNCTION datacore_set_search_vector();
+
+CREATE TRIGGER datacore_definition_search_vector
+BEFORE INSERT OR UPDATE OF text, language_id ON datacore_definition
+FOR EACH ROW EXECUTE FUNCTION datacore_set_search_vector();
+
+UPDATE datacore_phrase
+SET search_vector = to_tsvector(datacore_search_config(language_id), COALESCE(text, ''));
+
+UPDATE datacore_definition
+SET search_vector = to_tsvector(datacore_search_config(language_id), COALESCE(text, ''));
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS datacore_phrase_search_vector ON datacore_phrase;
+DROP TRIGGER IF EXISTS datacore_definition_search_vector ON datacore_definition;
+DROP FUNCTION IF EXISTS datacore_set_search_vector();
+DROP FUNCTION IF EXISTS datacore_search_config(bigint);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0010_word_length"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="definition",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="phrase",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.AddIndex(
+            model_name="definition",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="definition_search_gin"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="phrase",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="phrase_search_gin"
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0011_search_vectors"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Statistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64)),
+                ("count", models.BigIntegerField(default=0)),
+                ("updated", models.DateTimeField(auto_now=True, db_index=True)),
+                (
+                    "data_source",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datacore.datasource",
+                    ),
+                ),
+                (
+                    "language",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="datacore.language",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="statistic",
+            index=models.Index(
+                fields=["name", "language", "data_source"], name="statistic_name"
+            ),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+# source and target of relations which are saved without `save`, E.g. by `bulk_create` or `update`
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION datacore_relation_set_adjacency() RETURNS trigger AS $$
+BEGIN
+    NEW.source := NEW.concepts[1];
+    NEW.target := NEW.concepts[2];
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER datacore_relation_adjacency
+BEFORE INSERT OR UPDATE OF concepts ON datacore_relation
+FOR EACH ROW EXECUTE FUNCTION datacore_relation_set_adjacency();
+
+CREATE OR REPLACE FUNCTION datacore_wordrelation_set_adjacency() RETURNS trigger AS $$
+BEGIN
+    NEW.source := NEW.words[1];
+    NEW.target := NEW.words[2];
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER datacore_wordrelation_adjacency
+BEFORE INSERT OR UPDATE OF words ON datacore_wordrelation
+FOR EACH ROW EXECUTE FUNCTION datacore_wordrelation_set_adjacency();
+
+UPDATE datacore_relation SET source = concepts[1], target = concepts[2];
+UPDATE datacore_wordrelation SET source = words[1], target = words[2];
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS datacore_relation_adjacency ON datacore_relation;
+DROP FUNCTION IF EXISTS datacore_relation_set_adjacency();
+DROP TRIGGER IF EXISTS datacore_wordrelation_adjacency ON datacore_wordrelation;
+DROP FUNCTION IF EXISTS datacore_wordrelation_set_adjacency();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0012_statistic"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="relation",
+            name="source",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="relation",
+            name="target",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="wordrelation",
+            name="source",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="wordrelation",
+            name="target",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+        migrations.AddIndex(
+            model_name="relation",
+            index=models.Index(
+                fields=["source", "relation_type"], name="relation_source"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="relation",
+            index=models.Index(
+                fields=["target", "relation_type"], name="relation_target"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wordrelation",
+            index=models.Index(
+                fields=["source", "word_relation"], name="wordrelation_source"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="wordrelation",
+            index=models.Index(
+                fields=["target", "word_relation"], name="wordrelation_target"
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+# changed relations are logged once for each statement, so bulk inserts are logged by one insert
+CREATE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION datacore_relation_log_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO datacore_relationlog (relation, created) SELECT id, now() FROM old_rows;
+    ELSE
+        INSERT INTO datacore_relationlog (relation, created) SELECT id, now() FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER datacore_relation_log_insert
+AFTER INSERT ON datacore_relation REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION datacore_relation_log_changes();
+
+CREATE TRIGGER datacore_relation_log_update
+AFTER UPDATE ON datacore_relation REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION datacore_relation_log_changes();
+
+CREATE TRIGGER datacore_relation_log_delete
+AFTER DELETE ON datacore_relation REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION datacore_relation_log_changes();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS datacore_relation_log_insert ON datacore_relation;
+DROP TRIGGER IF EXISTS datacore_relation_log_update ON datacore_relation;
+DROP TRIGGER IF EXISTS datacore_relation_log_delete ON datacore_relation;
+DROP FUNCTION IF EXISTS datacore_relation_log_changes();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0013_relation_adjacency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelationLog",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("relation", models.BigIntegerField()),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, DROP_TRIGGERS),
+    ]
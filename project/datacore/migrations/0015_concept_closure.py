@@ -0,0 +1,202 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+# relation types of hierarchies, `upward` relations point from a concept to it's parent
+# it should match `datacore.functions.closure.HIERARCHIES`
+CREATE_FUNCTIONS = """
+CREATE OR REPLACE FUNCTION datacore_hierarchy_types()
+RETURNS TABLE (hierarchy text, relation_type text, upward boolean) AS $$
+    VALUES
+        ('kind', 'HYPONYM', true),
+        ('kind', 'INSTANCE_OF', true),
+        ('kind', 'HYPERNYM', false),
+        ('part', 'MEMBER_HOLONYM', true),
+        ('part', 'PART_HOLONYM', true),
+        ('part', 'SUBSTANCE_HOLONYM', true)
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION datacore_hierarchy_parents(hierarchy_name text, node_id bigint)
+RETURNS SETOF bigint AS $$
+    SELECT r.target FROM datacore_relation r
+    WHERE r.source = node_id AND r.target IS NOT NULL AND r.relation_type IN (
+        SELECT t.relation_type FROM datacore_hierarchy_types() t
+        WHERE t.hierarchy = hierarchy_name AND t.upward
+    )
+    UNION ALL
+    SELECT r.source FROM datacore_relation r
+    WHERE r.target = node_id AND r.source IS NOT NULL AND r.relation_type IN (
+        SELECT t.relation_type FROM datacore_hierarchy_types() t
+        WHERE t.hierarchy = hierarchy_name AND NOT t.upward
+    )
+$$ LANGUAGE sql STABLE;
+
+-- recompute ancestors of nodes, or of all concepts of the hierarchy if nodes is NULL
+CREATE OR REPLACE FUNCTION datacore_rebuild_closure(hierarchy_name text, nodes bigint[] DEFAULT NULL)
+RETURNS bigint AS $$
+DECLARE
+    created bigint;
+BEGIN
+    IF nodes IS NULL THEN
+        DELETE FROM datacore_conceptclosure WHERE hierarchy = hierarchy_name;
+        nodes := ARRAY(
+            SELECT DISTINCT CASE WHEN t.upward THEN r.source ELSE r.target END
+            FROM datacore_relation r
+            JOIN datacore_hierarchy_types() t ON t.relation_type = r.relation_type
+            WHERE t.hierarchy = hierarchy_name
+            AND r.source IS NOT NULL AND r.target IS NOT NULL
+        );
+    ELSE
+        DELETE FROM datacore_conceptclosure
+        WHERE hierarchy = hierarchy_name AND descendant = ANY(nodes);
+    END IF;
+    -- (descendant, ancestor, depth) rows are deduplicated by UNION, so cycles end at depth 100
+    WITH RECURSIVE up(descendant, ancestor, depth) AS (
+        SELECT n.node, p.parent, 1
+        FROM unnest(nodes) AS n(node)
+        CROSS JOIN LATERAL datacore_hierarchy_parents(hierarchy_name, n.node) AS p(parent)
+        UNION
+        SELECT up.descendant, p.parent, up.depth + 1
+        FROM up
+        CROSS JOIN LATERAL datacore_hierarchy_parents(hierarchy_name, up.ancestor) AS p(parent)
+        WHERE up.depth < 100
+    )
+    INSERT INTO datacore_conceptclosure (hierarchy, ancestor, descendant, depth)
+    SELECT hierarchy_name, up.ancestor, up.descendant, min(up.depth) FROM up
+    WHERE up.ancestor <> up.descendant
+    GROUP BY up.ancestor, up.descendant;
+    GET DIAGNOSTICS created = ROW_COUNT;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- closure of changed relations, it's skipped when `datacore.closure` setting is `off`, E.g. during bulk imports
+CREATE OR REPLACE FUNCTION datacore_relation_update_closure() RETURNS trigger AS $$
+DECLARE
+    item record;
+BEGIN
+    IF current_setting('datacore.closure', true) = 'off' THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        -- ancestors of child concepts of removed relations and their descendants are recomputed
+        FOR item IN
+            WITH children AS (
+                SELECT t.hierarchy, CASE WHEN t.upward THEN r.source ELSE r.target END AS node
+                FROM old_rows r
+                JOIN datacore_hierarchy_types() t ON t.relation_type = r.relation_type
+                WHERE r.source IS NOT NULL AND r.target IS NOT NULL
+            )
+            SELECT affected.hierarchy, array_agg(DISTINCT affected.node) AS nodes
+            FROM (
+                SELECT children.hierarchy, children.node FROM children
+                UNION
+                SELECT c.hierarchy, c.descendant FROM children
+                JOIN datacore_conceptclosure c
+                ON c.hierarchy = children.hierarchy AND c.ancestor = children.node
+            ) affected
+            GROUP BY affected.hierarchy
+        LOOP
+            PERFORM datacore_rebuild_closure(item.hierarchy, item.nodes);
+        END LOOP;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- each ancestor of parent becomes an ancestor of child and it's descendants
+        FOR item IN
+            SELECT DISTINCT t.hierarchy,
+                CASE WHEN t.upward THEN r.target ELSE r.source END AS parent,
+                CASE WHEN t.upward THEN r.source ELSE r.target END AS child
+            FROM new_rows r
+            JOIN datacore_hierarchy_types() t ON t.relation_type = r.relation_type
+            WHERE r.source IS NOT NULL AND r.target IS NOT NULL AND r.source <> r.target
+        LOOP
+            INSERT INTO datacore_conceptclosure (hierarchy, ancestor, descendant, depth)
+            SELECT item.hierarchy, a.ancestor, d.descendant, a.depth + d.depth + 1
+            FROM (
+                SELECT item.parent AS ancestor, 0 AS depth
+                UNION ALL
+                SELECT c.ancestor, c.depth FROM datacore_conceptclosure c
+                WHERE c.hierarchy = item.hierarchy AND c.descendant = item.parent
+            ) a
+            CROSS JOIN (
+                SELECT item.child AS descendant, 0 AS depth
+                UNION ALL
+                SELECT c.descendant, c.depth FROM datacore_conceptclosure c
+                WHERE c.hierarchy = item.hierarchy AND c.ancestor = item.child
+            ) d
+            WHERE a.ancestor <> d.descendant
+            ON CONFLICT (hierarchy, descendant, ancestor)
+            DO UPDATE SET depth = LEAST(datacore_conceptclosure.depth, EXCLUDED.depth);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER datacore_relation_closure_insert
+AFTER INSERT ON datacore_relation REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION datacore_relation_update_closure();
+
+CREATE TRIGGER datacore_relation_closure_update
+AFTER UPDATE ON datacore_relation REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION datacore_relation_update_closure();
+
+CREATE TRIGGER datacore_relation_closure_delete
+AFTER DELETE ON datacore_relation REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION datacore_relation_update_closure();
+
+SELECT datacore_rebuild_closure('kind'), datacore_rebuild_closure('part');
+"""
+
+DROP_FUNCTIONS = """
+DROP TRIGGER IF EXISTS datacore_relation_closure_insert ON datacore_relation;
+DROP TRIGGER IF EXISTS datacore_relation_closure_update ON datacore_relation;
+DROP TRIGGER IF EXISTS datacore_relation_closure_delete ON datacore_relation;
+DROP FUNCTION IF EXISTS datacore_relation_update_closure();
+DROP FUNCTION IF EXISTS datacore_rebuild_closure(text, bigint[]);
+DROP FUNCTION IF EXISTS datacore_hierarchy_parents(text, bigint);
+DROP FUNCTION IF EXISTS datacore_hierarchy_types();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0014_relation_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ConceptClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("hierarchy", models.CharField(max_length=16)),
+                ("ancestor", models.BigIntegerField()),
+                ("descendant", models.BigIntegerField()),
+                ("depth", models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="conceptclosure",
+            index=models.Index(
+                fields=["hierarchy", "ancestor", "depth"],
+                name="conceptclosure_ancestor",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="conceptclosure",
+            constraint=models.UniqueConstraint(
+                fields=("hierarchy", "descendant", "ancestor"),
+                name="conceptclosure_descendant",
+            ),
+        ),
+        migrations.RunSQL(CREATE_FUNCTIONS, DROP_FUNCTIONS),
+    ]
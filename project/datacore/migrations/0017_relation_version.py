@@ -0,0 +1,91 @@
+# Generated by Django 4.1.4 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+# existing logs keep their order, their ids are their versions
+BACKFILL = """
+UPDATE datacore_relationlog SET version = id;
+INSERT INTO datacore_relationversion (id, version)
+SELECT 1, COALESCE(MAX(id), 0) FROM datacore_relationlog;
+"""
+
+# each statement which changes relations increments the version row, and it stays locked until commit.
+# Relation writers are serialized from their first change of relations until they commit, they're imports and edits
+# which also update the same `ConceptClosure` rows of shared ancestors, so they'd block each other anyway.
+# log times are the time of each statement, `now()` would be the start time of it's transaction.
+# logs older than a day are pruned once in 1000 versions, processes with older graph snapshots load all relations
+CREATE_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION datacore_relation_log_changes() RETURNS trigger AS $$
+DECLARE
+    changed_version bigint;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM 1 FROM old_rows LIMIT 1;
+    ELSE
+        PERFORM 1 FROM new_rows LIMIT 1;
+    END IF;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO datacore_relationversion (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET version = datacore_relationversion.version + 1
+    RETURNING version INTO changed_version;
+    IF changed_version % 1000 = 0 THEN
+        DELETE FROM datacore_relationlog WHERE created < clock_timestamp() - interval '1 day';
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO datacore_relationlog (relation, version, created)
+        SELECT id, changed_version, clock_timestamp() FROM old_rows;
+    ELSE
+        INSERT INTO datacore_relationlog (relation, version, created)
+        SELECT id, changed_version, clock_timestamp() FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+DROP_TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION datacore_relation_log_changes() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO datacore_relationlog (relation, created) SELECT id, now() FROM old_rows;
+    ELSE
+        INSERT INTO datacore_relationlog (relation, created) SELECT id, now() FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datacore", "0016_job_heartbeat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelationVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="relationlog",
+            name="version",
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+        migrations.RunSQL(CREATE_TRIGGER_FUNCTION, DROP_TRIGGER_FUNCTION),
+    ]
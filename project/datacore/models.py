@@ -1,15 +1,42 @@
 import functools
 
 from django.contrib.postgres.fields import ArrayField, CICharField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.db.models import JSONField
+from django.db.models.functions import Cast, Lower, Reverse
 from django.urls import reverse
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from mptt.models import MPTTModel, TreeForeignKey
 
 
+def get_adjacency(ids):
+    """
+    Source and target ids of a two-element relation array, missing items are None
+    """
+    ids = list(ids or []) + [None, None]
+    return ids[0], ids[1]
+
+
+def filter_adjacency(queryset, ids, direction="both"):
+    """
+    Filter relations by their indexed `source` and `target` columns
+    ids: id or list of ids
+    direction: `outgoing` relations have ids as source, `incoming` as target, `both` as either of them
+    """
+    ids = list(ids) if isinstance(ids, (list, tuple, set)) else [ids]
+    if direction == "outgoing":
+        return queryset.filter(source__in=ids)
+    if direction == "incoming":
+        return queryset.filter(target__in=ids)
+    if direction == "both":
+        return queryset.filter(models.Q(source__in=ids) | models.Q(target__in=ids))
+    raise ValueError(f"Unknown direction `{direction}`")
+
+
 class Analyzer(models.Model):
     """
     Any analyzer is used to analyze phrases and text. they can be manually created by user, or they are created and
@@ -236,6 +263,9 @@ class WordRelation(models.Model):
     """
 
     words = ArrayField(models.BigIntegerField(), default=list, size=2)  # Word id
+    # first and second word ids, kept in sync with `words` by `save` and a database trigger
+    source = models.BigIntegerField(null=True, blank=True, editable=False)
+    target = models.BigIntegerField(null=True, blank=True, editable=False)
     word_relation = models.ForeignKey(
         "WordRelationType", on_delete=models.SET_NULL, null=True, blank=True
     )
@@ -245,6 +275,33 @@ class WordRelation(models.Model):
     def __str__(self):
         return f"words: {self.words} --- relation: {self.word_relation.title}"
 
+    def save(self, *args, **kwargs):
+        self.source, self.target = get_adjacency(self.words)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def filter_relations(cls, words, direction="both", word_relation=None):
+        """
+        Relations of words using indexes of source and target words
+        words: word id or list of ids
+        direction: `outgoing` from words, `incoming` to words or `both`
+        word_relation: `WordRelationType` or it's id
+        """
+        queryset = filter_adjacency(cls.objects.all(), words, direction)
+        if word_relation is not None:
+            queryset = queryset.filter(word_relation=word_relation)
+        return queryset
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "word_relation"], name="wordrelation_source"
+            ),
+            models.Index(
+                fields=["target", "word_relation"], name="wordrelation_target"
+            ),
+        ]
+
     def get_absolute_url(self):
         return reverse("datacore:word_relation", kwargs={"id": str(self.id)})
 
@@ -270,19 +327,75 @@ class Word(models.Model):
     language = models.ForeignKey(
         "Language", on_delete=models.SET_NULL, null=True, blank=True
     )
+    # number of characters, it's also set by a database trigger for bulk inserts
+    length = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = (("text", "language"),)
+        # case-insensitive text searches of `filter_words`, see `Word.get_text_expressions`
+        indexes = [
+            models.Index(fields=["length", "text"], name="word_length_text"),
+            models.Index(
+                OpClass(
+                    Lower(Cast("text", output_field=models.TextField())),
+                    name="text_pattern_ops",
+                ),
+                name="word_text_prefix",
+            ),
+            models.Index(
+                OpClass(
+                    Reverse(Lower(Cast("text", output_field=models.TextField()))),
+                    name="text_pattern_ops",
+                ),
+                name="word_text_suffix",
+            ),
+            GinIndex(
+                OpClass(
+                    Lower(Cast("text", output_field=models.TextField())),
+                    name="gin_trgm_ops",
+                ),
+                name="word_text_trigram",
+            ),
+        ]
 
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        self.length = len(self.text)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_text_expressions():
+        """
+        Lowercase and reversed lowercase text, matching expressions of text indexes
+        returns dictionary of aliases, use with `queryset.alias(**expressions)`
+        """
+        text = Lower(Cast("text", output_field=models.TextField()))
+        return {"text_lower": text, "text_reversed": Reverse(text)}
+
     @classmethod
     def filter_words(
-        cls, start="", contain="", end="", sort_by=None, sort_type="asc", limit=0
+        cls,
+        start="",
+        contain="",
+        end="",
+        sort_by=None,
+        sort_type="asc",
+        limit=0,
+        min_length=None,
+        max_length=None,
+        letters="",
+        exclude_letters="",
     ):
-        from django.db.models.functions import Length
-
+        """
+        Filter words case-insensitively by their prefix, infix and suffix
+        prefixes use `word_text_prefix` index, suffixes use `word_text_suffix` index by searching reversed text
+        and infixes use `word_text_trigram` trigram index
+        min_length, max_length: range of word length, length filters and sorting use `word_length_text` index
+        letters: words must have all of these letters
+        exclude_letters: words can't have any of these letters
+        """
         sort_type = sort_type if sort_type else "asc"
 
         valid_sort_by = ["wrd_txt", "wrd_len", "wrd_frq", "lma_frq"]
@@ -296,20 +409,28 @@ class Word(models.Model):
                 f"Please enter a valid sort_type parameter from {valid_sort_type}. current value is `{sort_type}`."
             )
 
-        queryset = cls.objects
-        if len(start) > 0:
-            queryset = queryset.filter(text__startswith=start)
-        if len(contain) > 0:
-            queryset = queryset.filter(text__contains=contain)
-        if len(end) > 0:
-            queryset = queryset.filter(text__endswith=end)
+        queryset = cls.objects.alias(**cls.get_text_expressions())
+        if start:
+            queryset = queryset.filter(text_lower__startswith=start.lower())
+        if contain:
+            queryset = queryset.filter(text_lower__contains=contain.lower())
+        if end:
+            queryset = queryset.filter(text_reversed__startswith=end.lower()[::-1])
+        if min_length:
+            queryset = queryset.filter(length__gte=min_length)
+        if max_length:
+            queryset = queryset.filter(length__lte=max_length)
+        for letter in set("".join((letters or "").lower().split())):
+            queryset = queryset.filter(text_lower__contains=letter)
+        for letter in set("".join((exclude_letters or "").lower().split())):
+            queryset = queryset.exclude(text_lower__contains=letter)
 
         if sort_by:
             if sort_by == "wrd_txt":
                 queryset = queryset.order_by("text" if sort_type == "asc" else "-text")
             if sort_by == "wrd_len":
                 queryset = queryset.order_by(
-                    Length("text") if sort_type == "asc" else Length("text").desc(),
+                    "length" if sort_type == "asc" else "-length",
                     "text",
                 )
             if sort_by == "wrd_frq":
@@ -413,10 +534,13 @@ class Definition(models.Model):
     language = models.ForeignKey(
         "Language", on_delete=models.SET_NULL, null=True, blank=True
     )
+    # full-text search document of text, it's set by a database trigger using language's search configuration
+    search_vector = SearchVectorField(null=True, editable=False)
 
-    # TODO: add it with empty db
-    # class Meta:
-    #     unique_together = (("text", "language"),)
+    class Meta:
+        # TODO: add it with empty db
+        # unique_together = (("text", "language"),)
+        indexes = [GinIndex(fields=["search_vector"], name="definition_search_gin")]
 
     def __str__(self):
         return self.text
@@ -591,6 +715,9 @@ class Relation(models.Model):
     from datacore.components import RELATION
 
     concepts = ArrayField(models.BigIntegerField(), blank=False, default=list, size=2)
+    # first and second concept ids, kept in sync with `concepts` by `save` and a database trigger
+    source = models.BigIntegerField(null=True, blank=True, editable=False)
+    target = models.BigIntegerField(null=True, blank=True, editable=False)
     relation_type = models.CharField(
         max_length=64, choices=RELATION, null=True, blank=True
     )
@@ -603,6 +730,94 @@ class Relation(models.Model):
         t_concept = Concept.objects.get(id=self.concepts[1])
         return f"({s_concept.get_title()}) {self.get_relation_type_display()} ({t_concept.get_title()})"
 
+    def save(self, *args, **kwargs):
+        self.source, self.target = get_adjacency(self.concepts)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def filter_relations(cls, concepts, direction="both", relation_type=None):
+        """
+        Relations of concepts using indexes of source and target concepts
+        concepts: concept id or list of ids
+        direction: `outgoing` from concepts, `incoming` to concepts or `both`
+        relation_type: code of relation type, E.g. `HYPONYM`, or list of codes
+        """
+        queryset = filter_adjacency(cls.objects.all(), concepts, direction)
+        if isinstance(relation_type, (list, tuple, set)):
+            queryset = queryset.filter(relation_type__in=relation_type)
+        elif relation_type is not None:
+            queryset = queryset.filter(relation_type=relation_type)
+        return queryset
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["source", "relation_type"], name="relation_source"),
+            models.Index(fields=["target", "relation_type"], name="relation_target"),
+        ]
+
+
+class ConceptClosure(models.Model):
+    """
+    Transitive closure of concept hierarchies, rows are maintained by database triggers when relations change.
+    Each concept has a row for each of it's ancestors, see `datacore.functions.closure.HIERARCHIES`
+    hierarchy: `kind` for HYPONYM, HYPERNYM and INSTANCE_OF relations, `part` for holonym relations
+    depth: number of relations in the shortest path from descendant to ancestor
+    """
+
+    hierarchy = models.CharField(max_length=16)
+    ancestor = models.BigIntegerField()
+    descendant = models.BigIntegerField()
+    depth = models.PositiveIntegerField()
+
+    def __str__(self):
+        return "{}: {} -> {} ({})".format(
+            self.hierarchy, self.descendant, self.ancestor, self.depth
+        )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hierarchy", "descendant", "ancestor"],
+                name="conceptclosure_descendant",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["hierarchy", "ancestor", "depth"],
+                name="conceptclosure_ancestor",
+            )
+        ]
+
+
+class RelationLog(models.Model):
+    """
+    Changed relations, rows are added by a database trigger on each insert, update and delete of `Relation`.
+    relation: id of changed relation, it may be deleted
+    version: `RelationVersion` of the statement which changed it, graph snapshots apply logs after their version
+    """
+
+    relation = models.BigIntegerField()
+    version = models.BigIntegerField(default=0, db_index=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return "{}: relation {}".format(self.id, self.relation)
+
+
+class RelationVersion(models.Model):
+    """
+    Single row of relations version, it's incremented by each statement which changes relations, see `RelationLog`.
+    The row stays locked until the changing transaction commits, so versions are committed in their order,
+    and a version is only visible after all lower versions.
+    Relation writers wait for each other, which is acceptable for imports and edits of relations,
+    bulk imports should change relations in one transaction, see `datacore.functions.closure.deferred_closure`.
+    """
+
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.version)
+
 
 class Rule(models.Model):
     """
@@ -778,6 +993,19 @@ class PhraseAnalysis(models.Model):
     """
     data is used to store analysis data in json format.
     """
+    # version of analyzer's pipeline or model which created this analysis
+    analyzer_version = models.CharField(max_length=256, blank=True, default="")
+    # phrase text has changed since this analysis
+    dirty = models.BooleanField(default=False, db_index=True)
+
+    @functools.cached_property
+    def expanded_data(self):
+        """
+        Analysis data as dictionaries of words and named entities, regardless of it's storage format
+        """
+        from datacore.functions.analysis_data import unpack_analysis_data
+
+        return unpack_analysis_data(self.data)
 
     def __str__(self):
         return "({}) {}".format(self.analyzer.title, self.phrase.text)
@@ -786,6 +1014,115 @@ class PhraseAnalysis(models.Model):
         unique_together = (("phrase", "analyzer"),)
 
 
+class AnalysisCache(models.Model):
+    """
+    Stores analysis data of a text, so duplicate phrases can reuse it instead of being analyzed again.
+    Items are content-addressed by hash of normalized text, analyzer and version of its pipeline or model.
+    """
+
+    text_hash = models.CharField(max_length=64)
+    analyzer = models.ForeignKey("Analyzer", on_delete=models.CASCADE)
+    version = models.CharField(max_length=256)
+    data = JSONField(default=dict)
+    templates = JSONField(default=dict)
+    hits = models.BigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    # least recently used items are evicted first
+    last_used = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return "({}) {}".format(self.version, self.text_hash)
+
+    class Meta:
+        unique_together = (("text_hash", "analyzer", "version"),)
+
+
+class Job(models.Model):
+    """
+    Background job, such as analysis or tokenization, which is queued by views and processed by `run-jobs` command.
+    task: name of a task registered in `datacore.functions.jobs`
+    """
+
+    STATUSES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("finished", "Finished"),
+        ("failed", "Failed"),
+    ]
+
+    task = models.CharField(max_length=64)
+    params = JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUSES, default="queued")
+    # number of processed items from total items of task
+    progress = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    message = models.CharField(max_length=1024, blank=True, default="")
+    result = JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default="")
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    # updated by workers while running jobs, jobs of stopped workers are queued again
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "({}) {}".format(self.status, self.task)
+
+    def is_done(self):
+        return self.status in ["finished", "failed"]
+
+    def get_percentage(self):
+        if self.status == "finished":
+            return 100
+        return int(self.progress * 100 / self.total) if self.total else 0
+
+    def set_progress(self, progress, total=None, message=None):
+        """
+        Store progress without saving other fields, so it can be called frequently by tasks
+        """
+        self.progress = progress
+        fields = {"progress": progress}
+        if total is not None:
+            self.total = total
+            fields["total"] = total
+        if message is not None:
+            self.message = message
+            fields["message"] = message
+        Job.objects.filter(id=self.id).update(**fields)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created"])]
+
+
+class Statistic(models.Model):
+    """
+    Exact number of objects, refreshed periodically by `refresh-statistics` command.
+    Rows without language and data source are totals, others are breakdowns by language or data source.
+    name: name of counted objects, E.g. `words`, see `datacore.functions.statistics.STATISTICS`
+    """
+
+    name = models.CharField(max_length=64)
+    language = models.ForeignKey(
+        "Language", on_delete=models.CASCADE, null=True, blank=True
+    )
+    data_source = models.ForeignKey(
+        "DataSource", on_delete=models.CASCADE, null=True, blank=True
+    )
+    count = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return "{}: {}".format(self.name, self.count)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["name", "language", "data_source"], name="statistic_name"
+            )
+        ]
+
+
 class Phrase(models.Model):
     """
     Stores a phrase or sentence.
@@ -794,14 +1131,12 @@ class Phrase(models.Model):
 
     # If it doesn't have a document, it should be unique
     text = models.TextField(null=False, unique=False, default="")
-    # TODO: use ids instead of text
-    words_list = ArrayField(models.CharField(max_length=2048), blank=True, default=list)
-    lemmas_list = ArrayField(
-        models.CharField(max_length=2048), blank=True, default=list
-    )
-    entities_list = ArrayField(
-        models.CharField(max_length=2048), blank=True, default=list
-    )
+    # distinct ids of phrase's words, lemmas and named entities
+    word_ids = ArrayField(models.BigIntegerField(), blank=True, default=list)
+    lemma_ids = ArrayField(models.BigIntegerField(), blank=True, default=list)
+    entity_ids = ArrayField(models.BigIntegerField(), blank=True, default=list)
+    # full-text search document of text, it's set by a database trigger using language's search configuration
+    search_vector = SearchVectorField(null=True, editable=False)
 
     data_sources = models.ManyToManyField("DataSource", blank=True)
     language = models.ForeignKey(
@@ -813,8 +1148,76 @@ class Phrase(models.Model):
     def __str__(self):
         return self.text
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # keep loaded text, so analyses can be marked as dirty when it changes
+        if "text" in field_names:
+            instance._loaded_text = values[field_names.index("text")]
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if hasattr(self, "_loaded_text") and self._loaded_text != self.text:
+            self.phraseanalysis_set.update(dirty=True)
+        self._loaded_text = self.text
+
+    @classmethod
+    def filter_phrases(
+        cls, words=None, lemmas=None, entities=None, match="all", language=None
+    ):
+        """
+        Phrases which contain all or any of words, lemmas and named entities, using GIN indexes of their id arrays
+        words, lemmas, entities: lists of ids or texts, texts match words and entities case-insensitively
+        match: `all` or `any`
+        language: optional alpha2 code of language of words and lemmas which are given as text, E.g. "en"
+        """
+        from functools import reduce
+        from operator import and_, or_
+
+        from django.db.models import Q
+
+        valid_match = ["all", "any"]
+        if match not in valid_match:
+            raise Exception(
+                f"Please enter a valid match parameter from {valid_match}. current value is `{match}`."
+            )
+
+        def get_ids(items, model):
+            # ids of each item, a text can match more than one object E.g. in different languages
+            texts = [item for item in items if isinstance(item, str)]
+            query = model.objects.filter(text__in=texts)
+            if language is not None and model is Word:
+                query = query.filter(language__alpha2=language)
+            matched = {}
+            for item_id, text in query.values_list("id", "text"):
+                matched.setdefault(text.lower(), []).append(item_id)
+            return [
+                matched.get(item.lower(), []) if isinstance(item, str) else [item]
+                for item in items
+            ]
+
+        conditions = []
+        for field, items, model in [
+            ("word_ids", words, Word),
+            ("lemma_ids", lemmas, Word),
+            ("entity_ids", entities, NamedEntity),
+        ]:
+            for ids in get_ids(items or [], model):
+                conditions.append(Q(**{f"{field}__overlap": ids}))
+
+        if not conditions:
+            return cls.objects.all()
+        return cls.objects.filter(reduce(and_ if match == "all" else or_, conditions))
+
     class Meta:
         unique_together = (("text", "language"),)
+        indexes = [
+            GinIndex(fields=["word_ids"], name="phrase_word_ids_gin"),
+            GinIndex(fields=["lemma_ids"], name="phrase_lemma_ids_gin"),
+            GinIndex(fields=["entity_ids"], name="phrase_entity_ids_gin"),
+            GinIndex(fields=["search_vector"], name="phrase_search_gin"),
+        ]
 
 
 class Template(MPTTModel):
@@ -881,12 +1284,35 @@ class Template(MPTTModel):
     language = models.ForeignKey(
         "Language", on_delete=models.SET_NULL, null=True, blank=True
     )
+    signature = models.CharField(
+        max_length=64, unique=True, null=True, blank=True, editable=False
+    )
+    """
+    hash of pos, xpos, feats, dep, constituency, parent and language. templates are looked up by it instead of their long text values.
+    """
 
     class Meta:
         unique_together = ("pos", "language")
 
     # causes: ERROR: index row size [NUMBER] exceeds maximum [NUMBER] for index "index_oauth_access_tokens_on_token" HINT: Values larger than [NUMBER]/[NUMBER] of a buffer page cannot be indexed. Consider a function index of an MD5 hash of the value, or use full text indexing.
 
+    def save(self, *args, **kwargs):
+        from datacore.functions.analysis import get_template_signature
+
+        # templates which were duplicates before signatures existed don't have any, see migration 0006,
+        # other templates with the same signature aren't saved because of it's unique index
+        if self.pk is None or self.signature is not None:
+            self.signature = get_template_signature(
+                self.pos,
+                self.xpos,
+                self.feats,
+                self.dep,
+                self.constituency,
+                self.parent_id,
+                self.language_id,
+            )
+        super(Template, self).save(*args, **kwargs)
+
     def phrase_count(self):
         analysis = PhraseAnalysis.objects.filter(template=self)
         phrases = []
@@ -89,7 +89,7 @@ class DomainOntologySerializer(serializers.ModelSerializer):
 class DefinitionSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Definition
-        fields = "__all__"
+        exclude = ["search_vector"]
 
 
 class ExampleSerializer(serializers.ModelSerializer):
@@ -161,7 +161,7 @@ class PhraseRelationTypeSerializer(serializers.ModelSerializer):
 class PhraseSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Phrase
-        fields = "__all__"
+        exclude = ["search_vector"]
 
 
 class TemplateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,69 @@
+# number of phrases which are analyzed and saved together in batch analysis
+ANALYSIS_BATCH_SIZE = 64
+
+# maximum number of characters of document content which are processed together by tokenizers
+DOCUMENT_CHUNK_SIZE = 100000
+# number of document sentences which are saved together
+PHRASE_BATCH_SIZE = 1000
+
+# seconds between heartbeats of running background jobs
+JOB_HEARTBEAT_INTERVAL = 10
+# seconds without heartbeat after which a running job's worker is considered stopped and the job is queued again
+JOB_STALE_AFTER = 120
+# number of times a job is started before a stopped worker fails it, so jobs which crash workers aren't retried forever
+JOB_MAX_ATTEMPTS = 3
+
+# processors used by stanza for phrase analysis
+STANZA_PROCESSORS = "tokenize,pos,lemma,depparse,ner,constituency"
+
+# maximum number of words kept by process-local word resolver
+WORD_CACHE_SIZE = 100000
+# number of most frequent words of a language loaded on it's first use
+WORD_CACHE_WARM_SIZE = 10000
+# maximum number of template ids kept by process-local template registry
+TEMPLATE_CACHE_SIZE = 100000
+
+# maximum number of texts stored by analysis cache, 0 disables it
+ANALYSIS_CACHE_SIZE = 1000000
+# number of texts stored by each process between evictions of least recently used analysis cache items
+ANALYSIS_CACHE_EVICT_INTERVAL = 10000
+
+# maximum number of NLP pipelines loaded by each process, 0 is unlimited
+PIPELINE_MAX_COUNT = 4
+# maximum memory in megabytes used by loaded NLP pipelines of each process, 0 is unlimited
+PIPELINE_MAX_RSS = 0
+# NLP pipelines which are loaded when a web worker starts, list of `(analyzer, options)`
+# E.g. [("stanza", {"lang": "en", "processors": STANZA_PROCESSORS}), ("spacy", {"package": "en_core_web_sm"})]
+PIPELINE_PRELOAD = []
+
+# default sentence segmentation backend of document tokenization: `stanza`, `spacy`, `sentencizer` or `rules`
+SEGMENTATION_BACKEND = "stanza"
+
+# language of full-text search queries, when it isn't selected
+SEARCH_LANGUAGE = "en"
+# number of full-text search results in each page
+SEARCH_PAGE_SIZE = 20
+
+# maximum number of words which lemmas are kept by process-local lemma map
+LEMMA_CACHE_SIZE = 100000
+# seconds which lemmas of a word are cached, relations created by other processes are found after it
+LEMMA_CACHE_TTL = 300
+
+# seconds which exact counts of dashboard statistics are used, afterwards they're estimated until refreshed
+STATISTICS_MAX_AGE = 3600
+
+# maximum number of relations between root and other concepts of hierarchy and neighborhood graphs
+GRAPH_MAX_DEPTH = 10
+# maximum number of concepts of hierarchy and neighborhood graphs, nearest concepts are kept
+GRAPH_MAX_NODES = 500
+
+# directory of graph snapshot files which are memory-mapped by all processes, None keeps a snapshot in memory of each process
+GRAPH_SNAPSHOT_PATH = None
+# seconds between checks of a graph snapshot for changed relations
+GRAPH_SNAPSHOT_TTL = 5
+# traverse relations of graph views in graph snapshot, otherwise by recursive database queries.
+# Each process keeps all relations in memory unless `GRAPH_SNAPSHOT_PATH` is shared, so it's disabled by default
+GRAPH_SNAPSHOT = False
+# seconds which JSON graphs of concepts are cached, they're also replaced when relations change,
+# but changed concept titles are only shown afterwards
+GRAPH_CACHE_TIMEOUT = 3600
@@ -11,8 +11,9 @@ def visualize_displacy_ent(analysis):
     content["text"] = analysis.phrase.text
     content["ents"] = []
     content["title"] = None
-    if "ner" in analysis.data and len(analysis.data["ner"]) > 0:
-        for i, item in analysis.data["ner"].items():
+    data = analysis.expanded_data
+    if "ner" in data and len(data["ner"]) > 0:
+        for i, item in data["ner"].items():
             content["ents"].append(
                 {
                     "start": item["start_char"],
@@ -32,8 +33,9 @@ def visualize_displacy_dep(analysis):
     content["words"] = []
     content["arcs"] = []
     try:
-        if len(analysis.data["words"]) > 0:
-            for i, item in analysis.data["words"].items():
+        data = analysis.expanded_data
+        if len(data["words"]) > 0:
+            for i, item in data["words"].items():
                 content["words"].append({"text": item["text"], "tag": item["upos"]})
                 if item["dep_rel"].lower() != "root":
                     if item["id"] > item["dep_parent"]:
@@ -0,0 +1,699 @@
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.test import SimpleTestCase, TestCase
+
+# analyzed sentences of phrase analysis tests, each token is `(text, lemma, pos, tag, dep, head, morph, entity IOB tag)`
+ANALYZED_PHRASES = [
+    [
+        ("The", "the", "DET", "DT", "det", 1, "Definite=Def|PronType=Art", "O"),
+        ("cats", "cat", "NOUN", "NNS", "nsubj", 2, "Number=Plur", "O"),
+        ("ran", "run", "VERB", "VBD", "ROOT", 2, "Tense=Past|VerbForm=Fin", "O"),
+        ("to", "to", "ADP", "IN", "prep", 2, "", "O"),
+        ("London", "London", "PROPN", "NNP", "pobj", 3, "Number=Sing", "B-GPE"),
+    ],
+    [
+        ("A", "a", "DET", "DT", "det", 1, "Definite=Ind|PronType=Art", "O"),
+        ("cat", "cat", "NOUN", "NN", "nsubj", 2, "Number=Sing", "O"),
+        ("runs", "run", "VERB", "VBZ", "ROOT", 2, "Tense=Pres|VerbForm=Fin", "O"),
+        ("in", "in", "ADP", "IN", "prep", 2, "", "O"),
+        ("New", "New", "PROPN", "NNP", "compound", 5, "Number=Sing", "B-GPE"),
+        ("York", "York", "PROPN", "NNP", "pobj", 3, "Number=Sing", "I-GPE"),
+    ],
+    [
+        ("Cats", "cat", "NOUN", "NNS", "nsubj", 1, "Number=Plur", "O"),
+        ("chase", "chase", "VERB", "VBP", "ROOT", 1, "Tense=Pres|VerbForm=Fin", "O"),
+        ("cats", "cat", "NOUN", "NNS", "dobj", 1, "Number=Plur", "O"),
+    ],
+    [
+        ("The", "the", "DET", "DT", "det", 1, "Definite=Def|PronType=Art", "O"),
+        ("dogs", "dog", "NOUN", "NNS", "nsubj", 2, "Number=Plur", "O"),
+        ("ran", "run", "VERB", "VBD", "ROOT", 2, "Tense=Past|VerbForm=Fin", "O"),
+        ("to", "to", "ADP", "IN", "prep", 2, "", "O"),
+        ("London", "London", "PROPN", "NNP", "pobj", 3, "Number=Sing", "B-GPE"),
+    ],
+]
+
+
+def get_analyzed_doc(tokens):
+    """
+    Spacy `Doc` of an analyzed sentence, so analysis data is created without a trained pipeline
+    """
+    import spacy
+    from spacy.tokens import Doc
+
+    texts, lemmas, pos, tags, deps, heads, morphs, ents = zip(*tokens)
+    return Doc(
+        spacy.blank("en").vocab,
+        words=list(texts),
+        lemmas=list(lemmas),
+        pos=list(pos),
+        tags=list(tags),
+        deps=list(deps),
+        heads=list(heads),
+        morphs=list(morphs),
+        ents=list(ents),
+    )
+
+
+def has_stanza_models(lang="en"):
+    import os
+
+    if not find_spec("stanza"):
+        return False
+    from stanza.resources.common import DEFAULT_MODEL_DIR
+
+    return os.path.isdir(os.path.join(DEFAULT_MODEL_DIR, lang))
+
+
+def get_phrase_text(tokens):
+    return " ".join(token[0] for token in tokens)
+
+
+def clear_analysis_caches():
+    """
+    Process-local caches may keep ids of rows which are rolled back by tests
+    """
+    from datacore.functions.cache import (
+        get_lemma_map,
+        get_template_registry,
+        get_word_resolver,
+    )
+
+    get_word_resolver().clear()
+    get_template_registry().clear()
+    get_lemma_map().clear()
+
+
+def get_analysis_state():
+    """
+    Analysis rows of all phrases by their texts, so states of different runs are compared without their ids
+    """
+    from datacore.models import NamedEntity, Phrase, PhraseAnalysis, Word, WordRelation
+
+    words = {
+        word_id: (str(text), frequency, lemma_frequency)
+        for word_id, text, frequency, lemma_frequency in Word.objects.values_list(
+            "id", "text", "frequency_distribution", "lemma_frequency_distribution"
+        )
+    }
+    entities = {
+        entity_id: (str(text), ne_type, frequency)
+        for entity_id, text, ne_type, frequency in NamedEntity.objects.values_list(
+            "id", "text", "ne_type", "frequency_distribution"
+        )
+    }
+    phrases = {
+        text: (
+            [words[item][0] for item in word_ids],
+            [words[item][0] for item in lemma_ids],
+            [entities[item][:2] for item in entity_ids],
+        )
+        for text, word_ids, lemma_ids, entity_ids in Phrase.objects.values_list(
+            "text", "word_ids", "lemma_ids", "entity_ids"
+        )
+    }
+    analyses = {}
+    for analysis in PhraseAnalysis.objects.select_related(
+        "phrase", "analyzer", "template", "template__parent"
+    ):
+        analyses[(analysis.phrase.text, analysis.analyzer.title)] = (
+            sorted(
+                words[item][0] for item in analysis.words.values_list("id", flat=True)
+            ),
+            sorted(
+                entities[item][:2]
+                for item in analysis.entities.values_list("id", flat=True)
+            ),
+            (
+                analysis.template.pos,
+                analysis.template.xpos,
+                analysis.template.feats,
+                analysis.template.dep,
+                analysis.template.parent.pos,
+            ),
+            analysis.data,
+            analysis.analyzer_version,
+            analysis.dirty,
+        )
+    return {
+        "words": sorted(words.values()),
+        "entities": sorted(entities.values()),
+        "lemmas": sorted(
+            (words[lemma][0], words[word][0])
+            for lemma, word in WordRelation.objects.filter(
+                word_relation__title="Lemma"
+            ).values_list("source", "target")
+        ),
+        "phrases": phrases,
+        "analyses": analyses,
+    }
+
+
+class ConceptClosureTests(TestCase):
+    """
+    Closure maintained by relation triggers should match `rebuild_closure` of the same relations.
+    Concept ids of relations aren't foreign keys, so they're plain numbers, HYPONYM relations point to parents.
+    """
+
+    def get_closure(self, hierarchy="kind"):
+        from datacore.models import ConceptClosure
+
+        return set(
+            ConceptClosure.objects.filter(hierarchy=hierarchy).values_list(
+                "descendant", "ancestor", "depth"
+            )
+        )
+
+    def assertClosureRebuilt(self):
+        from datacore.functions.closure import rebuild_closure
+
+        incremental = self.get_closure()
+        rebuild_closure(["kind"])
+        self.assertEqual(incremental, self.get_closure())
+        return incremental
+
+    def add_relations(self, *pairs, relation_type="HYPONYM"):
+        from datacore.models import Relation
+
+        relations = [
+            Relation(concepts=[child, parent], relation_type=relation_type)
+            for child, parent in pairs
+        ]
+        for relation in relations:
+            relation.save()
+        return relations
+
+    def setUp(self):
+        # 1 <- 2 <- 4 <- 6, 1 <- 3 <- 4, 3 <- 5
+        self.relations = self.add_relations((2, 1), (3, 1), (4, 2), (4, 3), (5, 3))
+        self.relations += self.add_relations((6, 4))
+
+    def test_insert(self):
+        closure = self.assertClosureRebuilt()
+        self.assertIn((6, 1, 3), closure)
+        self.assertIn((6, 3, 2), closure)
+        self.assertEqual(
+            {row for row in closure if row[0] == 5}, {(5, 3, 1), (5, 1, 2)}
+        )
+
+    def test_bulk_insert(self):
+        from datacore.models import Relation
+
+        # one statement with several relations, source and target are set by database trigger
+        Relation.objects.bulk_create(
+            [
+                Relation(concepts=[7, 6], relation_type="HYPONYM"),
+                Relation(concepts=[8, 7], relation_type="HYPONYM"),
+                Relation(concepts=[8, 5], relation_type="HYPERNYM"),
+            ]
+        )
+        closure = self.assertClosureRebuilt()
+        self.assertIn((8, 1, 5), closure)
+        self.assertIn((5, 8, 1), closure)
+
+    def test_shorter_path(self):
+        self.add_relations((6, 1))
+        closure = self.assertClosureRebuilt()
+        self.assertIn((6, 1, 1), closure)
+
+    def test_delete(self):
+        # 4 keeps ancestor 1 through 3
+        self.relations[2].delete()
+        closure = self.assertClosureRebuilt()
+        self.assertNotIn(2, {ancestor for descendant, ancestor, depth in closure})
+        self.assertIn((6, 1, 3), closure)
+
+    def test_queryset_delete(self):
+        from datacore.models import Relation
+
+        Relation.objects.filter(
+            id__in=[self.relations[2].id, self.relations[3].id]
+        ).delete()
+        closure = self.assertClosureRebuilt()
+        self.assertEqual({row for row in closure if row[0] == 6}, {(6, 4, 1)})
+
+    def test_update(self):
+        from datacore.models import Relation
+
+        # 6 is moved from 4 to 5
+        relation = self.relations[5]
+        relation.concepts = [6, 5]
+        relation.save()
+        closure = self.assertClosureRebuilt()
+        self.assertEqual(
+            {row for row in closure if row[0] == 6}, {(6, 5, 1), (6, 3, 2), (6, 1, 3)}
+        )
+        # relations which leave the hierarchy remove their ancestors
+        Relation.objects.filter(id=self.relations[4].id).update(
+            relation_type="SIMILAR_TOS"
+        )
+        closure = self.assertClosureRebuilt()
+        self.assertEqual({row for row in closure if row[0] == 6}, {(6, 5, 1)})
+
+    def test_cycle(self):
+        # 1 <- 6 closes a cycle 1 <- 2 <- 4 <- 6 <- 1
+        cycle = self.add_relations((1, 6))
+        closure = self.assertClosureRebuilt()
+        self.assertIn((1, 6, 1), closure)
+        self.assertIn((1, 2, 3), closure)
+        self.assertFalse(
+            any(descendant == ancestor for descendant, ancestor, depth in closure)
+        )
+        cycle[0].delete()
+        closure = self.assertClosureRebuilt()
+        self.assertNotIn(1, {descendant for descendant, ancestor, depth in closure})
+
+    def test_deferred_closure(self):
+        from datacore.functions.closure import deferred_closure
+
+        with deferred_closure():
+            self.add_relations((7, 6), (8, 7))
+            # closure isn't maintained until the end of import
+            self.assertNotIn((8, 7, 1), self.get_closure())
+        closure = self.assertClosureRebuilt()
+        self.assertIn((8, 1, 5), closure)
+        # closure is maintained again after import
+        self.add_relations((9, 8))
+        closure = self.assertClosureRebuilt()
+        self.assertIn((9, 1, 6), closure)
+
+
+class WordFilterPlanTests(TestCase):
+    """
+    Prefix, infix and suffix searches of `Word.filter_words` should be served by indexes instead of sequential scans
+    """
+
+    def get_plan_nodes(self, queryset):
+        import json
+
+        from django.db import connection, transaction
+
+        sql, params = queryset.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            # sequential scans are still used if no index can serve the query
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            result = cursor.fetchone()[0]
+        if isinstance(result, str):
+            result = json.loads(result)
+        nodes = [result[0]["Plan"]]
+        for node in nodes:
+            nodes.extend(node.get("Plans", []))
+        return nodes
+
+    def assertIndexScan(self, **filters):
+        from datacore.models import Word
+
+        nodes = [
+            node
+            for node in self.get_plan_nodes(Word.filter_words(**filters))
+            if node.get("Relation Name") == Word._meta.db_table
+        ]
+        self.assertTrue(nodes)
+        self.assertNotIn("Seq Scan", [node["Node Type"] for node in nodes])
+
+    def test_start(self):
+        self.assertIndexScan(start="Pre")
+
+    def test_contain(self):
+        self.assertIndexScan(contain="ati")
+
+    def test_end(self):
+        self.assertIndexScan(end="ING")
+
+
+class PhraseAnalysisTests(TestCase):
+    """
+    Analyses which are saved in batches should be the same as analyses which are saved one by one
+    """
+
+    def setUp(self):
+        from datacore.models import Analyzer, Language, Phrase
+
+        clear_analysis_caches()
+        self.language, created = Language.objects.get_or_create(
+            alpha2="en", defaults={"native_name": "English", "en_name": "English"}
+        )
+        self.analyzer = Analyzer.objects.create(title="Spacy: test", version="")
+        for tokens in ANALYZED_PHRASES:
+            Phrase.objects.create(text=get_phrase_text(tokens), language=self.language)
+
+    def get_items(self):
+        from datacore.functions.spacy import spacy_sentence_data
+        from datacore.models import Phrase
+
+        items = []
+        for tokens in ANALYZED_PHRASES:
+            phrase_item = Phrase.objects.get(text=get_phrase_text(tokens))
+            items.append((phrase_item, *spacy_sentence_data(get_analyzed_doc(tokens))))
+        return items
+
+    def get_rolled_back_state(self, save):
+        """
+        Save analyses and get their state, they're rolled back afterwards so each run starts from the same rows
+        """
+        from django.db import transaction
+
+        with transaction.atomic():
+            save()
+            state = get_analysis_state()
+            transaction.set_rollback(True)
+        clear_analysis_caches()
+        return state
+
+    def save_each(self, analyzer=None):
+        from datacore.functions.analysis import save_phrase_analyses
+
+        for item in self.get_items():
+            save_phrase_analyses(
+                analyzer or self.analyzer, self.language, [item], version="test"
+            )
+
+    def save_batch(self, analyzer=None):
+        from datacore.functions.analysis import save_phrase_analyses
+
+        save_phrase_analyses(
+            analyzer or self.analyzer, self.language, self.get_items(), version="test"
+        )
+
+    def test_batch_analysis(self):
+        each = self.get_rolled_back_state(self.save_each)
+        batch = self.get_rolled_back_state(self.save_batch)
+        self.assertEqual(each, batch)
+        # words of a phrase are counted once, lemmas which are the same as their words on each use
+        words = {text: counters for text, *counters in each["words"]}
+        self.assertEqual(words["cats"], [2, 0])
+        self.assertEqual(words["cat"], [1, 3])
+        self.assertEqual(words["the"], [2, 2])
+        self.assertIn(("cat", "cats"), each["lemmas"])
+        self.assertIn(("New York", "GPE", 1), each["entities"])
+        self.assertEqual(
+            each["phrases"]["Cats chase cats"], (["cats", "chase"], ["cat"], [])
+        )
+        # phrases with the same structure share templates
+        analyses = each["analyses"]
+        self.assertEqual(
+            analyses[("The cats ran to London", "Spacy: test")][2],
+            analyses[("The dogs ran to London", "Spacy: test")][2],
+        )
+
+    def test_repeated_phrases(self):
+        from datacore.functions.analysis import save_phrase_analyses
+
+        # a phrase which is saved again in the same batch isn't counted again
+        def save_repeated():
+            items = self.get_items()
+            save_phrase_analyses(
+                self.analyzer, self.language, items + items[:1], version="test"
+            )
+
+        def save_twice():
+            items = self.get_items()
+            save_phrase_analyses(self.analyzer, self.language, items, version="test")
+            save_phrase_analyses(
+                self.analyzer, self.language, self.get_items()[:1], version="test"
+            )
+
+        self.assertEqual(
+            self.get_rolled_back_state(save_repeated),
+            self.get_rolled_back_state(save_twice),
+        )
+
+    def test_recompute_counters(self):
+        from datacore.functions.counters import recompute_counters
+        from datacore.models import Analyzer, NamedEntity, Word
+
+        other = Analyzer.objects.create(title="Stanza: test", version="")
+
+        def recompute():
+            self.save_batch()
+            self.save_each(other)
+            incremental = get_analysis_state()
+            # counters of both analyzers are replayed from stored analyses
+            Word.objects.update(
+                frequency_distribution=7, lemma_frequency_distribution=0
+            )
+            NamedEntity.objects.update(frequency_distribution=0)
+            recompute_counters(chunk_size=2)
+            self.assertEqual(get_analysis_state(), incremental)
+
+        self.get_rolled_back_state(recompute)
+
+    def test_cached_entities(self):
+        from datacore.functions.analysis import cached_phrase_data, get_phrase_entities
+        from datacore.functions.spacy import spacy_sentence_data
+        from datacore.models import Phrase
+
+        def analyze(phrases):
+            docs = {get_phrase_text(tokens): tokens for tokens in ANALYZED_PHRASES}
+            return [
+                spacy_sentence_data(get_analyzed_doc(docs[phrase_item.text]))
+                for phrase_item in phrases
+            ]
+
+        phrases = list(Phrase.objects.order_by("id"))
+        analyzed = cached_phrase_data(self.analyzer, "test", phrases, analyze)
+        cached = cached_phrase_data(self.analyzer, "test", phrases, None)
+        self.assertEqual(
+            [get_phrase_entities(data) for data, templates in analyzed],
+            [get_phrase_entities(data) for data, templates in cached],
+        )
+        self.assertEqual(
+            get_phrase_entities(analyzed[1][0]),
+            [{"text": "New York", "start_char": 14, "end_char": 22, "type": "GPE"}],
+        )
+
+    @skipUnless(find_spec("en_core_web_sm"), "spacy's en_core_web_sm isn't installed")
+    def test_spacy_batch_analysis(self):
+        from datacore.functions.spacy import (
+            get_spacy,
+            spacy_batch_phrase_analysis,
+            spacy_phrase_analysis,
+        )
+        from datacore.models import Phrase
+
+        nlp = get_spacy(package="en_core_web_sm")
+        results = {}
+
+        def analyze_each():
+            results["each"] = [
+                spacy_phrase_analysis(phrase_item=phrase, sentence=nlp(phrase.text))[0]
+                for phrase in Phrase.objects.order_by("id")
+            ]
+
+        def analyze_batch():
+            results["batch"] = [
+                result
+                for result, analysis in spacy_batch_phrase_analysis(
+                    Phrase.objects.order_by("id"), batch_size=3
+                )
+            ]
+
+        self.assertEqual(
+            self.get_rolled_back_state(analyze_each),
+            self.get_rolled_back_state(analyze_batch),
+        )
+        self.assertEqual(results["each"], results["batch"])
+
+    @skipUnless(has_stanza_models(), "stanza's English models aren't downloaded")
+    def test_stanza_batch_analysis(self):
+        import datacore.settings as datacore_settings
+        from datacore.functions.stanza import (
+            get_stanza,
+            stanza_batch_phrase_analysis,
+            stanza_phrase_analysis,
+        )
+        from datacore.models import Phrase
+
+        nlp = get_stanza(lang="en", processors=datacore_settings.STANZA_PROCESSORS)
+        results = {}
+
+        def analyze_each():
+            results["each"] = [
+                stanza_phrase_analysis(
+                    phrase_item=phrase,
+                    language="en",
+                    sentence=nlp(phrase.text).sentences[0],
+                )[0]
+                for phrase in Phrase.objects.order_by("id")
+            ]
+
+        def analyze_batch():
+            results["batch"] = [
+                result
+                for result, analysis in stanza_batch_phrase_analysis(
+                    Phrase.objects.order_by("id"), language="en", batch_size=3
+                )
+            ]
+
+        def analyze_sentences():
+            phrases = list(Phrase.objects.order_by("id"))
+            results["sentences"] = [
+                result
+                for result, analysis in stanza_batch_phrase_analysis(
+                    phrases,
+                    language="en",
+                    sentences=[nlp(phrase.text).sentences[0] for phrase in phrases],
+                    batch_size=3,
+                )
+            ]
+
+        each = self.get_rolled_back_state(analyze_each)
+        self.assertEqual(each, self.get_rolled_back_state(analyze_batch))
+        self.assertEqual(each, self.get_rolled_back_state(analyze_sentences))
+        self.assertEqual(results["each"], results["batch"])
+        self.assertEqual(results["each"], results["sentences"])
+
+
+class AnalysisDataTests(SimpleTestCase):
+    """
+    Packed analysis data should be unpacked to the same data, keys of words and named entities are strings in JSON
+    """
+
+    def get_data(self):
+        from datacore.functions.spacy import spacy_sentence_data
+
+        return [
+            spacy_sentence_data(get_analyzed_doc(tokens))[0]
+            for tokens in ANALYZED_PHRASES
+        ]
+
+    def assertRoundTrip(self, data):
+        import json
+
+        from datacore.functions.analysis_data import (
+            pack_analysis_data,
+            unpack_analysis_data,
+        )
+
+        packed = json.loads(json.dumps(pack_analysis_data(data)))
+        self.assertEqual(unpack_analysis_data(packed), json.loads(json.dumps(data)))
+        # packed data isn't packed again
+        self.assertEqual(pack_analysis_data(packed), packed)
+        return packed
+
+    def test_round_trip(self):
+        for data in self.get_data():
+            packed = self.assertRoundTrip(data)
+            self.assertNotIn("_keys", packed["words"])
+
+    def test_other_keys(self):
+        # words which aren't keyed by their ids and other sections are kept
+        data = self.get_data()[1]
+        data["words"] = {
+            str(int(key) + 10): value for key, value in data["words"].items()
+        }
+        data["ner"] = {5: data["ner"][0]}
+        data["sentiment"] = {"score": 0.5}
+        packed = self.assertRoundTrip(data)
+        self.assertIn("_keys", packed["words"])
+
+    def test_empty(self):
+        from datacore.functions.analysis_data import (
+            pack_analysis_data,
+            unpack_analysis_data,
+        )
+
+        self.assertRoundTrip({"words": {}, "ner": {}})
+        self.assertEqual(pack_analysis_data({}), {})
+        # unpacked data of the older format is returned unchanged
+        data = self.get_data()[0]
+        self.assertEqual(unpack_analysis_data(data), data)
+
+
+class ConceptGraphApiTests(TestCase):
+    """
+    Graph responses of concepts, their validation and ETags
+    """
+
+    def setUp(self):
+        from datacore.models import Concept, Relation
+        from django.core.cache import cache
+
+        cache.clear()
+        self.concepts = [Concept.objects.create() for i in range(4)]
+        # 1 <- 2 <- 3 are kinds, 4 is similar to 1
+        for source, target, relation_type in [
+            (1, 0, "HYPONYM"),
+            (2, 1, "HYPONYM"),
+            (3, 0, "SIMILAR_TOS"),
+        ]:
+            Relation(
+                concepts=[self.concepts[source].id, self.concepts[target].id],
+                relation_type=relation_type,
+            ).save()
+
+    def get(self, action, concept, **headers):
+        from datacore.api import ConceptViewSet
+        from rest_framework.test import APIRequestFactory
+
+        path, params = action.split("?", 1) if "?" in action else (action, "")
+        request = APIRequestFactory().get(f"/?{params}", **headers)
+        view = ConceptViewSet.as_view({"get": path})
+        return view(request, pk=str(concept.id if hasattr(concept, "id") else concept))
+
+    def get_nodes(self, response):
+        return {node["id"] for node in response.data["nodes"]}
+
+    def test_graphs(self):
+        concepts = [concept.id for concept in self.concepts]
+        response = self.get("hierarchy", self.concepts[2])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_nodes(response), set(concepts[:3]))
+        response = self.get("relations", self.concepts[0])
+        self.assertEqual(
+            self.get_nodes(response), {concepts[0], concepts[1], concepts[3]}
+        )
+        response = self.get("neighborhood?depth=2&direction=incoming", self.concepts[0])
+        self.assertEqual(self.get_nodes(response), set(concepts))
+        response = self.get("neighborhood?relation_types=HYPONYM", self.concepts[0])
+        self.assertEqual(self.get_nodes(response), set(concepts[:2]))
+
+    def test_invalid_parameters(self):
+        for action in [
+            # options which are fixed by kind of graph aren't ignored
+            "hierarchy?direction=both",
+            "relations?direction=outgoing",
+            "relations?depth=2",
+            "neighborhood?depth=two",
+            "neighborhood?max_nodes=all",
+            "neighborhood?direction=up",
+            "neighborhood?relation_types=HYPONYM,UNKNOWN",
+        ]:
+            with self.subTest(action=action):
+                response = self.get(action, self.concepts[0])
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get("neighborhood", "one").status_code, 400)
+        missing = self.concepts[-1].id + 1000
+        self.assertEqual(self.get("neighborhood", missing).status_code, 404)
+
+    def test_etag(self):
+        from datacore.models import Relation
+
+        action = "neighborhood?relation_types=SIMILAR_TOS,HYPONYM"
+        response = self.get(action, self.concepts[0])
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        # options are normalized, so the same graph has the same ETag
+        same = self.get(
+            "neighborhood?relation_types=HYPONYM,SIMILAR_TOS&depth=1", self.concepts[0]
+        )
+        self.assertEqual(same["ETag"], etag)
+        other = self.get("neighborhood?depth=2", self.concepts[0])
+        self.assertNotEqual(other["ETag"], etag)
+
+        response = self.get(action, self.concepts[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # changed relations change the version of graphs
+        version = same.data["version"]
+        Relation(
+            concepts=[self.concepts[3].id, self.concepts[2].id],
+            relation_type="HYPONYM",
+        ).save()
+        response = self.get(action, self.concepts[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertGreater(response.data["version"], version)
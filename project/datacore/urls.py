@@ -39,6 +39,7 @@ urlpatterns = [
     re_path(r"^$", views.index, name="home"),
     path("search/", views.search, name="search"),
     path("analyze/", views.analyze, name="analyze"),
+    re_path(r"^job/(?P<id>\d+)$", views.job, name="job"),
     # API
     path(r"api/", include((router.urls, "datacore"))),
     # all the pages
@@ -1,5 +1,5 @@
 from datacore.functions.utils import prepare_pagination
-from datacore.models import Concept, Document, Example, Phrase, Relation, Template, Word
+from datacore.models import Concept, Document, Example, Phrase, Template, Word
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
@@ -7,43 +7,58 @@ from django.utils.translation import gettext_lazy as _
 
 
 def index(request):
+    from datacore.functions.statistics import (
+        enqueue_statistics_refresh,
+        get_statistic_breakdowns,
+        get_statistics,
+    )
+    from datacore.models import Language
+
+    # objects aren't counted on each request, stored counts are refreshed in background
+    statistics, stale = get_statistics()
+    if stale:
+        enqueue_statistics_refresh()
     context = {
-        "concepts": Concept.objects.all().count(),
-        "words": Word.objects.all().count(),
-        "examples": Example.objects.all().count(),
-        "phrases": Phrase.objects.all().count(),
-        "documents": Document.objects.all().count(),
-        "relationships": Relation.objects.all().count(),
+        "statistics": statistics,
+        "breakdowns": get_statistic_breakdowns(),
+        # languages of analyzed text
+        "languages": Language.objects.exclude(alpha2=None).order_by("en_name"),
     }
     context["base_template"] = "partial.html" if request.htmx else "base.html"
     return render(request, "index.html", context)
 
 
 def search(request):
-    from datacore.models import Concept, Word
-
     query = request.GET.get("query")
     querytype = request.GET.get("type")
     if querytype == "phrase":
-        try:
-            phrases = Phrase.objects.filter(text__icontains=query)
-        except Phrase.DoesNotExist:
-            phrases = []
+        from datacore.functions.search import (
+            highlight,
+            paginate_without_count,
+            search_phrases,
+        )
+
+        # ranked full-text search, pages are loaded without counting all results
+        phrases, page = paginate_without_count(
+            search_phrases(query, language=request.GET.get("language")),
+            page=request.GET.get("page", 1),
+        )
+        for phrase in phrases:
+            phrase.snippet = highlight(phrase.headline)
         context = {
             "type": querytype,
             "query": query,
             "phrases": phrases,
+            "page": page,
         }
     else:
-        try:
-            words = Word.objects.filter(text=query)
-            concepts = Concept.objects.filter(synonyms__in=words)
-        except Word.DoesNotExist or Concept.DoesNotExist:
-            words = None
-            concepts = []
+        from datacore.functions.search import search_concepts
+
+        words, lemmas, concepts = search_concepts(query)
         context = {
             "type": querytype,
             "words": words,
+            "lemmas": lemmas,
             "query": query,
             "concepts": concepts,
         }
@@ -52,56 +67,46 @@ def search(request):
 
 
 def analyze(request):
+    from datacore.functions.jobs import enqueue_job
+    from datacore.models import Job, Language, PhraseAnalysis
+
+    # results of a finished analysis job
+    if request.method == "GET" and request.GET.get("job"):
+        job = get_object_or_404(Job, id=request.GET.get("job"), task="analyze")
+        context = {"job": job}
+        if job.status == "finished" and "document" in job.result:
+            context["document"] = Document.objects.get(id=job.result["document"])
+        elif job.status == "finished":
+            context["phrase"] = Phrase.objects.get(id=job.result["phrase"])
+            context["analysis"] = PhraseAnalysis.objects.get(id=job.result["analysis"])
+        return render(request, "analyze.html", context)
+
     if request.method != "POST" or not request.POST.get("analyze_phrase_input"):
         return HttpResponseRedirect(reverse("home"))
 
-    from datacore.functions.stanza import get_stanza, stanza_phrase_analysis
-
-    from .models import Corpora, Document, PhraseCollection
-
     text = request.POST.get("analyze_phrase_input")
+    language = request.POST.get("language", "en")
+    if not Language.objects.filter(alpha2=language).exists():
+        return HttpResponseRedirect(reverse("home"))
     if request.POST.get("analyze_phrase"):
-        # setup pipeline
-        nlp = get_stanza(
-            lang="en", processors="tokenize,pos,lemma,depparse,ner,constituency"
-        )
-        doc = nlp(text)
+        # analysis is done by `run-jobs` workers, progress is shown until it's finished
+        job = enqueue_job("analyze", text=text, language=language)
+        return render(request, "analyze.html", {"job": job})
+    return HttpResponseRedirect(reverse("home"))
 
-        # Get or create corpora and phrase collection entries for user submissions
-        corpora, created = Corpora.objects.get_or_create(title="Frontend Submissions")
-        if len(doc.sentences) == 1:
-            collection, created = PhraseCollection.objects.get_or_create(
-                title="Submission Analysis Collections"
-            )
-            corpora.phrase_collections.add(collection)
-            phrase, created = Phrase.objects.get_or_create(text=text)
-            collection.phrases.add(phrase)
-            result, analysis = stanza_phrase_analysis(
-                phrase_item=phrase, sentence=doc.sentences[0]
-            )
-            context = {
-                "phrase": phrase,
-                "analysis": analysis,
-            }
-            return render(request, "analyze.html", context)
-        else:
-            document, created = Document.objects.get_or_create(content=text)
-            phrases = []
-            for sentence in doc.sentences:
-                phrase, created = Phrase.objects.get_or_create(
-                    text=sentence.text, document=document
-                )
-                if created and phrase not in document.phrases.all():
-                    document.phrases.add(phrase)
-                phrases.append(phrase)
-                result, analysis = stanza_phrase_analysis(
-                    phrase_item=phrase, sentence=sentence
-                )
-            context = {
-                "document": document,
-                "phrases": phrases,
-            }
-            return render(request, "analyze.html", context)
+
+def job(request, id=None):
+    """
+    Status of a background job, htmx requests poll it until the job is done and then are redirected to results.
+    """
+    from datacore.models import Job
+
+    job = get_object_or_404(Job, id=id)
+    context = {"job": job}
+    response = render(request, "job.html", context)
+    if request.htmx and job.status == "finished" and job.result.get("url"):
+        response["HX-Redirect"] = job.result["url"]
+    return response
 
 
 def corpora(request):
@@ -385,6 +390,10 @@ def words(request):
                 end=form.cleaned_data["end"],
                 sort_by=sort_by,
                 sort_type=sort_type,
+                min_length=form.cleaned_data["min_length"],
+                max_length=form.cleaned_data["max_length"],
+                letters=form.cleaned_data["letters"],
+                exclude_letters=form.cleaned_data["exclude_letters"],
             )
     words = Word.objects.all().order_by("text") if queryset is None else queryset
     if queryset:
@@ -424,13 +433,13 @@ def word(request, id=None):
 
     word = Word.objects.get(id=id)
     concepts = Concept.objects.filter(synonyms=word).all()
-    relations = WordRelation.objects.filter(words__contains=[id]).all()
+    relations = WordRelation.filter_relations(id).all()
     words_ids = []
     for rel in relations:
-        if rel.words[0] not in words_ids:
-            words_ids.append(rel.words[0])
-        if rel.words[1] not in words_ids:
-            words_ids.append(rel.words[1])
+        if rel.source not in words_ids:
+            words_ids.append(rel.source)
+        if rel.target not in words_ids:
+            words_ids.append(rel.target)
     related_words = dict(
         {(item.id, item) for item in Word.objects.filter(id__in=words_ids).all()}
     )
@@ -658,19 +667,34 @@ def document(request, id=None):
 
     document = Document.objects.get(id=id)
 
+    job = None
     if request.method == "POST":
-        if request.POST.get("doc_tokenize_stanza"):
-            from datacore.functions.stanza import stanza_tokenize_document
+        from datacore.functions.jobs import enqueue_job
 
-            stanza_tokenize_document(document)
+        if request.POST.get("doc_tokenize"):
+            # segmentation backend of `SEGMENTATION_BACKEND` setting
+            job = enqueue_job("tokenize_document", document=document.id)
+        if request.POST.get("doc_tokenize_stanza"):
+            job = enqueue_job(
+                "tokenize_document", document=document.id, analyzer="stanza"
+            )
         if request.POST.get("doc_tokenize_spacy"):
-            from datacore.functions.spacy import spacy_document_tokenize
-
-            spacy_document_tokenize(document)
+            job = enqueue_job(
+                "tokenize_document", document=document.id, analyzer="spacy"
+            )
+        if request.POST.get("doc_tokenize_sentencizer"):
+            job = enqueue_job(
+                "tokenize_document", document=document.id, analyzer="sentencizer"
+            )
+        if request.POST.get("doc_tokenize_rules"):
+            job = enqueue_job(
+                "tokenize_document", document=document.id, analyzer="rules"
+            )
 
     context = {
         "id": id,
         "document": document,
+        "job": job,
     }
     context["base_template"] = "partial.html" if request.htmx else "base.html"
     return render(request, "document.html", context)
@@ -731,16 +755,17 @@ def phrase(request, id=None):
 
     phrase_object = Phrase.objects.get(id=id)
 
+    job = None
     if request.method == "POST":
+        from datacore.functions.jobs import enqueue_job
+
         # Analyze
         if request.POST.get("phrase_analysis_stanza"):
-            from datacore.functions.stanza import stanza_phrase_analysis
-
-            stanza_phrase_analysis(phrase_item=phrase_object)
+            job = enqueue_job("phrase_analysis", phrase=phrase_object.id)
         if request.POST.get("phrase_analysis_spacy"):
-            from datacore.functions.spacy import spacy_phrase_analysis
-
-            spacy_phrase_analysis(phrase_item=phrase_object)
+            job = enqueue_job(
+                "phrase_analysis", phrase=phrase_object.id, analyzer="spacy"
+            )
 
     # list documents with this phrase
     documents = Document.objects.filter(phrases__id=phrase_object.id)
@@ -751,6 +776,7 @@ def phrase(request, id=None):
         "phrase": phrase_object,
         "documents": documents,
         "analysis_results": analysis_results,
+        "job": job,
     }
     context["base_template"] = "partial.html" if request.htmx else "base.html"
     return render(request, "phrase.html", context)
@@ -1051,14 +1077,14 @@ def concept_relationships(request, id=None):
         Relation.objects.get(id=request.POST.get("relation-id")).delete()
 
     # Create list of relationships as a cache to prevent multiple small queries
-    relations = Relation.objects.filter(concepts__contains=[id]).all()
+    relations = Relation.filter_relations(id).all()
     concept_ids = []
     concept_rels = []
     for rel in relations:
-        if rel.concepts[0] not in concept_ids:
-            concept_ids.append(rel.concepts[0])
-        if rel.concepts[1] not in concept_ids:
-            concept_ids.append(rel.concepts[1])
+        if rel.source not in concept_ids:
+            concept_ids.append(rel.source)
+        if rel.target not in concept_ids:
+            concept_ids.append(rel.target)
         if rel.relation_type not in concept_rels:
             concept_rels.append(rel.relation_type)
     related_concepts = dict(
@@ -1330,10 +1356,10 @@ def word_relation_type(request, id=None):
     relations = WordRelation.objects.filter(word_relation=relation_type).all()
     words_ids = []
     for rel in relations:
-        if rel.words[0] not in words_ids:
-            words_ids.append(rel.words[0])
-        if rel.words[1] not in words_ids:
-            words_ids.append(rel.words[1])
+        if rel.source not in words_ids:
+            words_ids.append(rel.source)
+        if rel.target not in words_ids:
+            words_ids.append(rel.target)
     related_words = dict(
         {(item.id, item) for item in Word.objects.filter(id__in=words_ids).all()}
     )
@@ -1384,10 +1410,10 @@ def word_relations(request, id=None):
     # Get words related to relations
     words_ids = []
     for rel in relations:
-        if rel.words[0] not in words_ids:
-            words_ids.append(rel.words[0])
-        if rel.words[1] not in words_ids:
-            words_ids.append(rel.words[1])
+        if rel.source not in words_ids:
+            words_ids.append(rel.source)
+        if rel.target not in words_ids:
+            words_ids.append(rel.target)
     related_words = dict(
         {(item.id, item) for item in Word.objects.filter(id__in=words_ids).all()}
     )
@@ -1404,7 +1430,7 @@ def word_relation(request, id=None):
     from datacore.models import WordRelation
 
     relation = WordRelation.objects.get(id=id)
-    words_ids = [relation.words[0], relation.words[1]]
+    words_ids = [relation.source, relation.target]
     related_words = dict(
         {(item.id, item) for item in Word.objects.filter(id__in=words_ids).all()}
     )
@@ -1433,8 +1459,10 @@ def word_relations_add(request):
                 language=form.cleaned_data["word_two_language"],
             )
             item, saved = WordRelation.objects.get_or_create(
-                words=[word_one.id, word_two.id],
+                source=word_one.id,
+                target=word_two.id,
                 word_relation=form.cleaned_data["word_relation"],
+                defaults={"words": [word_one.id, word_two.id]},
             )
             item.data_sources.set(form.cleaned_data["data_sources"])
             return HttpResponseRedirect(
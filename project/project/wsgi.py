@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
 
 application = get_wsgi_application()
+
+# load configured NLP pipelines before the first request of this worker
+from datacore.functions.pipelines import preload_pipelines
+
+preload_pipelines()